@@ -2,7 +2,10 @@ import os
 import datetime
 import pathlib
 import platform
+import argparse
+import subprocess
 from datetime import datetime as dt
+from date_patcher import patch_file_dates, read_file_dates
 
 def get_file_timestamp(file_path):
     """Get creation and modification timestamps of a file."""
@@ -41,7 +44,52 @@ def set_file_timestamp(file_path, new_date, original_time):
         except Exception as e:
             print(f"Warning: Could not set creation time for {file_path}: {e}")
 
-def process_directory(root_dir):
+def read_exiftool_dates(file_path):
+    """Read DateTimeOriginal/CreateDate with exiftool (for layouts date_patcher cannot parse)."""
+    dates = {}
+    try:
+        result = subprocess.run(
+            ["exiftool", "-s", "-DateTimeOriginal", "-CreateDate", file_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        for line in result.stdout.splitlines():
+            name, sep, value = line.partition(":")
+            try:
+                dates[name.strip()] = dt.strptime(value.strip(), "%Y:%m:%d %H:%M:%S")
+            except ValueError:
+                pass
+    except Exception as e:
+        print(f"Warning: Could not read metadata dates for {file_path}: {e}")
+    return dates
+
+def fix_embedded_dates(file_path, folder_date):
+    """Move the embedded capture date onto folder_date, keeping its time of day.
+
+    The fixed-width date fields are patched in place when the layout allows it;
+    otherwise exiftool rewrites the file.
+    """
+    dates = read_file_dates(file_path) or read_exiftool_dates(file_path)
+    tag = "DateTimeOriginal" if "DateTimeOriginal" in dates else "CreateDate"
+    if tag not in dates or dates[tag].date() == folder_date:
+        return
+
+    new_datetime = dt.combine(folder_date, dates[tag].time())
+    if patch_file_dates(file_path, new_datetime, required=tag):
+        print(f"Patched metadata date in place for {file_path}: {dates[tag]} -> {new_datetime}")
+        return
+
+    date_str = new_datetime.strftime("%Y:%m:%d %H:%M:%S")
+    try:
+        subprocess.run(
+            ["exiftool", "-overwrite_original", "-P",
+             f"-DateTimeOriginal={date_str}", f"-CreateDate={date_str}", f"-ModifyDate={date_str}", file_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+        print(f"Updated metadata date with exiftool for {file_path}: {dates[tag]} -> {new_datetime}")
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"Warning: Could not update metadata date for {file_path}: {e}")
+
+def process_directory(root_dir, fix_metadata=False):
     """Process all files in the directory structure YYYY/MM/DD."""
     # Define supported file extensions for photos and videos
     photo_extensions = (".jpg", ".jpeg", ".png", ".cr2", ".dng", ".heic", ".tif", ".tiff")
@@ -70,6 +118,10 @@ def process_directory(root_dir):
             if not file_name.lower().endswith(valid_extensions):
                 continue
 
+            # Move the embedded capture date onto the folder date as well
+            if fix_metadata:
+                fix_embedded_dates(file_path, folder_date)
+
             # Get file timestamps
             creation_time, modification_time = get_file_timestamp(file_path)
             file_creation_date = dt.fromtimestamp(creation_time).date()
@@ -85,12 +137,18 @@ def process_directory(root_dir):
                 set_file_timestamp(file_path, folder_date, modification_time)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Align file dates with their YYYY/MM/DD folder.")
     # Specify the root directory containing YYYY/MM/DD structure
-    root_directory = "/Volumes/SlowDisk/iCloud"
+    parser.add_argument("root_directory", nargs="?", default="/Volumes/SlowDisk/iCloud",
+                        help="Root directory containing the YYYY/MM/DD structure")
+    parser.add_argument("--fix-metadata", action="store_true",
+                        help="Also move embedded EXIF/QuickTime dates onto the folder date (patched in place when possible)")
+    args = parser.parse_args()
+    root_directory = args.root_directory
     
     if not os.path.exists(root_directory):
         print(f"Error: Directory {root_directory} does not exist")
     else:
         print(f"Processing files in {root_directory}")
-        process_directory(root_directory)
+        process_directory(root_directory, fix_metadata=args.fix_metadata)
         print("Processing complete")
\ No newline at end of file
@@ -1,7 +1,9 @@
 import os
 import json
+import argparse
 import subprocess
 from datetime import datetime
+from xmp_sidecar import SidecarBatch, takeout_sidecar_fields
 
 # Folder path for unpacked Google Takeout
 base_path = "/Volumes/RAID/unpack/Takeout/Google Photos"
@@ -20,19 +22,23 @@ def log_failure(json_path, media_file_path=None, error=None):
         log_file.write(f"JSON: {json_path}, Media: {media_file_path}, Error: {error}\n")
 
 # Function to set metadata and dates
-def apply_metadata(file_path, metadata, json_path):
+# With a SidecarBatch, dates/description/GPS go to an .xmp sidecar and the media bytes are left untouched
+def apply_metadata(file_path, metadata, json_path, sidecars=None):
     try:
-        # Prepare exiftool command
-        exiftool_command = ["exiftool"]
+        if sidecars is not None:
+            sidecars.add(file_path, **takeout_sidecar_fields(metadata))
+        else:
+            # Prepare exiftool command
+            exiftool_command = ["exiftool"]
 
-        # Add only supported metadata fields to exiftool command
-        for key, value in metadata.items():
-            if isinstance(value, str) and key in supported_tags:
-                exiftool_command.extend([f"-{key}={value}"])
+            # Add only supported metadata fields to exiftool command
+            for key, value in metadata.items():
+                if isinstance(value, str) and key in supported_tags:
+                    exiftool_command.extend([f"-{key}={value}"])
 
-        # Execute exiftool command to set metadata
-        exiftool_command.append(file_path)
-        subprocess.run(exiftool_command, check=True)
+            # Execute exiftool command to set metadata
+            exiftool_command.append(file_path)
+            subprocess.run(exiftool_command, check=True)
 
         # Set file creation and modification dates
         taken_time = metadata.get("photoTakenTime", {}).get("timestamp")
@@ -75,8 +81,10 @@ def find_matching_file(root, title):
     return None
 
 # Function to parse JSON metadata and apply it to files
-def process_takeout_folder(folder_path):
+def process_takeout_folder(folder_path, sidecar_only=False):
     for root, _, files in os.walk(folder_path):
+        # Sidecars are written in one batch per directory
+        sidecars = SidecarBatch() if sidecar_only else None
         for file_name in files:
             if file_name.endswith(".json"):
                 json_path = os.path.join(root, file_name)
@@ -91,15 +99,17 @@ def process_takeout_folder(folder_path):
                     media_file_path = find_matching_file(root, title)
 
                     if media_file_path:
-                        apply_metadata(media_file_path, metadata, json_path)
+                        apply_metadata(media_file_path, metadata, json_path, sidecars)
                     else:
                         log_failure(json_path, None, "Media file not found")
 
                 except Exception as e:
                     log_failure(json_path, None, f"JSON processing error: {e}")
+        if sidecars:
+            sidecars.flush()
 
 # Function to retry failed files
-def retry_failed_files():
+def retry_failed_files(sidecar_only=False):
     if not os.path.exists(failed_log_path):
         print("No failed log file found.")
         return
@@ -110,6 +120,7 @@ def retry_failed_files():
     # Clear the log file for next retry attempt
     open(failed_log_path, "w").close()
 
+    sidecars = SidecarBatch() if sidecar_only else None
     for line in lines:
         try:
             parts = line.strip().split(", ")
@@ -126,21 +137,28 @@ def retry_failed_files():
                 media_file_path = find_matching_file(os.path.dirname(json_path), title)
 
             if media_file_path:
-                apply_metadata(media_file_path, metadata, json_path)
+                apply_metadata(media_file_path, metadata, json_path, sidecars)
             else:
                 log_failure(json_path, None, "Media file not found during retry")
 
         except Exception as e:
             log_failure(json_path, None, f"Retry error: {e}")
+    if sidecars:
+        sidecars.flush()
 
 # Run the script
+parser = argparse.ArgumentParser(description="Apply Google Takeout JSON metadata to media files.")
+parser.add_argument("--sidecar-only", action="store_true",
+                    help="Write dates, descriptions and GPS to .xmp sidecars instead of rewriting the media files.")
+args = parser.parse_args()
+
 print("Processing Takeout folder...")
-process_takeout_folder(base_path)
+process_takeout_folder(base_path, sidecar_only=args.sidecar_only)
 print("Processing complete.")
 
 # Uncomment the line below to retry failed files
 # print("Retrying failed files...")
-# retry_failed_files()
+# retry_failed_files(sidecar_only=args.sidecar_only)
 # print("Retry complete.")
 
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for filename_dates.get_date_from_filename
+Times the compiled-regex engine over synthetic filenames and compares it with the previous
+prefix-tuple implementation (timed on a sample, since it costs milliseconds per call).
+
+Usage: python3 benchmark_filename_dates.py [--count 1000000] [--legacy-sample 2000]
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime
+
+from filename_dates import get_date_from_filename
+
+
+def legacy_get_date_from_filename(filename):
+    # The implementation previously copied into fix_file_dates_and_folders.py and organize_*.py
+    try:
+        if filename.startswith(tuple(f"{year}-{month:02d}-{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
+            date_part = filename[:10]
+            year, month, day = date_part.split("-")
+            if (year.isdigit() and month.isdigit() and day.isdigit() and
+                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
+
+        if filename.startswith("WP_") and len(filename) > 11:
+            date_part = filename[3:11]
+            year = date_part[:4]
+            month = date_part[4:6]
+            day = date_part[6:8]
+            if (year.isdigit() and month.isdigit() and day.isdigit() and
+                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
+
+        if filename.startswith(tuple(f"{year}{month:02d}{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
+            date_part = filename[:8]
+            year = date_part[:4]
+            month = date_part[4:6]
+            day = date_part[6:8]
+            if (year.isdigit() and month.isdigit() and day.isdigit() and
+                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
+
+        if "_" in filename:
+            date_part = filename.split("_", 3)[:3]
+            if len(date_part) == 3 and len(date_part[0]) == 4 and len(date_part[1]) == 2 and len(date_part[2]) == 2:
+                year, month, day = date_part
+                if (year.isdigit() and month.isdigit() and day.isdigit() and
+                    2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
+                    return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
+        return None
+    except (ValueError, IndexError):
+        return None
+
+
+def synthetic_filenames(count, seed=1):
+    """Generate a realistic mix of dated and undated media filenames"""
+    rng = random.Random(seed)
+    templates = [
+        "{y}-{m:02d}-{d:02d} 12.16.44.jpg",
+        "{y}{m:02d}{d:02d}_025359000_iOS.jpg",
+        "{y}_{m:02d}_{d:02d}_party.jpg",
+        "WP_{y}{m:02d}{d:02d}_10_15_40_Pro.jpg",
+        "IMG_{y}{m:02d}{d:02d}_123456.jpg",
+        "PXL_{y}{m:02d}{d:02d}_123456789.mp4",
+        "IMG_{n:04d}.HEIC",
+        "DSC{n:05d}.JPG",
+        "GOPR{n:04d}.MP4",
+    ]
+    names = []
+    for _ in range(count):
+        names.append(rng.choice(templates).format(
+            y=rng.randint(2000, 2029), m=rng.randint(1, 12), d=rng.randint(1, 28), n=rng.randint(0, 9999)
+        ))
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filename date extraction.")
+    parser.add_argument("--count", type=int, default=1_000_000, help="Number of synthetic filenames (default: 1000000)")
+    parser.add_argument("--legacy-sample", type=int, default=2000,
+                        help="Filenames timed with the legacy implementation (default: 2000)")
+    args = parser.parse_args()
+
+    names = synthetic_filenames(args.count)
+
+    start = time.perf_counter()
+    matched = sum(1 for name in names if get_date_from_filename(name))
+    new_seconds = time.perf_counter() - start
+
+    sample = names[:args.legacy_sample]
+    start = time.perf_counter()
+    legacy_results = [legacy_get_date_from_filename(name) for name in sample]
+    legacy_seconds = (time.perf_counter() - start) * len(names) / len(sample)
+
+    mismatches = [name for name, legacy in zip(sample, legacy_results)
+                  if legacy and get_date_from_filename(name) != legacy]
+
+    print(f"Filenames:            {len(names):,} ({matched:,} with a date)")
+    print(f"Compiled regex:       {new_seconds:.2f}s ({new_seconds / len(names) * 1e6:.2f} us/file)")
+    print(f"Legacy (extrapolated from {len(sample):,}): {legacy_seconds:.0f}s ({legacy_seconds / len(names) * 1e6:.0f} us/file)")
+    print(f"Speedup:              {legacy_seconds / new_seconds:,.0f}x")
+    print(f"Mismatches vs legacy: {len(mismatches)}")
+
+
+if __name__ == "__main__":
+    main()
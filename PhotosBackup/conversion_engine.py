@@ -0,0 +1,1139 @@
+#!/usr/bin/env python3
+"""
+Conversion Engine
+Shared implementation of the convert_all_* scripts. The directory walk runs in the main
+process and feeds two pools:
+
+- a process pool for image -> HEIC encodes (Pillow/pillow_heif is CPU bound and holds the GIL)
+- a separately sized thread pool for video jobs; each job drives its own ffmpeg process
+
+Output placement (<output>/YYYY/MM/DD/...) and move_to_processed are unchanged: the source is
+moved to <processed>/YYYY/MM/DD once its job has finished. Each convert_all_* script is a
+ConversionConfig plus its folders, run through run_from_command_line().
+"""
+
+import io
+import os
+import time
+import heapq
+import argparse
+import tempfile
+import subprocess
+import threading
+import contextlib
+import multiprocessing
+import concurrent.futures
+from dataclasses import dataclass, replace
+from typing import Optional, Tuple
+from PIL import Image
+from pillow_heif import register_heif_opener
+from datetime import datetime
+import re
+from cpu_budget import CpuBudget
+from conversion_journal import JOURNAL_FILE, STATE_CONVERTED, STATE_CONVERTING, STATE_DONE, ConversionJournal
+from date_patcher import patch_file_dates
+from date_resolver import METADATA_PATH_SOURCES, SOURCE_PRIORITY, DateResolver, read_metadata_dates
+from encoder_calibration import load_profile, profile_video_args
+from ffmpeg_progress import DEFAULT_STALL_TIMEOUT, FfmpegStalled, ProgressBoard, run_ffmpeg
+from hashed_copy import FsyncBatch, copy_with_hash, move_file, same_volume
+from heif_metadata import leftover_tag_args, prepare_for_heif
+from image_policy import IMAGE_STATS_FILE, ImagePolicy
+from memory_budget import MemoryBudget, estimate_decode_mb
+from output_verifier import OutputVerifier, VerificationFailed
+from savings_estimator import SavingsTracker, estimate_output_size
+from scratch_staging import ScratchStaging
+from segment_encoder import DEFAULT_SEGMENTS, encode_segmented, should_segment
+from transcode_planner import plan_transcode, summarize_folder
+from video_probe import media_duration, probe_media
+from volume_io import VolumeLimiter, parse_volume_limits, volume_of
+
+# Register HEIF support with Pillow
+register_heif_opener()
+
+CORRUPTED_LOG = "corrupted_videos.log"
+
+def ensure_unique_filename(output_path):
+    """Add a numeric suffix to the filename if it already exists."""
+    if not os.path.exists(output_path):
+        return output_path
+
+    base, ext = os.path.splitext(output_path)
+    counter = 1
+    new_output_path = f"{base}_{counter}{ext}"
+
+    while os.path.exists(new_output_path):
+        counter += 1
+        new_output_path = f"{base}_{counter}{ext}"
+
+    return new_output_path
+
+def preserve_timestamps(src, dest):
+    """Preserve the original file's creation and modification timestamps (POSIX)."""
+    try:
+        stat = os.stat(src)
+        os.utime(dest, (stat.st_atime, stat.st_mtime))
+    except Exception as e:
+        print(f"Error preserving timestamps for {dest}: {e}")
+
+def move_to_processed(src, processed_root, date_folder):
+    """Move the source file to the processed folder organized by date (the already resolved YYYY/MM/DD)."""
+    try:
+        processed_folder = os.path.join(processed_root, date_folder)
+        os.makedirs(processed_folder, exist_ok=True)
+        destination_path = ensure_unique_filename(
+            os.path.join(processed_folder, os.path.basename(src))
+        )
+        move_file(src, destination_path)  # across volumes: one read, fsynced before the source is removed
+        print(f"Moved to processed folder: {destination_path}")
+    except Exception as e:
+        print(f"Error moving file {src} to processed folder: {e}")
+
+def convert_image_to_heic(input_path, output_path, save_params=None, volumes=None):
+    """
+    Convert an image to HEIC format. 'save_params' are extra pillow_heif save options
+    (e.g. {"quality": 60, "enc_params": {"preset": "fast"}}), as chosen by image_policy.
+    EXIF, XMP and the ICC profile are embedded at save time and the orientation is applied to
+    the pixels (heif_metadata); only what leftover_tag_args() reports is copied by ExifTool later.
+    With a VolumeLimiter ('volumes'), the source is read and the output written in one go, each
+    holding a slot on its volume; the encode itself runs from and to memory, which
+    estimate_decode_mb(buffered=True) counts.
+    """
+    try:
+        output_path = ensure_unique_filename(output_path)
+        source, target = input_path, output_path
+        if volumes:
+            with volumes.io([input_path], os.path.getsize(input_path)), open(input_path, "rb") as f:
+                source = io.BytesIO(f.read())
+            target = io.BytesIO()
+        with Image.open(source) as image:
+            upright, metadata = prepare_for_heif(image)
+            try:
+                upright.save(target, format="HEIF", **metadata, **(save_params or {}))
+            finally:
+                if upright is not image:
+                    upright.close()
+        if volumes:
+            source = None  # free the source bytes before writing
+            data = target.getbuffer()  # written without another copy of the output
+            with volumes.io([output_path], data.nbytes), open(output_path, "wb") as f:
+                f.write(data)
+            data.release()
+        print(f"Image converted: {output_path}")
+        return output_path
+    except Exception as e:
+        print(f"Error converting image {input_path}: {e}")
+        return None
+
+def hevc_video_args(target_bitrate="8000k", quality=None, profile=None):
+    """
+    ffmpeg video encoder options: VideoToolbox HEVC at 'target_bitrate', or at -q:v 'quality' if set.
+    With a calibrated encoder profile (encoder_calibration), its libx265 preset and CRF instead.
+    """
+    if profile:
+        return profile_video_args(profile)
+    rate_args = ["-q:v", str(quality)] if quality is not None else ["-b:v", target_bitrate]
+    return ["-c:v", "hevc_videotoolbox"] + rate_args
+
+def convert_video_to_hevc(input_path, output_path, target_bitrate="8000k", quality=None,
+                          segment_threshold=None, segments=DEFAULT_SEGMENTS, copy_audio=False, probe=None,
+                          stall_timeout=None, progress=None, profile=None, threads=None):
+    """
+    Convert a video to HEVC (H.265) format using hardware acceleration (VideoToolbox) on M1/M2 Macs.
+    Encodes at 'target_bitrate', or with quality-based encoding (-q:v, 0-100) if 'quality' is set;
+    an encoder 'profile' from encoder_calibration replaces both with its libx265 settings.
+    With 'copy_audio' the audio is stream-copied (already AAC) instead of re-encoded.
+    Videos of at least 'segment_threshold' seconds are split at keyframes and encoded as
+    'segments' parallel pieces (segment_encoder); if that fails, the single encode below is used
+    (a stalled segment step raises FfmpegStalled like the single encode).
+    'probe' is an optional probe_media() result, so the file is not probed twice.
+    Progress is reported to the ProgressBoard 'progress'; an encode that makes no progress for
+    'stall_timeout' seconds is killed, its partial output removed and FfmpegStalled raised.
+    'threads' (from the CPU budget) caps ffmpeg's decoder and encoder threads; segments share them.
+    Metadata is copied afterwards by fix_metadata_date(..., tags_from=input_path).
+    """
+    try:
+        output_path = ensure_unique_filename(output_path)
+        video_args = hevc_video_args(target_bitrate, quality, profile)
+        thread_args = ["-threads", str(threads)] if threads else []
+
+        if segment_threshold is not None:
+            probe = probe or probe_media(input_path)
+            duration = media_duration(probe)
+            if should_segment(duration, segment_threshold, segments):
+                print(f"Starting segmented video conversion ({segments} parts, {duration / 60:.0f} min): {input_path} -> {output_path}")
+                segment_args = video_args + (["-threads", str(max(1, threads // segments))] if threads else [])
+                if encode_segmented(input_path, output_path, segment_args, segments, probe, stall_timeout, progress):
+                    print(f"Video converted: {output_path}")
+                    return output_path
+                print(f"Segmented conversion failed, converting in one piece: {input_path}")
+
+        print(f"Starting hardware-accelerated video conversion: {input_path} -> {output_path}")
+
+        # Use VideoToolbox hardware-accelerated HEVC encoding
+        run_ffmpeg(
+            [
+                "ffmpeg"] + thread_args + ["-i", input_path, 
+            ] + video_args + thread_args + [   # VideoToolbox HEVC at the target bitrate or quality level
+                "-c:a", "copy" if copy_audio else "aac",  # Audio codec (AAC is copied as-is)
+                "-tag:v", "hvc1",              # Tag for HEVC compatibility
+                output_path
+            ],
+            os.path.basename(input_path), media_duration(probe), stall_timeout, progress
+        )
+        print(f"Video converted: {output_path}")
+        return output_path
+
+    except subprocess.CalledProcessError as e:
+        print(f"Error converting video {input_path}: {e}")
+        return None
+    except FfmpegStalled:
+        with contextlib.suppress(OSError):
+            os.remove(output_path)
+        raise
+
+def remux_video(input_path, output_path, plan, stall_timeout=None, progress=None):
+    """
+    Stream-copy an HEVC video into an MP4 container tagged hvc1 (no video re-encode).
+    The audio is copied or encoded as the transcode plan says. Stalls are handled as in
+    convert_video_to_hevc().
+    """
+    try:
+        output_path = ensure_unique_filename(output_path)
+        print(f"Remuxing video ({plan.reason}): {input_path} -> {output_path}")
+        run_ffmpeg(
+            ["ffmpeg", "-i", input_path] + plan.ffmpeg_stream_args([]) + [output_path],
+            os.path.basename(input_path), plan.duration, stall_timeout, progress
+        )
+        print(f"Video remuxed: {output_path}")
+        return output_path
+    except subprocess.CalledProcessError as e:
+        print(f"Error remuxing video {input_path}: {e}")
+        return None
+    except FfmpegStalled:
+        with contextlib.suppress(OSError):
+            os.remove(output_path)
+        raise
+
+def copy_file_to_output(input_path, output_path, also_to=(), fsync_batch=None):
+    """
+    Copy file to output directory and preserve timestamps; 'also_to' paths are written from the
+    same read. Returns the output path and the sha256 of the contents. Only the output is added
+    to 'fsync_batch'; making the 'also_to' copies durable is left to the caller.
+    """
+    output_path = ensure_unique_filename(output_path)
+    result = copy_with_hash(input_path, [output_path, *also_to])
+    if fsync_batch:
+        fsync_batch.add(output_path, result.nbytes)
+    print(f"File already in target format. Copied to: {output_path}")
+    return output_path, result.digest
+
+#
+# HELPER FUNCTIONS FOR FIXING METADATA & FILESYSTEM DATES
+#
+
+def fix_metadata_date(file_path, folder_date_str, metadata_dates=None, tags_from=None, tag_args=None):
+    """
+    Ensure the file's metadata and file-system creation date match the 'folder_date_str' (YYYY/MM/DD).
+    Keep the same time from the file's metadata if possible; otherwise default to 00:00:00.
+
+    'metadata_dates' is a read_metadata_dates() result describing the file's current tags; pass it
+    when it is already known (e.g. read from the source before a copy) to skip reading the file.
+    'tags_from' names a source file whose tags are copied in the same ExifTool call as the date fix
+    (only the groups in 'tag_args', e.g. ["-IPTC:all"], if given).
+    The final date/time is computed in memory, so the file is written at most once and never re-read.
+    When only the date changes, the fixed-width date fields are patched in place (date_patcher)
+    and ExifTool is used only if the file's layout does not allow that.
+
+    On macOS, also adjusts the file's 'creation date' using SetFile (Xcode Command Line Tools).
+    Returns the final datetime, or None if it could not be determined.
+    """
+    # folder_date_str is something like '2023/08/25'
+    # Parse into year, month, day
+    try:
+        folder_year, folder_month, folder_day = folder_date_str.split('/')
+        folder_year, folder_month, folder_day = int(folder_year), int(folder_month), int(folder_day)
+    except ValueError:
+        print(f"Could not parse folder date: {folder_date_str}")
+        return None
+
+    # Convert folder_date_str into 'YYYY:MM:DD' format
+    folder_exif_date = f"{folder_year:04d}:{folder_month:02d}:{folder_day:02d}"
+
+    # 1) Find the existing metadata date/time (DateTimeOriginal first, then CreateDate).
+    if metadata_dates is None:
+        metadata_dates = read_metadata_dates(file_path)
+
+    metadata_datetime_str = None
+    metadata_tag = None
+    for tag in ("DateTimeOriginal", "CreateDate"):
+        value = metadata_dates.get(tag, "")
+        # if it looks like "YYYY:MM:DD HH:MM:SS"
+        if re.match(r"^\d{4}:\d{2}:\d{2}\s+\d{2}:\d{2}:\d{2}$", value):
+            metadata_datetime_str = value
+            metadata_tag = tag
+            break
+
+    # 2) Work out the final date/time in memory.
+    new_datetime_str = None
+    if metadata_datetime_str:
+        # e.g. "2023:08:25 12:34:56"
+        date_part, time_part = metadata_datetime_str.split()
+        if date_part != folder_exif_date:
+            # Update metadata with the correct date, keep the same time
+            new_datetime_str = f"{folder_exif_date} {time_part}"
+    else:
+        # If we can't parse any valid date/time from metadata, set a default time
+        new_datetime_str = f"{folder_exif_date} 00:00:00"
+
+    # 3) Only the date of an existing field changes: patch it in place if the layout allows it.
+    #    Otherwise a single ExifTool write covers both the tag copy and the date correction.
+    final_datetime_str = metadata_datetime_str
+    if new_datetime_str and metadata_tag and not tags_from:
+        new_datetime = datetime.strptime(new_datetime_str, "%Y:%m:%d %H:%M:%S")
+        if patch_file_dates(file_path, new_datetime, required=metadata_tag):
+            print(f"Patched metadata timestamps in place for {file_path} => {new_datetime_str}")
+            final_datetime_str = new_datetime_str
+            new_datetime_str = None
+    if tags_from or new_datetime_str:
+        if _write_metadata(file_path, new_datetime_str, tags_from, tag_args) and new_datetime_str:
+            final_datetime_str = new_datetime_str
+
+    # 4) Adjust the OS-level file times (and creation date if on macOS) from the value we just wrote.
+    if not final_datetime_str:
+        return None
+    dt = datetime.strptime(final_datetime_str, "%Y:%m:%d %H:%M:%S")
+    _update_filesystem_times(file_path, dt)
+    return dt
+
+
+def _write_metadata(file_path, new_datetime_str=None, tags_from=None, tag_args=None):
+    """
+    Write the file's metadata with one exiftool invocation.
+    If 'tags_from' is given, all tags are copied from that file (or only the groups in 'tag_args',
+    e.g. ["-IPTC:all"]); if 'new_datetime_str' is given
+    (e.g. '2023:08:25 12:34:56'), the EXIF date fields are set to it. The assignments come after
+    -tagsFromFile on the command line, so they take precedence over the copied dates.
+    Returns True on success.
+    """
+    date_args = []
+    if new_datetime_str:
+        date_args = [
+            f"-DateTimeOriginal={new_datetime_str}",
+            f"-CreateDate={new_datetime_str}",
+            f"-ModifyDate={new_datetime_str}",
+        ]
+    copy_args = ["-tagsFromFile", tags_from] + list(tag_args or []) if tags_from else []
+
+    try:
+        subprocess.run(
+            ["exiftool", "-overwrite_original"] + copy_args + date_args + [file_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        print(f"Updated metadata for {file_path}" + (f" => {new_datetime_str}" if new_datetime_str else ""))
+        return True
+    except subprocess.CalledProcessError as e:
+        if not tags_from:
+            print(f"Error updating EXIF metadata for {file_path}: {e}")
+            return False
+        print(f"Error copying all metadata for {file_path}: {e}")
+        print("Attempting to copy basic metadata only...")
+
+    # Fallback to copying basic metadata tags, still in a single write
+    try:
+        subprocess.run(
+            [
+                "exiftool",
+                "-overwrite_original",
+                "-tagsFromFile", tags_from,
+                "-EXIF:DateTimeOriginal",
+                "-EXIF:CreateDate",
+                "-EXIF:ModifyDate",
+            ] + date_args + [file_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            check=True
+        )
+        print(f"Basic metadata copied successfully: {file_path}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Error copying basic metadata for {file_path}: {e}")
+        return False
+
+def _update_filesystem_times(file_path, dt):
+    """
+    Update the OS-level file timestamps. On macOS, we also set the 'creation date' via SetFile.
+    If not on macOS or 'SetFile' is unavailable, you can remove/comment out those subprocess calls.
+    """
+    try:
+        # For standard POSIX (atime, mtime), use os.utime:
+        mod_time = dt.timestamp()
+        os.utime(file_path, (mod_time, mod_time))
+
+        # On macOS, we can update the 'creation date' using SetFile (both dates in one call).
+        dt_str_for_setfile = dt.strftime("%m/%d/%Y %H:%M:%S")  # e.g. "08/25/2023 12:34:56"
+        subprocess.run(["SetFile", "-d", dt_str_for_setfile, "-m", dt_str_for_setfile, file_path], check=True)
+        print(f"OS-level creation/modified date updated (macOS) for {file_path} => {dt_str_for_setfile}")
+
+    except FileNotFoundError:
+        # 'SetFile' not found or not on macOS
+        pass
+    except subprocess.CalledProcessError as e:
+        print(f"Error updating macOS creation date for {file_path}: {e}")
+
+def copy_metadata(input_path, output_path, tag_args=None):
+    """Copy all tags (or the groups in 'tag_args') from 'input_path' to 'output_path' (basic EXIF dates as a fallback)."""
+    return _write_metadata(output_path, tags_from=input_path, tag_args=tag_args)
+
+#
+# PARALLEL CONVERSION ENGINE
+#
+
+ORDER_POLICIES = ("date", "largest", "window")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tiff", ".bmp", ".gif", ".cr2", ".dng", ".heic")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".mpeg", ".webm", ".3gp", ".mts", ".m4v")
+
+@dataclass
+class ConversionConfig:
+    """What a convert_all_* script converts, how, and in which order."""
+    image_extensions: Tuple[str, ...] = IMAGE_EXTENSIONS  # .heic listed here is copied, not converted
+    video_extensions: Tuple[str, ...] = VIDEO_EXTENSIONS
+    dated_folders: bool = True     # walk <input>/YYYY/MM/DD only; False walks the whole tree
+    newest_first: bool = False     # order of the YYYY/MM/DD folders
+    copy_hevc: bool = True         # copy (or remux) videos that are already HEVC instead of re-encoding them
+    target_bitrate: str = "8000k"
+    video_quality: Optional[int] = None  # -q:v (0-100) instead of target_bitrate
+    encoder_profile: Optional[str] = None  # calibrated libx265 profile (encoder_calibration.py) instead of both
+    fix_dates: bool = False        # align metadata/file dates with the date folder (convert_all_fix)
+    segment_threshold: Optional[float] = None  # seconds; longer videos are encoded as parallel segments
+    segments: int = DEFAULT_SEGMENTS
+    min_savings: Optional[float] = None  # percent; videos predicted to shrink less are copied, not encoded
+    sample_seconds: float = 0      # seconds of sample encode used by the size prediction (0 = model only)
+    image_min_savings: Optional[float] = None  # percent; image buckets that historically save less are copied
+    image_stats_file: Optional[str] = IMAGE_STATS_FILE  # per-format/size conversion history (image_policy)
+    order: str = "date"            # job order: one of ORDER_POLICIES (see order_files)
+    order_window: int = 64         # files looked ahead by the "window" order
+    ordered_commit: bool = False   # move sources to processed strictly in date order, whatever the job order
+    extra_date_sources: bool = False  # also date files by their Takeout JSON and filename (default: metadata, path, mtime)
+    journal_file: Optional[str] = None  # SQLite journal so reruns skip finished work, e.g. JOURNAL_FILE (None: off)
+    scratch_gb: Optional[float] = None  # stage inputs on local scratch space of this size (None: off)
+    scratch_dir: Optional[str] = None   # default: <tmp>/convert_scratch
+    output_batch_mb: float = 512   # staged outputs are moved to the output folder in batches of this size
+    stall_timeout: Optional[float] = DEFAULT_STALL_TIMEOUT  # kill ffmpeg after this many seconds without progress
+    progress_interval: float = 60  # seconds between live ffmpeg progress summaries
+    failed_dir: Optional[str] = None  # sources of stalled or unverifiable conversions (default: "failed" next to the processed folder)
+    verify: bool = False           # check every conversion output (output_verifier.py)
+
+def _file_size(file_path):
+    try:
+        return os.path.getsize(file_path)
+    except OSError:
+        return 0
+
+def order_files(files, order="date", window=64):
+    """
+    Reorder (sequence, path) pairs from the date-ordered walk:
+    - "date": unchanged
+    - "largest": every file, largest first (LPT), so big encodes start early and small jobs fill the gaps
+    - "window": chronological, but the largest of the next 'window' files runs first
+    """
+    if order == "date":
+        yield from files
+    elif order == "largest":
+        yield from sorted(files, key=lambda item: (-_file_size(item[1]), item[0]))
+    elif order == "window":
+        heap = []
+        for seq, file_path in files:
+            heapq.heappush(heap, (-_file_size(file_path), seq, file_path))
+            if len(heap) >= window:
+                _, seq, file_path = heapq.heappop(heap)
+                yield seq, file_path
+        while heap:
+            _, seq, file_path = heapq.heappop(heap)
+            yield seq, file_path
+    else:
+        raise ValueError(f"Unknown order '{order}' (expected one of {', '.join(ORDER_POLICIES)})")
+
+_worker_volumes = None
+
+def init_image_worker(volumes):
+    """Process-pool initializer: share the engine's VolumeLimiter (or None) with the worker."""
+    global _worker_volumes
+    _worker_volumes = volumes
+
+def convert_image_job(input_path, output_path, date_folder, metadata_dates, fix_dates, save_params=None,
+                      verify=False):
+    """
+    Image worker (runs in the process pool): encode, then copy tags / fix dates.
+    With 'verify', the output is decoded and compared with the source (output_verifier); a bad
+    output is removed and VerificationFailed raised.
+    Returns (output, True, encode CPU-seconds).
+    """
+    start = time.process_time()
+    output_path = convert_image_to_heic(input_path, output_path, save_params, _worker_volumes)
+    encode_seconds = time.process_time() - start
+    if not output_path:
+        return None, True, encode_seconds
+    # EXIF/XMP/ICC are already embedded; ExifTool only copies what could not be (None: nothing)
+    tag_args = leftover_tag_args(input_path)
+    if fix_dates:
+        preserve_timestamps(input_path, output_path)
+        fix_metadata_date(output_path, date_folder, metadata_dates,
+                          tags_from=input_path if tag_args is not None else None, tag_args=tag_args)
+    else:
+        if tag_args is not None:
+            copy_metadata(input_path, output_path, tag_args)
+        preserve_timestamps(input_path, output_path)
+    if verify:
+        # Workers do not share the verification cache; a fresh output is never cached anyway
+        result = OutputVerifier(cache_file=None).verify(output_path, input_path)
+        if not result.ok:
+            os.remove(output_path)
+            raise VerificationFailed(f"{output_path} failed verification (tier {result.tier}): {result.reason}")
+    return output_path, True, encode_seconds
+
+class ConversionEngine:
+    """
+    Walks the input folders in date order and runs image and video jobs concurrently.
+    Output names are reserved in the main process, so parallel jobs never pick the same
+    '<name>_<n>' suffix for files that convert to the same output name.
+    """
+
+    def __init__(self, config, image_workers=None, video_workers=2, max_decode_mb=None, volume_limits=None,
+                 cpu_cores=None, max_ffmpeg_threads=None):
+        self.config = config
+        self.image_workers = image_workers or os.cpu_count() or 1
+        # One budget of cores for image encodes, ffmpeg -threads and ExifTool (None: no budget; 0: all cores)
+        self.cpu = None
+        if cpu_cores is not None:
+            self.cpu = CpuBudget(cpu_cores or None, video_workers, max_ffmpeg_threads)
+            self.image_workers = min(self.image_workers, self.cpu.cores)
+        # Image jobs are admitted only while their estimated decode memory fits (None: no limit)
+        self.memory = MemoryBudget(max_decode_mb) if max_decode_mb else None
+        # Per-volume I/O slots, e.g. {"/Volumes/G-DRIVE": 1}; created in run() (None: no limits)
+        self.volume_limits = volume_limits or {}
+        self.volumes = None
+        self.video_workers = video_workers
+        self.resolver = DateResolver(sources=SOURCE_PRIORITY if config.extra_date_sources else METADATA_PATH_SOURCES)
+        self.savings = SavingsTracker()
+        self.encoder_profile = load_profile(config.encoder_profile) if config.encoder_profile else None
+        self.progress = ProgressBoard()
+        # Only fresh outputs are verified, whose results are never cached
+        self.verifier = OutputVerifier(cache_file=None) if config.verify else None
+        self.image_policy = ImagePolicy(config.image_stats_file, config.image_min_savings)
+        self._reserved = set()
+        self._reserve_lock = threading.Lock()
+        self.converted = 0
+        self.copied = 0
+        self.failed = 0
+        self.stalled = 0
+        self.unverified = 0
+        self.resumed = 0
+        self.journal = None
+        self._fingerprints = {}
+        self._sources = {}  # staged copy -> original source path
+        self.staging = None
+        self.output_dir = None
+        self.processed_dir = None
+        self.fsync = FsyncBatch()
+        self._processed_copies = {}  # source -> its copy in the processed folder, written with its output
+        self._commit_next = 0
+        self._commit_ready = {}
+
+    def reserve_output(self, output_path):
+        """Pick a unique output path that is neither on disk nor claimed by a running job."""
+        with self._reserve_lock:
+            base, ext = os.path.splitext(output_path)
+            candidate, counter = output_path, 0
+            while candidate in self._reserved or self._output_exists(candidate):
+                counter += 1
+                candidate = f"{base}_{counter}{ext}"
+            self._reserved.add(candidate)
+            return candidate
+
+    def _output_exists(self, output_path):
+        """True if output_path exists, or (for a staged output) its final destination does."""
+        if os.path.exists(output_path):
+            return True
+        return bool(self.staging and self.staging.is_staged_output(output_path)
+                    and os.path.exists(self.staging.final_path(output_path, self.output_dir)))
+
+    def release_output(self, output_path):
+        """Forget a reservation once its job has finished (the file now exists, or never will)."""
+        with self._reserve_lock:
+            self._reserved.discard(output_path)
+
+    def iter_source_files(self, input_dir):
+        """Yield the source files in processing order."""
+        if not self.config.dated_folders:
+            for root, _, files in os.walk(input_dir):
+                for file in files:
+                    yield os.path.join(root, file)
+            return
+
+        # Collect all date directories in the format YYYY/MM/DD
+        directories_with_dates = []
+        for year_dir in sorted(os.listdir(input_dir)):
+            year_path = os.path.join(input_dir, year_dir)
+            if not year_dir.isdigit() or len(year_dir) != 4:
+                continue
+            for month_dir in sorted(os.listdir(year_path)):
+                month_path = os.path.join(year_path, month_dir)
+                if not month_dir.isdigit() or len(month_dir) != 2:
+                    continue
+                for day_dir in sorted(os.listdir(month_path)):
+                    day_path = os.path.join(month_path, day_dir)
+                    if not day_dir.isdigit() or len(day_dir) != 2:
+                        continue
+                    try:
+                        date_obj = datetime(int(year_dir), int(month_dir), int(day_dir))
+                        directories_with_dates.append((date_obj, day_path))
+                    except ValueError:
+                        # Invalid date
+                        pass
+
+        directories_with_dates.sort(key=lambda x: x[0], reverse=self.config.newest_first)
+        for _, dir_path in directories_with_dates:
+            for file in os.listdir(dir_path):
+                file_path = os.path.join(dir_path, file)
+                if os.path.isfile(file_path):
+                    yield file_path
+
+    def io(self, paths, nbytes=0):
+        """Hold the I/O slots of the volumes touched by paths (a no-op without volume limits)."""
+        return self.volumes.io(paths, nbytes) if self.volumes else contextlib.nullcontext()
+
+    def cpu_lease(self, wanted, kind):
+        """Lease cores from the CPU budget around a block; yields the cores leased (None without a budget)."""
+        return self.cpu.lease(wanted, kind) if self.cpu else contextlib.nullcontext()
+
+    def journal_state(self, input_path, state, output_path=None, date_folder=None, digest=None):
+        """Record a job's progress in the conversion journal (a no-op without one)."""
+        source_path = self._sources.get(input_path, input_path)  # a staged copy is journaled as its source
+        fingerprint = self._fingerprints.get(source_path)
+        if not self.journal or not fingerprint:
+            return
+        if state == STATE_CONVERTING:
+            self.journal.start(fingerprint, source_path, output_path, date_folder)
+        else:
+            self.journal.set_state(source_path, state, output_path, digest)
+
+    def resume(self, file_path):
+        """
+        Check the journal for file_path: returns a finished (output, None) future if an earlier run
+        already converted this file (same path and fingerprint), else None. A partial output left
+        by an interrupted earlier run is removed, so the redo writes the same name instead of a
+        '_1' duplicate. A file with the same contents as another source is converted on its own.
+        """
+        with self.io([file_path]):
+            fingerprint = self.journal.fingerprint(file_path)
+        self._fingerprints[file_path] = fingerprint
+        entry = self.journal.lookup(file_path, fingerprint)
+        if not entry:
+            twin = self.journal.find_fingerprint(fingerprint, file_path)
+            if twin:
+                print(f"{file_path} has the same contents as {twin.source_path}; converting it separately")
+            return None
+        if not entry.output_path or not os.path.exists(entry.output_path):
+            return None
+        if entry.state in (STATE_CONVERTED, STATE_DONE):
+            print(f"Already converted in an earlier run: {file_path} -> {entry.output_path}")
+            future = concurrent.futures.Future()
+            future.set_result((entry.output_path, None))
+            return future, entry.date_folder
+        if entry.run_id == self.journal.run_id:
+            return None  # started by this run, so not interrupted
+        print(f"Removing partial output of an interrupted run: {entry.output_path}")
+        os.remove(entry.output_path)
+        return None
+
+    def copy_job(self, input_path, output_folder, date_folder, metadata_dates):
+        """Copy a file that is already in the target format (HEIC image or HEVC video)."""
+        output_path = self.reserve_output(os.path.join(output_folder, os.path.basename(input_path)))
+        source_path = self._sources.get(input_path, input_path)
+        processed_copy = None
+        if not same_volume(source_path, self.processed_dir):
+            # The move to the processed folder would read the source again: write it from this read
+            processed_folder = os.path.join(self.processed_dir, date_folder)
+            os.makedirs(processed_folder, exist_ok=True)
+            processed_copy = self.reserve_output(os.path.join(processed_folder, os.path.basename(source_path)))
+        try:
+            self.journal_state(input_path, STATE_CONVERTING, output_path, date_folder)
+            also_to = [processed_copy] if processed_copy else []
+            with self.io([input_path, output_path, *also_to], os.path.getsize(input_path)):
+                _, digest = copy_file_to_output(input_path, output_path, also_to, self.fsync)
+            preserve_timestamps(input_path, output_path)
+            if self.config.fix_dates:
+                fix_metadata_date(output_path, date_folder, metadata_dates)
+            self.journal_state(input_path, STATE_CONVERTED, output_path, digest=digest)
+            if processed_copy:
+                self._processed_copies[source_path] = processed_copy
+        except BaseException:
+            if processed_copy:
+                with contextlib.suppress(OSError):
+                    os.remove(processed_copy)
+            raise
+        finally:
+            self.release_output(output_path)
+            if processed_copy:
+                self.release_output(processed_copy)
+        return output_path, False
+
+    def video_job(self, input_path, output_folder, date_folder, metadata_dates):
+        """
+        Video worker (runs in the thread pool). The transcode plan picks the cheapest correct action:
+        copy HEVC in MP4/MOV as-is, remux HEVC from other containers, otherwise drive one ffmpeg
+        encode (stream-copying AAC audio).
+        """
+        probe = probe_media(input_path)
+        plan = plan_transcode(input_path, probe, reencode_hevc=not self.config.copy_hevc) if probe else None
+        if plan:
+            print(f"Transcode plan for {input_path}: {plan.describe()}")
+            if plan.action == "copy":
+                return self.copy_job(input_path, output_folder, date_folder, metadata_dates)
+
+        estimate = None
+        if plan and plan.action == "encode" and self.config.min_savings is not None:
+            estimate = estimate_output_size(
+                input_path, probe,
+                hevc_video_args(self.config.target_bitrate, self.config.video_quality, self.encoder_profile),
+                self.config.target_bitrate, self.config.video_quality, plan.audio == "copy", self.config.sample_seconds,
+                bits_per_pixel=self.encoder_profile.get("bits_per_pixel") if self.encoder_profile else None
+            )
+            if estimate:
+                print(f"Predicted output for {input_path}: {estimate.predicted_bytes / 1e6:.1f} MB "
+                      f"of {estimate.source_bytes / 1e6:.1f} MB ({estimate.savings_percent:.0f}% saved, {estimate.method})")
+                if estimate.savings_percent < self.config.min_savings:
+                    self.savings.record_skip(estimate)
+                    return self.copy_job(input_path, output_folder, date_folder, metadata_dates)
+
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        remux = plan is not None and plan.action == "remux"
+        reserved_path = self.reserve_output(os.path.join(output_folder, f"{stem}{'.mp4' if remux else '_hevc.mp4'}"))
+        try:
+            self.journal_state(input_path, STATE_CONVERTING, reserved_path, date_folder)
+            if remux:
+                with self.cpu_lease(1, "ffmpeg"):
+                    output_path = remux_video(input_path, reserved_path, plan,
+                                              self.config.stall_timeout, self.progress)
+            else:
+                with self.cpu_lease(self.cpu.ffmpeg_share() if self.cpu else None, "ffmpeg") as threads:
+                    output_path = convert_video_to_hevc(
+                        input_path, reserved_path, self.config.target_bitrate, self.config.video_quality,
+                        self.config.segment_threshold, self.config.segments,
+                        copy_audio=plan is not None and plan.audio == "copy", probe=probe,
+                        stall_timeout=self.config.stall_timeout, progress=self.progress,
+                        profile=self.encoder_profile, threads=threads
+                    )
+            if output_path:
+                if estimate:
+                    self.savings.record_encode(estimate, os.path.getsize(output_path))
+                with self.cpu_lease(1, "exiftool"):
+                    if self.config.fix_dates:
+                        preserve_timestamps(input_path, output_path)
+                        fix_metadata_date(output_path, date_folder, metadata_dates, tags_from=input_path)
+                    else:
+                        copy_metadata(input_path, output_path)
+                        preserve_timestamps(input_path, output_path)
+                if self.verifier:
+                    with self.cpu_lease(1, "verify"):
+                        result = self.verifier.verify(output_path, input_path, probe)
+                    if not result.ok:
+                        os.remove(output_path)
+                        raise VerificationFailed(
+                            f"{output_path} failed verification (tier {result.tier}): {result.reason}"
+                        )
+                self.journal_state(input_path, STATE_CONVERTED, output_path)
+        finally:
+            self.release_output(reserved_path)
+        return output_path, True
+
+    def submit(self, file_path, output_dir, image_pool, video_pool, read_path=None):
+        """
+        Resolve the date and place one source file; returns (future, date_folder) or None.
+        'read_path' is a staged local copy of file_path that the job reads instead.
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        is_image = ext in self.config.image_extensions
+        if not is_image and ext not in self.config.video_extensions:
+            return None
+        if self.journal:
+            resumed = self.resume(file_path)
+            if resumed:
+                return resumed
+
+        resolved = self.resolver.resolve(file_path)
+        date_folder = resolved.folder
+        output_folder = os.path.join(output_dir, date_folder)
+        os.makedirs(output_folder, exist_ok=True)
+
+        # Dates come from the original (path, sidecars); the job reads the staged copy if there is one
+        source = read_path or file_path
+
+        # If image is already HEIC: copy in the thread pool, no encode needed
+        if ext == ".heic":
+            return video_pool.submit(self.copy_job, source, output_folder, date_folder,
+                                     resolved.metadata_dates), date_folder
+        if is_image:
+            plan = self.image_policy.plan(source)
+            if not plan.convert:
+                print(f"Copying {file_path} without conversion: {plan.reason}")
+                return video_pool.submit(self.copy_job, source, output_folder, date_folder,
+                                         resolved.metadata_dates), date_folder
+            output_file = self.reserve_output(
+                os.path.join(output_folder, f"{os.path.splitext(os.path.basename(file_path))[0]}.heic")
+            )
+            source_bytes = os.path.getsize(source)
+            self.journal_state(file_path, STATE_CONVERTING, output_file, date_folder)
+            decode_mb = 0.0
+            if self.memory:
+                decode_mb = estimate_decode_mb(source, buffered=bool(self.volumes))
+                self.memory.acquire(decode_mb)  # blocks until running image jobs have freed enough
+            if self.cpu:
+                self.cpu.acquire(1, "image")  # blocks while ffmpeg and other images hold every core
+            leased_at = time.monotonic()
+            try:
+                future = image_pool.submit(convert_image_job, source, output_file, date_folder,
+                                           resolved.metadata_dates, self.config.fix_dates, plan.save_params,
+                                           self.config.verify)
+            except Exception:
+                if self.memory:
+                    self.memory.release(decode_mb)
+                if self.cpu:
+                    self.cpu.release(1, "image")
+                self.release_output(output_file)
+                raise
+            future.add_done_callback(
+                lambda f: self.image_done(f, file_path, output_file, plan.bucket, source_bytes, decode_mb, leased_at)
+            )
+            return future, date_folder
+        return video_pool.submit(self.video_job, source, output_folder, date_folder,
+                                 resolved.metadata_dates), date_folder
+
+    def image_done(self, future, input_path, output_file, bucket, source_bytes, decode_mb=0.0, leased_at=None):
+        """
+        Release the image job's output name, memory and core; record its result in the journal and
+        the image policy.
+        """
+        self.release_output(output_file)
+        if self.memory:
+            self.memory.release(decode_mb)
+        if self.cpu:
+            self.cpu.release(1, "image", time.monotonic() - leased_at)
+        if future.cancelled() or future.exception():
+            return
+        output_path, _, encode_seconds = future.result()
+        if output_path and os.path.exists(output_path):
+            self.journal_state(input_path, STATE_CONVERTED, output_path)
+            self.image_policy.record(bucket, source_bytes, os.path.getsize(output_path), encode_seconds)
+
+    def finish(self, file_path, future, date_folder, processed_dir):
+        """Record a finished job and move its source to the processed folder."""
+        try:
+            # converted: True (encoded), False (copied) or None (finished by an earlier run);
+            # image jobs also return their encode time
+            output_path, converted = future.result()[:2]
+        except (FfmpegStalled, VerificationFailed) as e:
+            print(f"Giving up on {file_path}: {e}")
+            self.failed += 1
+            if isinstance(e, FfmpegStalled):
+                self.stalled += 1
+            else:
+                self.unverified += 1
+            self.move_to_failed(file_path, date_folder, processed_dir)
+            return
+        except Exception as e:
+            # As in the serial scripts: an unexpected error leaves the source where it is
+            print(f"Error processing file {file_path}: {e}")
+            self.failed += 1
+            self.resolver.forget(file_path)
+            return
+        if not output_path:
+            self.failed += 1
+        elif converted is None:
+            self.resumed += 1
+        elif converted:
+            self.converted += 1
+        else:
+            self.copied += 1
+        if self.staging and output_path and self.staging.is_staged_output(output_path):
+            # The source is moved once its output has reached the output folder with the next batch
+            final_output = self.staging.final_path(output_path, self.output_dir)
+            self.staging.add_output(
+                output_path, final_output,
+                lambda moved: self.complete(file_path, moved, date_folder, processed_dir)
+            )
+            return
+        self.complete(file_path, output_path, date_folder, processed_dir)
+
+    def complete(self, file_path, output_path, date_folder, processed_dir):
+        """Move a finished job's source to the processed folder and mark it done in the journal."""
+        if self.staging and output_path:
+            self.journal_state(file_path, STATE_CONVERTED, output_path)  # its final location
+        processed_copy = self._processed_copies.pop(file_path, None)
+        if processed_copy:
+            # Written by the copy job: only the source is left to remove, once its copy is durable
+            # (when the batch is full, or at the end of the run)
+            self.fsync.add(processed_copy, os.path.getsize(processed_copy),
+                           on_durable=lambda: self.processed_copy_durable(file_path, processed_copy))
+            return
+        moved_bytes = 0
+        if self.volumes and volume_of(file_path) != volume_of(processed_dir):
+            moved_bytes = os.path.getsize(file_path)  # a move across volumes is a copy
+        with self.io([file_path, processed_dir], moved_bytes):
+            move_to_processed(file_path, processed_dir, date_folder)
+        self.done(file_path)
+
+    def processed_copy_durable(self, file_path, processed_copy):
+        """FsyncBatch callback: the processed copy is on disk, so the source can go."""
+        try:
+            os.remove(file_path)
+            print(f"Moved to processed folder: {processed_copy}")
+        except OSError as e:
+            print(f"Error removing {file_path} after copying it to {processed_copy}: {e}")
+            return
+        self.done(file_path)
+
+    def done(self, file_path):
+        """Mark a source done in the journal and drop what was cached for it."""
+        self.journal_state(file_path, STATE_DONE)
+        self._fingerprints.pop(file_path, None)
+        self.resolver.forget(file_path)
+
+    def move_to_failed(self, file_path, date_folder, processed_dir):
+        """Move the source of a stalled or unverifiable conversion to the failed folder, so reruns skip it."""
+        failed_dir = self.config.failed_dir or os.path.join(os.path.dirname(os.path.abspath(processed_dir)), "failed")
+        if os.path.abspath(file_path).startswith(os.path.abspath(failed_dir) + os.sep):
+            print(f"Leaving {file_path} in the failed folder")
+        else:
+            with self.io([file_path, failed_dir]):
+                move_to_processed(file_path, failed_dir, date_folder)
+        self._fingerprints.pop(file_path, None)
+        self.resolver.forget(file_path)
+
+    def release_staged(self, file_path, read_path):
+        """Drop the staged copy of a source once its job is over."""
+        if read_path:
+            self._sources.pop(read_path, None)
+            self.staging.release_input(file_path)
+
+    def commit(self, seq, finished, processed_dir):
+        """
+        Finish a job (finished = (file_path, future, date_folder), or None for a skipped file).
+        With ordered_commit, jobs are finished in walk order: a job that completes early waits
+        until every earlier file has been finished.
+        """
+        if not self.config.ordered_commit:
+            if finished:
+                self.finish(*finished, processed_dir)
+            return
+        self._commit_ready[seq] = finished
+        while self._commit_next in self._commit_ready:
+            finished = self._commit_ready.pop(self._commit_next)
+            self._commit_next += 1
+            if finished:
+                self.finish(*finished, processed_dir)
+
+    def run(self, input_dir, output_dir, processed_dir):
+        """Convert everything under input_dir; at most a few jobs per worker are queued at a time."""
+        manager = None
+        if self.volume_limits:
+            # Manager-backed semaphores, so image workers in other processes share the same slots
+            manager = multiprocessing.Manager()
+            self.volumes = VolumeLimiter(self.volume_limits, manager=manager)
+            for path in (input_dir, output_dir, processed_dir, *self.volume_limits):
+                if os.path.exists(path):
+                    self.volumes.register(path)
+        if self.config.journal_file:
+            self.journal = ConversionJournal(self.config.journal_file)
+        self.output_dir = output_dir
+        self.processed_dir = processed_dir
+        if self.config.scratch_gb:
+            scratch_dir = self.config.scratch_dir or os.path.join(tempfile.gettempdir(), "convert_scratch")
+            self.staging = ScratchStaging(scratch_dir, int(self.config.scratch_gb * 1024 ** 3),
+                                          int(self.config.output_batch_mb * 1024 ** 2), io=self.io)
+        try:
+            self._run_pools(input_dir, output_dir, processed_dir)
+            if self.volumes:
+                print(self.volumes.report())
+        finally:
+            self.fsync.flush()
+            if manager:
+                manager.shutdown()
+            self.volumes = None
+            if self.journal:
+                self.journal.close()
+                self.journal = None
+            if self.staging:
+                self.staging.cleanup()
+                self.staging = None
+
+    def _run_pools(self, input_dir, output_dir, processed_dir):
+        max_pending = 2 * (self.image_workers + self.video_workers)
+        pending = {}
+        if self.cpu:
+            self.cpu.start_sampling()
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.image_workers, initializer=init_image_worker,
+                                                    initargs=(self.volumes,)) as image_pool, \
+                concurrent.futures.ThreadPoolExecutor(max_workers=self.video_workers) as video_pool, \
+                self.progress.reporting(self.config.progress_interval):
+            files = order_files(enumerate(self.iter_source_files(input_dir)),
+                                self.config.order, self.config.order_window)
+            if self.staging:
+                extensions = self.config.image_extensions + self.config.video_extensions
+                files = self.staging.prefetch(files, wanted=lambda path: (
+                    not os.path.basename(path).startswith("._") and path.lower().endswith(extensions)
+                ))
+                job_output_dir = self.staging.output_dir
+            else:
+                files = ((seq, file_path, None) for seq, file_path in files)
+                job_output_dir = output_dir
+            for seq, file_path, read_path in files:
+                if os.path.basename(file_path).startswith("._"):
+                    print(f"Skipping file: {os.path.basename(file_path)}")
+                    self.resolver.forget(file_path)
+                    self.commit(seq, None, processed_dir)
+                    continue
+                if read_path:
+                    self._sources[read_path] = file_path
+                try:
+                    job = self.submit(file_path, job_output_dir, image_pool, video_pool, read_path)
+                except Exception as e:
+                    print(f"Error processing file {file_path}: {e}")
+                    job = None
+                if job is None:
+                    self.resolver.forget(file_path)
+                    self.release_staged(file_path, read_path)
+                    self.commit(seq, None, processed_dir)
+                    continue
+                future, date_folder = job
+                if read_path:
+                    future.add_done_callback(lambda _, f=file_path, r=read_path: self.release_staged(f, r))
+                pending[future] = (seq, file_path, date_folder)
+
+                # Backpressure: let the walk run ahead of the pools by max_pending jobs only
+                if len(pending) >= max_pending:
+                    done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        seq, file_path, date_folder = pending.pop(future)
+                        self.commit(seq, (file_path, future, date_folder), processed_dir)
+
+            for future in concurrent.futures.as_completed(list(pending)):
+                seq, file_path, date_folder = pending.pop(future)
+                self.commit(seq, (file_path, future, date_folder), processed_dir)
+            if self.staging:
+                self.staging.flush()
+                print(f"Scratch staging: {self.staging.staged_files} inputs staged, "
+                      f"outputs moved in {self.staging.batches} batch(es)")
+
+        print(f"Conversion finished: {self.converted} converted, {self.copied} copied, "
+              f"{self.failed} failed ({self.stalled} stalled, {self.unverified} failed verification), "
+              f"{self.resumed} already done "
+              f"(image workers: {self.image_workers}, video workers: {self.video_workers})")
+        if self.config.min_savings is not None:
+            print(self.savings.report())
+        print(self.image_policy.report())
+        if self.memory:
+            print(self.memory.report())
+        if self.cpu:
+            print(self.cpu.report())
+        if self.verifier:
+            print(self.verifier.report())
+        self.image_policy.save()
+
+def process_media_files(input_dir, output_dir, processed_dir, config=None, image_workers=None, video_workers=2,
+                        max_decode_mb=None, volume_limits=None, cpu_cores=None, max_ffmpeg_threads=None):
+    """Process images, RAW files, and videos with the parallel engine."""
+    ConversionEngine(config or ConversionConfig(), image_workers, video_workers, max_decode_mb, volume_limits,
+                     cpu_cores, max_ffmpeg_threads).run(input_dir, output_dir, processed_dir)
+
+def run_from_command_line(config, input_directory, output_directory, processed_directory):
+    """Entry point shared by the convert_all_* scripts: parse the worker options and run."""
+    parser = argparse.ArgumentParser(description="Convert media to HEIC/HEVC into YYYY/MM/DD folders.")
+    parser.add_argument("--image-workers", type=int, default=os.cpu_count(),
+                        help="Parallel image -> HEIC encodes (default: number of CPUs)")
+    parser.add_argument("--video-workers", type=int, default=2,
+                        help="Parallel ffmpeg video jobs (default: 2)")
+    parser.add_argument("--max-decode-mb", type=float, default=None, metavar="MB",
+                        help="Run image conversions only while their estimated decode memory fits in MB (default: no limit)")
+    parser.add_argument("--cpu-budget", type=int, default=None, metavar="CORES",
+                        help="Share CORES (0: all) between image workers, ffmpeg -threads and ExifTool (default: no budget)")
+    parser.add_argument("--max-ffmpeg-threads", type=int, default=None, metavar="N",
+                        help="With --cpu-budget, give one ffmpeg encode at most N threads (default: cores / video workers)")
+    parser.add_argument("--volume-limit", action="append", metavar="PATH=N",
+                        help="Concurrent reads/copies/moves on the volume of PATH, e.g. /Volumes/G-DRIVE=1 "
+                             "(repeatable or comma-separated; default: unlimited)")
+    parser.add_argument("--encoder-profile", default=config.encoder_profile, metavar="FILE",
+                        help="Encode videos with the libx265 settings of a profile written by encoder_calibration.py")
+    parser.add_argument("--segment-over", type=float, default=None, metavar="MINUTES",
+                        help="Encode videos of at least MINUTES as parallel segments (default: off)")
+    parser.add_argument("--segments", type=int, default=config.segments,
+                        help=f"Number of parallel segments for long videos (default: {config.segments})")
+    parser.add_argument("--min-savings", type=float, default=config.min_savings, metavar="PERCENT",
+                        help="Copy videos predicted to shrink by less than PERCENT instead of encoding them (default: off)")
+    parser.add_argument("--sample-seconds", type=float, default=config.sample_seconds,
+                        help="Encode a sample of this many seconds to refine the size prediction (default: model only)")
+    parser.add_argument("--image-min-savings", type=float, default=config.image_min_savings, metavar="PERCENT",
+                        help="Copy images whose format/size bucket historically saves less than PERCENT (default: off)")
+    parser.add_argument("--image-stats", default=config.image_stats_file, metavar="FILE",
+                        help=f"Image conversion statistics file (default: {config.image_stats_file})")
+    parser.add_argument("--order", choices=ORDER_POLICIES, default=config.order,
+                        help="Job order: date (walk order), largest (all files, largest first) or "
+                             f"window (largest first within a look-ahead window) (default: {config.order})")
+    parser.add_argument("--order-window", type=int, default=config.order_window,
+                        help=f"Files looked ahead by --order window (default: {config.order_window})")
+    parser.add_argument("--ordered-commit", action="store_true", default=config.ordered_commit,
+                        help="Move sources to the processed folder strictly in date order (not with --order largest)")
+    parser.add_argument("--extra-date-sources", action="store_true", default=config.extra_date_sources,
+                        help="Also date files by their Google Takeout JSON and filename, not only metadata and path")
+    parser.add_argument("--journal", nargs="?", const=JOURNAL_FILE, default=config.journal_file, metavar="FILE",
+                        help=f"Record progress in a conversion journal, so reruns skip files it records as "
+                             f"converted (FILE defaults to {JOURNAL_FILE}; default: off)")
+    parser.add_argument("--no-journal", action="store_true", help="Run without the conversion journal (the default)")
+    parser.add_argument("--scratch-gb", type=float, default=config.scratch_gb, metavar="GB",
+                        help="Copy upcoming inputs to local scratch space of at most GB and convert from there (default: off)")
+    parser.add_argument("--scratch-dir", default=config.scratch_dir,
+                        help="Local scratch folder for --scratch-gb (default: <tmp>/convert_scratch)")
+    parser.add_argument("--output-batch-mb", type=float, default=config.output_batch_mb,
+                        help=f"With --scratch-gb, move outputs to the output folder in batches of this size (default: {config.output_batch_mb:.0f})")
+    parser.add_argument("--stall-timeout", type=float, default=config.stall_timeout, metavar="SECONDS",
+                        help=f"Kill an ffmpeg run that makes no progress for this long and move its source "
+                             f"to the failed folder; 0 disables (default: {config.stall_timeout or 0:.0f})")
+    parser.add_argument("--progress-interval", type=float, default=config.progress_interval, metavar="SECONDS",
+                        help=f"Seconds between live ffmpeg progress summaries (default: {config.progress_interval:.0f})")
+    parser.add_argument("--failed-dir", default=config.failed_dir,
+                        help="Where sources of stalled encodes are moved (default: 'failed' next to the processed folder)")
+    parser.add_argument("--verify", action="store_true", default=config.verify,
+                        help="Check every output (header, sampled frames, full decode on suspicion); "
+                             "sources of bad outputs go to the failed folder")
+    parser.add_argument("--plan-only", action="store_true",
+                        help="Dry run: print the transcode plan of every video and the estimated CPU time saved")
+    args = parser.parse_args()
+    if args.ordered_commit and args.order == "largest":
+        # seq 0 is usually among the last jobs to finish, so every source and output would wait for the end
+        parser.error("--ordered-commit cannot be combined with --order largest (use --order window)")
+    try:
+        volume_limits = parse_volume_limits(args.volume_limit)
+        if args.encoder_profile:
+            load_profile(args.encoder_profile)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.plan_only:
+        summarize_folder(input_directory, reencode_hevc=not config.copy_hevc)
+        return
+    if args.segment_over is not None:
+        config = replace(config, segment_threshold=args.segment_over * 60, segments=args.segments)
+    config = replace(config, min_savings=args.min_savings, sample_seconds=args.sample_seconds,
+                     image_min_savings=args.image_min_savings, image_stats_file=args.image_stats,
+                     order=args.order, order_window=args.order_window, ordered_commit=args.ordered_commit,
+                     extra_date_sources=args.extra_date_sources,
+                     journal_file=None if args.no_journal else args.journal,
+                     scratch_gb=args.scratch_gb, scratch_dir=args.scratch_dir, output_batch_mb=args.output_batch_mb,
+                     stall_timeout=args.stall_timeout or None, progress_interval=args.progress_interval,
+                     failed_dir=args.failed_dir, encoder_profile=args.encoder_profile,
+                     verify=args.verify)
+    process_media_files(input_directory, output_directory, processed_directory, config,
+                        image_workers=args.image_workers, video_workers=args.video_workers,
+                        max_decode_mb=args.max_decode_mb, volume_limits=volume_limits,
+                        cpu_cores=args.cpu_budget, max_ffmpeg_threads=args.max_ffmpeg_threads)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Conversion Journal
+A small SQLite database recording, per source file, its fingerprint, its output and how far
+its conversion got, so a rerun after a crash or an SMB disconnect neither reconverts finished
+files nor creates '_1', '_2' duplicates through ensure_unique_filename.
+
+States:
+- converting: the output path is chosen and the encode/copy has started (a crash leaves a
+  partial output, which a later run removes and redoes; rows of the current run are never
+  taken for interrupted ones)
+- converted:  the output is complete (metadata and dates included); only the move of the
+  source to the processed folder may be missing
+- done:       the source has been moved to the processed folder
+
+Each row belongs to one source path, and is only used while the file at that path still has the
+recorded fingerprint (size plus a hash of the first and last MB); the fingerprint is found through
+an index on (path, size, mtime), so an unchanged file is looked up without reading it. Two sources
+with the same contents (a Takeout album and year folder) have separate rows and outputs;
+find_fingerprint() reports the other copy.
+A file that was copied rather than converted also records the sha256 of its contents (computed
+by the copy itself), which find_digest() looks up for deduplication.
+"""
+
+import os
+import time
+import uuid
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE = "conversion_journal.sqlite"
+FINGERPRINT_CHUNK = 1024 * 1024
+
+STATE_CONVERTING = "converting"
+STATE_CONVERTED = "converted"
+STATE_DONE = "done"
+
+
+class JournalEntry(NamedTuple):
+    fingerprint: str
+    source_path: str
+    output_path: Optional[str]
+    date_folder: Optional[str]
+    state: str
+    run_id: Optional[str]  # the run that last wrote the row
+
+
+ENTRY_COLUMNS = "fingerprint, source_path, output_path, date_folder, state, run_id"
+JOBS_COLUMNS = ("(source_path TEXT PRIMARY KEY, fingerprint TEXT, size INTEGER, mtime_ns INTEGER, output_path TEXT,"
+                " date_folder TEXT, state TEXT, updated REAL, digest TEXT, run_id TEXT)")
+
+
+def source_fingerprint(file_path: str) -> str:
+    """sha256 of the size and the first and last FINGERPRINT_CHUNK bytes of file_path"""
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(file_path, "rb") as f:
+        digest.update(f.read(FINGERPRINT_CHUNK))
+        if size > 2 * FINGERPRINT_CHUNK:
+            f.seek(-FINGERPRINT_CHUNK, os.SEEK_END)
+            digest.update(f.read(FINGERPRINT_CHUNK))
+    return digest.hexdigest()
+
+
+class ConversionJournal:
+    """
+    Thread-safe journal of conversion states; every update is committed immediately. Each
+    instance is one run, with its own run_id.
+    """
+
+    def __init__(self, path: str = JOURNAL_FILE):
+        self.path = path
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS jobs {JOBS_COLUMNS}")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_source ON jobs (source_path, size, mtime_ns)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_fingerprint ON jobs (fingerprint)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_digest ON jobs (digest)")
+        self._db.commit()
+
+    def _migrate(self):
+        """Re-key a journal written when rows were keyed by fingerprint alone"""
+        columns = {row[1]: row[5] for row in self._db.execute("PRAGMA table_info(jobs)")}  # name -> pk
+        if not columns or columns.get("source_path"):
+            return
+        self._db.execute("DROP INDEX IF EXISTS jobs_source")
+        self._db.execute("DROP INDEX IF EXISTS jobs_digest")
+        self._db.execute("ALTER TABLE jobs RENAME TO jobs_by_fingerprint")
+        self._db.execute(f"CREATE TABLE jobs {JOBS_COLUMNS}")
+        digest = "digest" if "digest" in columns else "NULL"
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (source_path, fingerprint, size, mtime_ns, output_path, date_folder,"
+            f" state, updated, digest) SELECT source_path, fingerprint, size, mtime_ns, output_path, date_folder,"
+            f" state, updated, {digest} FROM jobs_by_fingerprint ORDER BY updated"
+        )
+        self._db.execute("DROP TABLE jobs_by_fingerprint")
+        self._db.commit()
+
+    def fingerprint(self, file_path: str) -> str:
+        """The file's fingerprint: from the index if the file is unchanged, else hashed"""
+        stat = os.stat(file_path)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fingerprint FROM jobs WHERE source_path = ? AND size = ? AND mtime_ns = ?",
+                (file_path, stat.st_size, stat.st_mtime_ns)
+            ).fetchone()
+        return row[0] if row else source_fingerprint(file_path)
+
+    def lookup(self, source_path: str, fingerprint: str) -> Optional[JournalEntry]:
+        """The row of source_path, if the file there still has this fingerprint"""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {ENTRY_COLUMNS} FROM jobs WHERE source_path = ? AND fingerprint = ?",
+                (source_path, fingerprint)
+            ).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def find_fingerprint(self, fingerprint: str, other_than: str) -> Optional[JournalEntry]:
+        """Another source with the same fingerprint (likely the same contents), if any"""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {ENTRY_COLUMNS} FROM jobs WHERE fingerprint = ? AND source_path != ?",
+                (fingerprint, other_than)
+            ).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def find_digest(self, digest: str) -> Optional[JournalEntry]:
+        """A journaled file whose contents have this sha256, if any"""
+        with self._lock:
+            row = self._db.execute(f"SELECT {ENTRY_COLUMNS} FROM jobs WHERE digest = ?", (digest,)).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def start(self, fingerprint: str, source_path: str, output_path: str, date_folder: str):
+        """Record that this run has started converting source_path into output_path"""
+        stat = os.stat(source_path)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO jobs (source_path, fingerprint, size, mtime_ns, output_path, date_folder,"
+                " state, updated, run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (source_path, fingerprint, stat.st_size, stat.st_mtime_ns, output_path, date_folder,
+                 STATE_CONVERTING, time.time(), self.run_id)
+            )
+            self._db.commit()
+
+    def set_state(self, source_path: str, state: str, output_path: Optional[str] = None,
+                  digest: Optional[str] = None):
+        with self._lock:
+            if digest:
+                self._db.execute("UPDATE jobs SET digest = ? WHERE source_path = ?", (digest, source_path))
+            if output_path:
+                self._db.execute(
+                    "UPDATE jobs SET state = ?, output_path = ?, updated = ?, run_id = ? WHERE source_path = ?",
+                    (state, output_path, time.time(), self.run_id, source_path)
+                )
+            else:
+                self._db.execute("UPDATE jobs SET state = ?, updated = ?, run_id = ? WHERE source_path = ?",
+                                 (state, time.time(), self.run_id, source_path))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
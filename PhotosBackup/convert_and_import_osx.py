@@ -6,13 +6,22 @@ import logging
 import argparse
 from PIL import Image
 from pillow_heif import register_heif_opener
-from datetime import datetime
-import re
 import concurrent.futures
 from tqdm import tqdm
 import time
+import re
 import sys
 import hashlib
+import threading
+from date_resolver import DateResolver
+from encoder_calibration import load_profile, profile_video_args
+from ffmpeg_progress import DEFAULT_STALL_TIMEOUT, FfmpegStalled, run_ffmpeg
+from hashed_copy import copy_with_hash, move_file
+from import_queue import DEFAULT_BATCH_SIZE, ImportQueue
+from heif_metadata import leftover_tag_args, prepare_for_heif
+from output_verifier import VERIFY_CACHE_FILE, OutputVerifier
+from photo_importers import FilesystemImporter, ImportResult, Importer, parse_importer_options
+from pipeline import Pipeline, Stage, parse_stage_workers
 
 # Register HEIF support with Pillow
 register_heif_opener()
@@ -23,6 +32,12 @@ OUTPUT_DIRECTORY = "/Volumes/G-DRIVE/Converted"
 PROCESSED_DIRECTORY = "/Volumes/G-DRIVE/ProcessedOriginals"
 FAILED_DIRECTORY = "/Volumes/G-DRIVE/FailedImports"
 LOG_FILE = "media_conversion.log"
+PHOTOS_LIBRARY = os.path.expanduser("~/Pictures/Photos Library.photoslibrary")
+STAND_IN_LIBRARY = "stand_in_library"
+
+# Supported media
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".mpeg", ".webm", ".3gp")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".tiff", ".bmp", ".cr2", ".dng", ".heic")
 
 # Setup logging
 logging.basicConfig(
@@ -42,11 +57,28 @@ SUCCESSFUL_IMPORT_COUNT = 0
 FAILED_IMPORT_COUNT = 0
 OSASCRIPT_IMPORT_COUNT = 0
 IMPORTS_PER_RESTART = 1500
+IMPORT_ATTEMPTS = 3
+IMPORT_RETRY_DELAY = 1  # seconds, doubled after each failed attempt
 SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE = 0
+# Guards the counters above: conversion workers count failures while the importer counts imports
+COUNTS_LOCK = threading.Lock()
+
+# Tiered source/output checks; source results are cached across runs until the source is moved
+VERIFIER = OutputVerifier(VERIFY_CACHE_FILE)
+
+# SHA-256 of library files already read this run, keyed by (path, size, mtime), so the duplicate
+# check hashes each library file only once
+FILE_HASHES = {}
+
+# Files submitted per worker ahead of the ones being processed
+PENDING_PER_WORKER = 2
+
+# Seconds without progress after which a video encode is killed and its source moved to the failed folder
+STALL_TIMEOUT = DEFAULT_STALL_TIMEOUT
 
-def check_dependencies():
+def check_dependencies(importer="osxphotos"):
     """Check if required external tools are installed."""
-    dependencies = ["osxphotos", "exiftool", "ffmpeg", "ffprobe"]
+    dependencies = ["exiftool", "ffmpeg", "ffprobe"] + (["osxphotos"] if importer == "osxphotos" else [])
     missing = []
     for dep in dependencies:
         if not shutil.which(dep):
@@ -62,10 +94,33 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description="Convert and organize media files.")
     parser.add_argument("--quality", type=int, default=90, choices=range(0, 101),
                         help="Video conversion quality percentage (0-100, default: 90)")
+    parser.add_argument("--encoder-profile", default=None, metavar="FILE",
+                        help="Encode videos with the libx265 settings of a profile written by encoder_calibration.py "
+                             "(instead of --quality)")
+    parser.add_argument("--stall-timeout", type=float, default=DEFAULT_STALL_TIMEOUT, metavar="SECONDS",
+                        help=f"Kill a video encode that makes no progress for this long and move its source "
+                             f"to the failed folder; 0 disables (default: {DEFAULT_STALL_TIMEOUT})")
     parser.add_argument("--dry-run", action="store_true",
                         help="Simulate actions without modifying files")
     parser.add_argument("--workers", type=int, default=4,
                         help="Number of parallel workers (default: 4)")
+    parser.add_argument("--import-batch", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Outputs imported per osxphotos call by the importer (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--ordered-import", action="store_true",
+                        help="Import outputs in walk (date folder) order, whatever order their conversions finish in")
+    parser.add_argument("--importer", choices=["osxphotos", "filesystem"], default="osxphotos",
+                        help="Import into Photos (osxphotos) or into a stand-in library folder for testing")
+    parser.add_argument("--library-dir", default=STAND_IN_LIBRARY,
+                        help=f"Folder of the filesystem stand-in library (default: {STAND_IN_LIBRARY})")
+    parser.add_argument("--stand-in-options", type=parse_importer_options, default={},
+                        help="Latency and failure injection of the stand-in library, e.g. "
+                             "'latency=0.5,per_file_latency=0.2,failure_rate=0.02,degrade_after=1500,restart_latency=7'")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Run as stages (scan/probe/date/convert/tag/place/import) connected by bounded queues")
+    parser.add_argument("--stage-workers", type=parse_stage_workers, default={},
+                        help="Workers per pipeline stage, e.g. 'convert=6,import=1' (convert defaults to --workers)")
+    parser.add_argument("--queue-size", type=int, default=16,
+                        help="Maximum items waiting in front of each pipeline stage (default: 16)")
     return parser.parse_args()
 
 def ensure_unique_filename(output_path, dry_run=False):
@@ -80,114 +135,73 @@ def ensure_unique_filename(output_path, dry_run=False):
         new_output_path = f"{base}_{counter}{ext}"
     return new_output_path
 
-def compute_file_hash(file_path):
-    """Compute SHA-256 hash of a file's contents."""
+def _hash_key(file_path):
+    stat = os.stat(file_path)
+    return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+def compute_file_hash(file_path, cache=False):
+    """
+    Compute SHA-256 hash of a file's contents. With 'cache' (library files only, so memory does
+    not grow with the input tree) the hash is kept in FILE_HASHES and reused.
+    """
     sha256 = hashlib.sha256()
     try:
+        key = _hash_key(file_path) if cache else None
+        if key in FILE_HASHES:
+            return FILE_HASHES[key]
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
                 sha256.update(chunk)
-        return sha256.hexdigest()
+        digest = sha256.hexdigest()
+        if cache:
+            FILE_HASHES[key] = digest
+        return digest
     except Exception as e:
         logger.warning(f"Failed to compute hash for {file_path}: {e}")
         return None
 
-def check_for_duplicates(file_path, library_path, dry_run=False):
-    """Check if a file is a duplicate in the Photos library by comparing hashes."""
+def check_for_duplicates(file_path, dry_run=False):
+    """Check if a file is a duplicate in the importer's library by comparing hashes."""
     if dry_run:
         return False
-    file_hash = compute_file_hash(file_path)
-    if not file_hash:
-        return False
-    # Assume Photos library stores originals in ~/Pictures/Photos Library.photoslibrary/originals
-    originals_path = os.path.join(library_path, "originals")
-    if not os.path.exists(originals_path):
-        logger.warning(f"Photos library originals path not found: {originals_path}")
-        return False
-    for root, _, files in os.walk(originals_path):
-        for fname in files:
-            library_file = os.path.join(root, fname)
-            library_hash = compute_file_hash(library_file)
-            if library_hash and library_hash == file_hash:
-                logger.info(f"Duplicate found: {file_path} matches {library_file}")
-                return True
-    return False
-
-def extract_dates_from_metadata(file_path, dry_run=False):
-    """Extract possible dates from metadata using ExifTool."""
-    if dry_run:
-        return []
-    try:
-        result = subprocess.run(
-            ["exiftool", "-s", "-s", "-s", "-CreateDate", "-DateTimeOriginal", "-MediaCreateDate", "-ContentCreateDate", file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
-        dates = []
-        for line in result.stdout.splitlines():
-            try:
-                date = datetime.strptime(line.strip(), "%Y:%m:%d %H:%M:%S")
-                dates.append(date)
-            except ValueError:
-                pass
-        return dates
-    except Exception as e:
-        logger.error(f"Error extracting metadata dates from {file_path}: {e}")
-        return []
+    return IMPORTER.is_duplicate(file_path)
 
-def validate_metadata(file_path, dry_run=False):
-    """Validate that the file has required EXIF metadata for import."""
+def validate_metadata(metadata_dates, dry_run=False):
+    """Validate that the file has required EXIF metadata for import (from its resolved date tags)."""
     if dry_run:
         return True
-    try:
-        result = subprocess.run(
-            ["exiftool", "-s", "-s", "-s", "-DateTimeOriginal", "-CreateDate", file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
-        return bool(result.stdout.strip())  # True if any metadata is present
-    except Exception as e:
-        logger.warning(f"No valid metadata found for {file_path}: {e}")
-        return False
+    return bool(metadata_dates.get("DateTimeOriginal") or metadata_dates.get("CreateDate"))
 
 def validate_file_integrity(file_path, dry_run=False):
-    """Validate that the file is a valid image or video."""
+    """
+    Validate that the file is a valid image or video. Videos get the tiered check of output_verifier
+    (header, sampled frames, full decode only on suspicion) instead of a full decode every time.
+    """
     if dry_run:
         return True
     try:
         if file_path.lower().endswith(('.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.cr2', '.dng', '.heic')):
             Image.open(file_path).verify()  # Verify image integrity
         elif file_path.lower().endswith(('.mp4', '.mov', '.avi', '.mkv', '.flv', '.wmv', '.mpeg', '.webm', '.3gp')):
-            # Basic FFmpeg check for video integrity
-            subprocess.run(
-                ["ffmpeg", "-v", "error", "-i", file_path, "-f", "null", "-"],
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-            )
+            result = VERIFIER.verify(file_path)
+            if not result.ok:
+                raise ValueError(f"tier {result.tier}: {result.reason}")
         return True
     except Exception as e:
         logger.warning(f"File integrity check failed for {file_path}: {e}")
         return False
 
-def extract_date_from_path(file_path):
-    """Extract a date in YYYY/MM/DD format from the file path."""
-    path_pattern = re.compile(r"(\d{4})/(\d{2})/(\d{2})")
-    match = path_pattern.search(file_path)
-    if match:
-        try:
-            year, month, day = map(int, match.groups())
-            return datetime(year, month, day)
-        except ValueError:
-            pass
-    return None
-
-def get_oldest_date(file_path, dry_run=False):
-    """Get the oldest date from metadata, path, or file modification time."""
-    metadata_dates = extract_dates_from_metadata(file_path, dry_run)
-    path_date = extract_date_from_path(file_path)
-    all_dates = metadata_dates + ([path_date] if path_date else [])
-    if all_dates:
-        return min(all_dates).strftime("%Y/%m/%d")
-    if dry_run:
-        return datetime.now().strftime("%Y/%m/%d")
-    return datetime.fromtimestamp(os.path.getmtime(file_path)).strftime("%Y/%m/%d")
+def validate_output(output_file, source_path, dry_run=False):
+    """Check a converted file against its source (output_verifier); a bad output is removed."""
+    if dry_run or not output_file:
+        return bool(output_file)
+    result = VERIFIER.verify(output_file, source_path)
+    if result.ok:
+        return True
+    logger.warning(f"Output verification failed for {output_file} (tier {result.tier}): {result.reason}")
+    if os.path.exists(output_file):
+        os.remove(output_file)
+    return False
 
 def preserve_timestamps(src, dest, dry_run=False):
     """Preserve the original file's creation and modification timestamps."""
@@ -203,10 +217,10 @@ def preserve_timestamps(src, dest, dry_run=False):
     except Exception as e:
         logger.error(f"Error preserving timestamps for {dest}: {e}")
 
-def move_to_processed(src, processed_root, dry_run=False):
-    """Move the source file to the processed folder organized by date."""
+def move_to_processed(src, processed_root, date_folder, dry_run=False):
+    """Move the source file to the processed folder organized by date (the already resolved YYYY/MM/DD)."""
+    VERIFIER.forget(src)
     try:
-        date_folder = get_oldest_date(src, dry_run)
         processed_folder = os.path.join(processed_root, date_folder)
         if not dry_run:
             os.makedirs(processed_folder, exist_ok=True)
@@ -215,16 +229,16 @@ def move_to_processed(src, processed_root, dry_run=False):
             logger.info(f" ")
             logger.info(f"[Dry Run] Would move {src} to {destination_path}")
         else:
-            shutil.move(src, destination_path)
+            move_file(src, destination_path)
             logger.info(f" ")
             logger.info(f"Moved original to: {destination_path}")
     except Exception as e:
         logger.error(f"Error moving file {src} to processed folder: {e}")
 
-def move_to_failed(src, failed_root, dry_run=False):
-    """Move the source file to the failed imports folder organized by date."""
+def move_to_failed(src, failed_root, date_folder, dry_run=False):
+    """Move the source file to the failed imports folder organized by date (the already resolved YYYY/MM/DD)."""
+    VERIFIER.forget(src)
     try:
-        date_folder = get_oldest_date(src, dry_run)
         failed_folder = os.path.join(failed_root, date_folder)
         if not dry_run:
             os.makedirs(failed_folder, exist_ok=True)
@@ -233,23 +247,56 @@ def move_to_failed(src, failed_root, dry_run=False):
             logger.info(f" ")
             logger.info(f"[Dry Run] Would move failed import {src} to {destination_path}")
         else:
-            shutil.move(src, destination_path)
+            move_file(src, destination_path)
             logger.info(f" ")
             logger.info(f"Moved failed import to: {destination_path}")
     except Exception as e:
         logger.error(f"Error moving failed import {src} to failed folder: {e}")
 
-def restart_photos_app(dry_run=False):
-    """Restart the Photos app on macOS."""
-    global PHOTOS_RESTART_COUNT, SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE
+def count_failed_import():
+    global FAILED_IMPORT_COUNT
+    with COUNTS_LOCK:
+        FAILED_IMPORT_COUNT += 1
+
+def count_successful_imports(count=1, dry_run=False):
+    """Count imported files; restart Photos every IMPORTS_PER_RESTART successful imports."""
+    global SUCCESSFUL_IMPORT_COUNT, SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE
+    with COUNTS_LOCK:
+        before = SUCCESSFUL_IMPORT_COUNT
+        SUCCESSFUL_IMPORT_COUNT += count
+        SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE += count
+        total = SUCCESSFUL_IMPORT_COUNT
+    if total // IMPORTS_PER_RESTART > before // IMPORTS_PER_RESTART:
+        logger.info(f" ")
+        logger.info(f"Reached {total} successful imports. Triggering Photos app restart.")
+        restart_importer(dry_run)
+
+def restart_importer(dry_run=False):
+    """Restart the importer's library app (Photos), at most MAX_PHOTOS_RESTARTS times."""
+    global PHOTOS_RESTART_COUNT
     if dry_run:
         logger.info(f" ")
         logger.info("[Dry Run] Would restart Photos app")
         return
-    if PHOTOS_RESTART_COUNT >= MAX_PHOTOS_RESTARTS:
-        logger.warning(f" ")
-        logger.warning(f"Maximum Photos app restarts ({MAX_PHOTOS_RESTARTS}) reached. Skipping restart.")
+    with COUNTS_LOCK:
+        if PHOTOS_RESTART_COUNT >= MAX_PHOTOS_RESTARTS:
+            logger.warning(f" ")
+            logger.warning(f"Maximum Photos app restarts ({MAX_PHOTOS_RESTARTS}) reached. Skipping restart.")
+            return
+    if not IMPORTER.restart():
         return
+    with COUNTS_LOCK:
+        PHOTOS_RESTART_COUNT += 1
+        logger.info(f" ")
+        logger.info(f"Photos app restart count: {PHOTOS_RESTART_COUNT}/{MAX_PHOTOS_RESTARTS}")
+        # Reset restart count if many successful imports since last failure
+        if SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE > 3000:
+            PHOTOS_RESTART_COUNT = 0
+            logger.info(f" ")
+            logger.info("Reset Photos app restart count due to 3000+ successful imports without failures")
+
+def restart_photos_app():
+    """Restart the Photos app on macOS; returns whether it was reopened."""
     try:
         # Check if Photos app is running
         check_result = subprocess.run(
@@ -286,18 +333,12 @@ def restart_photos_app(dry_run=False):
         logger.info("Reopened Photos app")
         # Wait for the app to stabilize
         time.sleep(5)
-        PHOTOS_RESTART_COUNT += 1
-        logger.info(f" ")
-        logger.info(f"Photos app restart count: {PHOTOS_RESTART_COUNT}/{MAX_PHOTOS_RESTARTS}")
-        # Reset restart count if many successful imports since last failure
-        if SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE > 3000:
-            PHOTOS_RESTART_COUNT = 0
-            logger.info(f" ")
-            logger.info("Reset Photos app restart count due to 3000+ successful imports without failures")
+        return True
     except subprocess.CalledProcessError as e:
         logger.error(f"Error restarting Photos app: {e.stderr.strip()}")
     except Exception as e:
         logger.error(f"Unexpected error restarting Photos app: {e}")
+    return False
 
 def import_with_osascript(file_path, dry_run=False):
     """Import a file into Photos app using osascript."""
@@ -319,7 +360,8 @@ def import_with_osascript(file_path, dry_run=False):
         )
         logger.info(f" ")
         logger.info(f"Successfully imported {file_path} with osascript")
-        OSASCRIPT_IMPORT_COUNT += 1
+        with COUNTS_LOCK:
+            OSASCRIPT_IMPORT_COUNT += 1
         return True
     except subprocess.CalledProcessError as e:
         logger.error(f"Failed to import {file_path} with osascript: {e.stderr.strip()}")
@@ -328,44 +370,100 @@ def import_with_osascript(file_path, dry_run=False):
         logger.error(f"Unexpected error importing {file_path} with osascript: {e}")
         return False
 
-def retry_operation(operation, *args, max_attempts=3, base_delay=1, dry_run=False, **kwargs):
-    """Retry an operation with manual error checking for osxphotos import."""
+class OsxPhotosImporter(Importer):
+    """Photos via osxphotos import (AppleScript as fallback); duplicates are looked up in the library's originals."""
+
+    name = "osxphotos"
+
+    def __init__(self, library_path=PHOTOS_LIBRARY):
+        self.library_path = library_path
+
+    def import_batch(self, paths):
+        result = subprocess.run(["osxphotos", "import", "--verbose", "--skip-duplicates", *paths],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False)
+        combined_output = result.stdout + result.stderr
+        reported = re.search(r"imported (\d+) file group", combined_output)
+        imported = int(reported.group(1)) if reported else len(paths)
+        if "Error importing file" not in combined_output and imported == len(paths):
+            return ImportResult(list(paths), [], {})
+        reason = result.stderr.strip() or combined_output.strip() or f"imported {imported} of {len(paths)}"
+        if imported and len(paths) > 1:
+            # osxphotos does not say which files of the batch made it; the library does
+            done = [path for path in paths if self.is_duplicate(path)]
+            return ImportResult(done, [], {path: reason for path in paths if path not in done})
+        return ImportResult([], [], {path: reason for path in paths})
+
+    def import_fallback(self, path):
+        if import_with_osascript(path):
+            return True
+        logger.warning(f"Duplicate dialog may appear for {path}. Consider manual import or third-party tools like PowerPhotos.")
+        return False
+
+    def is_duplicate(self, path):
+        file_hash = compute_file_hash(path)
+        if not file_hash:
+            return False
+        # Assume Photos library stores originals in ~/Pictures/Photos Library.photoslibrary/originals
+        originals_path = os.path.join(self.library_path, "originals")
+        if not os.path.exists(originals_path):
+            logger.warning(f"Photos library originals path not found: {originals_path}")
+            return False
+        for root, _, files in os.walk(originals_path):
+            for fname in files:
+                library_file = os.path.join(root, fname)
+                library_hash = compute_file_hash(library_file, cache=True)
+                if library_hash and library_hash == file_hash:
+                    logger.info(f"Duplicate found: {path} matches {library_file}")
+                    return True
+        return False
+
+    def restart(self):
+        return restart_photos_app()
+
+# Where outputs are imported: Photos, or a FilesystemImporter stand-in (--importer filesystem)
+IMPORTER = OsxPhotosImporter()
+
+def retry_operation(operation, *args, max_attempts=3, base_delay=1, dry_run=False, give_up_on=(), **kwargs):
+    """Retry an operation that raises on failure, with exponential backoff; 'give_up_on' errors are not retried."""
     for attempt in range(max_attempts):
         try:
-            result = operation(*args, **kwargs)
-            # Check osxphotos import output for errors
-            if args and args[0][0] == "osxphotos" and args[0][1] == "import":
-                combined_output = result.stdout + result.stderr
-                if "Error importing file" in combined_output or "imported 0 file groups" in combined_output:
-                    raise subprocess.CalledProcessError(1, args[0], output=combined_output, stderr=result.stderr)
-            return result
+            return operation(*args, **kwargs)
         except Exception as e:
-            if attempt == max_attempts - 1:
+            if attempt == max_attempts - 1 or isinstance(e, give_up_on):
                 raise e
-            # For osxphotos import, restart Photos app after second failure
-            if attempt == 1 and args and args[0][0] == "osxphotos" and args[0][1] == "import":
-                logger.info(f" ")
-                logger.info(f"Triggering Photos app restart after attempt {attempt + 1} failed for {args[0][-1]}")
-                restart_photos_app(dry_run)
             delay = base_delay * (2 ** attempt)
             logger.warning(f"Attempt {attempt + 1} failed: {e}. Retrying in {delay}s...")
             time.sleep(delay)
 
-def convert_image_to_heic(input_path, output_path, dry_run=False):
-    """Convert an image to HEIC format while preserving metadata."""
+def copy_metadata(input_path, output_path, tag_args=None):
+    """Copy all tags (or only the groups in tag_args, e.g. ["-IPTC:all"]) from the source to the converted file with ExifTool."""
+    return retry_operation(
+        subprocess.run,
+        ["exiftool", "-overwrite_original", "-tagsFromFile", input_path] + list(tag_args or []) + [output_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
+    )
+
+def convert_image_to_heic(input_path, output_path, dry_run=False, copy_tags=True):
+    """
+    Convert an image to HEIC format while preserving metadata: EXIF/XMP/ICC are embedded at save time,
+    ExifTool copies only what cannot be (copy_tags=False leaves that to copy_metadata).
+    """
     try:
         output_path = ensure_unique_filename(output_path, dry_run)
         if dry_run:
             logger.info(f" ")
             logger.info(f"[Dry Run] Would convert {input_path} to {output_path}")
             return output_path
-        image = Image.open(input_path)
-        image.save(output_path, format="HEIF")
-        result = retry_operation(
-            subprocess.run,
-            ["exiftool", "-overwrite_original", "-tagsFromFile", input_path, output_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
+        with Image.open(input_path) as image:
+            upright, metadata = prepare_for_heif(image)
+            try:
+                upright.save(output_path, format="HEIF", **metadata)
+            finally:
+                if upright is not image:
+                    upright.close()
+        tag_args = leftover_tag_args(input_path)
+        if copy_tags and tag_args is not None:
+            copy_metadata(input_path, output_path, tag_args)
         logger.info(f" ")
         logger.info(f"Image converted: {output_path}")
         return output_path
@@ -376,12 +474,19 @@ def convert_image_to_heic(input_path, output_path, dry_run=False):
             os.remove(output_path)
         raise
 
-def convert_video_to_hevc(input_path, output_path, quality=90, dry_run=False):
-    """Convert a video to HEVC using appropriate encoder based on platform."""
+def convert_video_to_hevc(input_path, output_path, quality=90, dry_run=False, copy_tags=True, encoder_profile=None):
+    """
+    Convert a video to HEVC using appropriate encoder based on platform (copy_tags as for images).
+    A calibrated 'encoder_profile' (encoder_calibration.py) replaces the quality mapping on every platform.
+    """
     try:
         output_path = ensure_unique_filename(output_path, dry_run)
         is_macos = platform.system() == "Darwin"
-        if is_macos:
+        if encoder_profile:
+            ffmpeg_args = ["ffmpeg", "-i", input_path] + profile_video_args(encoder_profile) + [
+                "-c:a", "aac", "-tag:v", "hvc1", output_path
+            ]
+        elif is_macos:
             # macOS: Use hevc_videotoolbox with quality mapped to 0-100
             ffmpeg_args = [
                 "ffmpeg", "-i", input_path, "-c:v", "hevc_videotoolbox",
@@ -398,12 +503,11 @@ def convert_video_to_hevc(input_path, output_path, quality=90, dry_run=False):
             logger.info(f" ")
             logger.info(f"[Dry Run] Would convert {input_path} to {output_path} with args: {' '.join(ffmpeg_args)}")
             return output_path
-        retry_operation(subprocess.run, ffmpeg_args, check=True)
-        retry_operation(
-            subprocess.run,
-            ["exiftool", "-overwrite_original", "-tagsFromFile", input_path, output_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True
-        )
+        # A hung encode is killed after STALL_TIMEOUT seconds without progress, and not retried
+        retry_operation(run_ffmpeg, ffmpeg_args, os.path.basename(input_path),
+                        stall_timeout=STALL_TIMEOUT, give_up_on=(FfmpegStalled,))
+        if copy_tags:
+            copy_metadata(input_path, output_path)
         logger.info(f" ")
         logger.info(f"Video converted: {output_path}")
         return output_path
@@ -439,14 +543,88 @@ def copy_file_to_output(input_path, output_path, dry_run=False):
         logger.info(f" ")
         logger.info(f"[Dry Run] Would copy {input_path} to {output_path}")
         return output_path
-    shutil.copy2(input_path, output_path)
+    # One read of the source, hashed on the way
+    digest = copy_with_hash(input_path, output_path).digest
     logger.info(f" ")
-    logger.info(f"Copied to: {output_path}")
+    logger.info(f"Copied to: {output_path} (sha256 {digest})")
     return output_path
 
-def process_file(file_info, input_dir, output_dir, processed_dir, failed_dir, quality, dry_run):
-    """Process a single media file."""
-    global SUCCESSFUL_IMPORT_COUNT, FAILED_IMPORT_COUNT, SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE
+def _import_batch(paths):
+    """IMPORTER.import_batch, with an exception counted as a failure of every path"""
+    try:
+        return IMPORTER.import_batch(paths)
+    except Exception as e:
+        return ImportResult([], [], {path: str(e) for path in paths})
+
+def import_output(output_file, failed_dir, date_folder, dry_run=False):
+    """
+    Import a converted file (osxphotos with --skip-duplicates), retrying IMPORT_ATTEMPTS times and
+    restarting Photos after the second failure; then the importer's fallback (osascript). Move it
+    to the failed folder if both fail.
+    """
+    global SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE
+    for attempt in range(IMPORT_ATTEMPTS):
+        result = _import_batch([output_file])
+        if result.imported:
+            logger.info(f" ")
+            logger.info(f"Processed and imported: {output_file}")
+            count_successful_imports(1, dry_run)
+            return
+        reason = result.failed.get(output_file, "skipped as a duplicate")
+        if attempt == IMPORT_ATTEMPTS - 1:
+            logger.error(f"Failed to import {output_file} with {IMPORTER.name}: {reason}")
+            break
+        if attempt == 1:
+            logger.info(f" ")
+            logger.info(f"Triggering Photos app restart after attempt {attempt + 1} failed for {output_file}")
+            restart_importer(dry_run)
+        delay = IMPORT_RETRY_DELAY * (2 ** attempt)
+        logger.warning(f"Attempt {attempt + 1} failed: {reason}. Retrying in {delay}s...")
+        time.sleep(delay)
+
+    # Reset successful imports since last failure
+    with COUNTS_LOCK:
+        SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE = 0
+    # Fallback to osascript import
+    logger.info(f" ")
+    logger.info(f"Attempting to import {output_file} with the {IMPORTER.name} fallback")
+    if IMPORTER.import_fallback(output_file):
+        count_successful_imports(1, dry_run)
+    else:
+        logger.error(f"Failed to import {output_file} with both {IMPORTER.name} and its fallback")
+        move_to_failed(output_file, failed_dir, date_folder, dry_run)
+        count_failed_import()
+
+def import_outputs(outputs, failed_dir, dry_run=False):
+    """
+    Import a batch of (output_file, date_folder) with one importer call. Files the importer does
+    not report as imported (an error, or a skipped duplicate) go through import_output one by
+    one, with its retries and fallback.
+    """
+    if dry_run:
+        for output_file, _ in outputs:
+            logger.info(f" ")
+            logger.info(f"[Dry Run] Would import: {output_file}")
+        return
+    if len(outputs) > 1:
+        result = _import_batch([output_file for output_file, _ in outputs])
+        if result.imported:
+            logger.info(f" ")
+            logger.info(f"Processed and imported a batch of {len(result.imported)}: {', '.join(result.imported)}")
+            count_successful_imports(len(result.imported), dry_run)
+        imported = set(result.imported)
+        outputs = [(output_file, date_folder) for output_file, date_folder in outputs if output_file not in imported]
+        if outputs:
+            logger.warning(f"Batch import incomplete; importing {len(outputs)} file(s) one by one")
+    for output_file, date_folder in outputs:
+        import_output(output_file, failed_dir, date_folder, dry_run)
+
+def process_file(file_info, input_dir, output_dir, processed_dir, failed_dir, quality, dry_run, resolver,
+                 encoder_profile=None):
+    """
+    Convert a single media file and move its source to the processed folder; 'resolver' is the
+    run's shared DateResolver. Returns (output_file, date_folder) for the importer, or None.
+    """
     root, file = file_info
     file_path = os.path.join(root, file)
     try:
@@ -458,149 +636,310 @@ def process_file(file_info, input_dir, output_dir, processed_dir, failed_dir, qu
             return
 
         _, ext = os.path.splitext(file)
-        video_extensions = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".mpeg", ".webm", ".3gp")
-        image_extensions = (".jpg", ".jpeg", ".png", ".tiff", ".bmp", ".cr2", ".dng", ".heic")
 
         # Skip unsupported extensions early
-        if ext.lower() not in video_extensions + image_extensions:
+        if ext.lower() not in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS:
             logger.info(f" ")
             logger.info(f"Skipping unsupported file: {file_path}")
             return
 
+        # Resolve the date once; validation, output folder and processed/failed moves all reuse it
+        resolved = resolver.resolve(file_path)
+        date_folder = resolved.folder
+
         # Validate metadata and file integrity before processing
-        if not validate_metadata(file_path, dry_run):
+        if not validate_metadata(resolved.metadata_dates, dry_run):
             logger.info(f" ")
             logger.info(f"Skipping file with invalid metadata: {file_path}")
             if not dry_run:
-                move_to_failed(file_path, failed_dir, dry_run)
-                FAILED_IMPORT_COUNT += 1
+                move_to_failed(file_path, failed_dir, date_folder, dry_run)
+                count_failed_import()
             return
         if not validate_file_integrity(file_path, dry_run):
             logger.info(f" ")
             logger.info(f"Skipping file with invalid integrity: {file_path}")
             if not dry_run:
-                move_to_failed(file_path, failed_dir, dry_run)
-                FAILED_IMPORT_COUNT += 1
+                move_to_failed(file_path, failed_dir, date_folder, dry_run)
+                count_failed_import()
             return
 
         # Check for duplicates in Photos library
-        library_path = os.path.expanduser("~/Pictures/Photos Library.photoslibrary")
-        if check_for_duplicates(file_path, library_path, dry_run):
+        if check_for_duplicates(file_path, dry_run):
             logger.info(f" ")
             logger.info(f"Skipping duplicate file: {file_path}")
             if not dry_run:
-                move_to_failed(file_path, failed_dir, dry_run)
-                FAILED_IMPORT_COUNT += 1
+                move_to_failed(file_path, failed_dir, date_folder, dry_run)
+                count_failed_import()
             return
 
-        date_folder = get_oldest_date(file_path, dry_run)
         output_folder = os.path.join(output_dir, date_folder)
         if not dry_run:
             os.makedirs(output_folder, exist_ok=True)
 
+        converted = False
         if ext.lower() == ".heic":
             output_file = os.path.join(output_folder, file)
             output_file = copy_file_to_output(file_path, output_file, dry_run)
-        elif ext.lower() in image_extensions:
+        elif ext.lower() in IMAGE_EXTENSIONS:
             output_file = os.path.join(output_folder, f"{os.path.splitext(file)[0]}.heic")
             output_file = convert_image_to_heic(file_path, output_file, dry_run)
+            converted = True
             if not dry_run:
                 preserve_timestamps(file_path, output_file, dry_run)
-        elif ext.lower() in video_extensions:
+        elif ext.lower() in VIDEO_EXTENSIONS:
             if is_video_hevc(file_path, dry_run):
                 output_file = os.path.join(output_folder, file)
                 output_file = copy_file_to_output(file_path, output_file, dry_run)
             else:
                 output_file = os.path.join(output_folder, f"{os.path.splitext(file)[0]}_hevc.mp4")
-                output_file = convert_video_to_hevc(file_path, output_file, quality, dry_run)
+                output_file = convert_video_to_hevc(file_path, output_file, quality, dry_run,
+                                                    encoder_profile=encoder_profile)
+                converted = True
                 if not dry_run:
                     preserve_timestamps(file_path, output_file, dry_run)
 
-        if not dry_run:
-            move_to_processed(file_path, processed_dir, dry_run)
-            # Try osxphotos import with skip-duplicates
-            try:
-                import_result = retry_operation(
-                    subprocess.run,
-                    ["osxphotos", "import", "--verbose", "--skip-duplicates", output_file],
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False, dry_run=dry_run
-                )
-                combined_output = import_result.stdout + import_result.stderr
-                if "Error importing file" not in combined_output and "imported 0 file groups" not in combined_output:
-                    logger.info(f" ")
-                    logger.info(f"Processed and imported: {output_file}")
-                    SUCCESSFUL_IMPORT_COUNT += 1
-                    SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE += 1
-                    # Restart Photos app every 1500 successful imports
-                    if SUCCESSFUL_IMPORT_COUNT % IMPORTS_PER_RESTART == 0:
-                        logger.info(f" ")
-                        logger.info(f"Reached {SUCCESSFUL_IMPORT_COUNT} successful imports. Triggering Photos app restart.")
-                        restart_photos_app(dry_run)
-                    return
-                else:
-                    logger.error(f"Failed to import {output_file} with osxphotos: {import_result.stderr.strip() or combined_output.strip()}")
-            except subprocess.CalledProcessError as e:
-                logger.error(f"Failed to import {output_file} with osxphotos: {e.stderr.strip() or e.output.strip()}")
-            
-            # Reset successful imports since last failure
-            SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE = 0
-            # Fallback to osascript import
+        if converted and not dry_run and not validate_output(output_file, file_path, dry_run):
             logger.info(f" ")
-            logger.info(f"Attempting to import {output_file} with osascript")
-            if import_with_osascript(output_file, dry_run):
-                SUCCESSFUL_IMPORT_COUNT += 1
-                SUCCESSFUL_IMPORTS_SINCE_LAST_FAILURE += 1
-                # Restart Photos app every 1500 successful imports
-                if SUCCESSFUL_IMPORT_COUNT % IMPORTS_PER_RESTART == 0:
-                    logger.info(f" ")
-                    logger.info(f"Reached {SUCCESSFUL_IMPORT_COUNT} successful imports. Triggering Photos app restart.")
-                    restart_photos_app(dry_run)
-            else:
-                logger.error(f"Failed to import {output_file} with both osxphotos and osascript")
-                logger.warning(f"Duplicate dialog may appear for {output_file}. Consider manual import or third-party tools like PowerPhotos.")
-                move_to_failed(output_file, failed_dir, dry_run)
-                FAILED_IMPORT_COUNT += 1
+            logger.info(f"Skipping file with a broken conversion: {file_path}")
+            move_to_failed(file_path, failed_dir, date_folder, dry_run)
+            count_failed_import()
+            return
+
+        if not dry_run:
+            move_to_processed(file_path, processed_dir, date_folder, dry_run)
         else:
             logger.info(f" ")
-            logger.info(f"[Dry Run] Would process and import: {output_file}")
+            logger.info(f"[Dry Run] Would process: {output_file}")
+        return output_file, date_folder
 
+    except FfmpegStalled as e:
+        logger.error(f"Giving up on {file_path}: {e}")
+        move_to_failed(file_path, failed_dir, date_folder, dry_run)
+        count_failed_import()
     except Exception as e:
         logger.error(f"Error processing file {file_path}: {e}")
+    return None
 
-def process_media_files(input_dir, output_dir, processed_dir, failed_dir, quality=90, dry_run=False, workers=4):
-    """Process media files in parallel with progress reporting."""
-    global SUCCESSFUL_IMPORT_COUNT, FAILED_IMPORT_COUNT, OSASCRIPT_IMPORT_COUNT
-    logger.info(f"Starting media processing (Quality: {quality}%, Dry Run: {dry_run}, Workers: {workers})")
-    
-    # Collect all files
-    files = []
-    for root, _, filenames in sorted(os.walk(input_dir), key=lambda x: x[0], reverse=False):
+def iter_media_files(input_dir):
+    """Yield (root, file) in sorted order as the walk goes, without listing the whole tree first."""
+    for root, dirs, filenames in os.walk(input_dir):
+        dirs.sort()
         for file in sorted(filenames):
-            files.append((root, file))
-    
+            yield root, file
+
+def process_media_files(input_dir, output_dir, processed_dir, failed_dir, quality=90, dry_run=False, workers=4,
+                        encoder_profile=None, max_pending=None, import_batch_size=DEFAULT_BATCH_SIZE,
+                        ordered_import=False):
+    """
+    Process media files in parallel with progress reporting. Files are submitted while the walk
+    runs, at most max_pending (default: PENDING_PER_WORKER per worker) at a time, so memory does
+    not grow with the size of the tree.
+    The workers only convert: their outputs are imported by a single importer thread in batches
+    of import_batch_size (in walk order with ordered_import), while the workers go on converting.
+    """
+    logger.info(f"Starting media processing (Quality: {quality}%, Dry Run: {dry_run}, Workers: {workers}, "
+                f"Import batch: {import_batch_size}{', ordered' if ordered_import else ''})")
+    max_pending = max_pending or PENDING_PER_WORKER * workers
+
+    # Shared by the workers: metadata is read once per directory; a file's entries are dropped once it is done
+    resolver = DateResolver(read_metadata=not dry_run)
+    imports = ImportQueue(lambda outputs: import_outputs(outputs, failed_dir, dry_run), import_batch_size,
+                          ordered=ordered_import, max_queued=max(import_batch_size, max_pending) * 2)
+    imports.start()
+
+    def convert(seq, file_info):
+        result = None
+        try:
+            result = process_file(file_info, input_dir, output_dir, processed_dir, failed_dir, quality, dry_run,
+                                  resolver, encoder_profile)
+        finally:
+            imports.put(seq, result)  # skipped and failed files too, so the ordered importer moves on
+
     # Process files in parallel with progress bar
-    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-        futures = [
-            executor.submit(
-                process_file, (root, file), input_dir, output_dir, processed_dir, failed_dir, quality, dry_run
-            )
-            for root, file in files
-        ]
-        for _ in tqdm(concurrent.futures.as_completed(futures), total=len(futures), desc="Processing files"):
-            pass
-    
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor, \
+            tqdm(desc="Processing files", unit="file") as progress:
+        pending = {}
+
+        def collect(done):
+            for future in done:
+                resolver.forget(pending.pop(future))
+            progress.update(len(done))
+
+        for seq, (root, file) in enumerate(iter_media_files(input_dir)):
+            # Backpressure: the walk runs ahead of the workers by max_pending files only
+            if len(pending) >= max_pending:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(convert, seq, (root, file))
+            pending[future] = os.path.join(root, file)
+        collect(list(concurrent.futures.as_completed(list(pending))))
+    imports.close()
+
     logger.info(f" ")
-    logger.info(f"Media processing completed. Successful imports: {SUCCESSFUL_IMPORT_COUNT} (osxphotos: {SUCCESSFUL_IMPORT_COUNT - OSASCRIPT_IMPORT_COUNT}, osascript: {OSASCRIPT_IMPORT_COUNT}), Failed imports: {FAILED_IMPORT_COUNT}, Photos app restarts: {PHOTOS_RESTART_COUNT}")
+    logger.info(imports.report())
+    VERIFIER.save()
+    logger.info(VERIFIER.report())
+    IMPORTER.close()
+    if IMPORTER.report():
+        logger.info(IMPORTER.report())
+    logger.info(f"Media processing completed. Successful imports: {SUCCESSFUL_IMPORT_COUNT} ({IMPORTER.name}: {SUCCESSFUL_IMPORT_COUNT - OSASCRIPT_IMPORT_COUNT}, osascript: {OSASCRIPT_IMPORT_COUNT}), Failed imports: {FAILED_IMPORT_COUNT}, Photos app restarts: {PHOTOS_RESTART_COUNT}")
+
+# Default worker count per pipeline stage; "convert" defaults to --workers
+DEFAULT_STAGE_WORKERS = {"scan": 1, "probe": 2, "date": 2, "tag": 2, "place": 1, "import": 1}
+
+def run_pipeline(input_dir, output_dir, processed_dir, failed_dir, quality=90, dry_run=False, workers=4,
+                 stage_workers=None, queue_size=16, report_interval=30, encoder_profile=None):
+    """
+    Process media files as stages connected by bounded queues:
+    scan -> probe -> date -> convert -> tag -> place -> import.
+    Each stage has its own worker count; a slow import or disk write holds back the stages
+    in front of it instead of letting converted files pile up.
+    """
+    resolver = DateResolver(read_metadata=not dry_run)
+    counts = dict(DEFAULT_STAGE_WORKERS, convert=workers)
+    unknown = set(stage_workers or {}) - set(counts)
+    if unknown:
+        raise ValueError(f"Unknown pipeline stage(s): {', '.join(sorted(unknown))}")
+    counts.update(stage_workers or {})
+
+    def reject(job, reason):
+        logger.info(f" ")
+        logger.info(f"Skipping file with {reason}: {job['file_path']}")
+        if not dry_run:
+            move_to_failed(job["file_path"], failed_dir, resolver.resolve(job["file_path"]).folder, dry_run)
+            count_failed_import()
+        resolver.forget(job["file_path"])  # the job leaves the pipeline here
+
+    def scan(file_info):
+        root, file = file_info
+        file_path = os.path.join(root, file)
+        ext = os.path.splitext(file)[1].lower()
+        if file.startswith("._") or file == ".DS_Store" or not os.path.isfile(file_path):
+            return None
+        if ext not in VIDEO_EXTENSIONS + IMAGE_EXTENSIONS:
+            logger.info(f" ")
+            logger.info(f"Skipping unsupported file: {file_path}")
+            return None
+        return {"file_path": file_path, "ext": ext}
+
+    def probe(job):
+        if not validate_file_integrity(job["file_path"], dry_run):
+            return reject(job, "invalid integrity")
+        if check_for_duplicates(job["file_path"], dry_run):
+            return reject(job, "duplicate")
+        job["copy"] = job["ext"] == ".heic" or (job["ext"] in VIDEO_EXTENSIONS and is_video_hevc(job["file_path"], dry_run))
+        return job
+
+    def date(job):
+        resolved = resolver.resolve(job["file_path"])
+        if not validate_metadata(resolved.metadata_dates, dry_run):
+            return reject(job, "invalid metadata")
+        job["date_folder"] = resolved.folder
+        return job
+
+    def convert(job):
+        file_path = job["file_path"]
+        output_folder = os.path.join(output_dir, job["date_folder"])
+        if not dry_run:
+            os.makedirs(output_folder, exist_ok=True)
+        name = os.path.basename(file_path)
+        if job["copy"]:
+            job["output_file"] = copy_file_to_output(file_path, os.path.join(output_folder, name), dry_run)
+        elif job["ext"] in IMAGE_EXTENSIONS:
+            output_file = os.path.join(output_folder, f"{os.path.splitext(name)[0]}.heic")
+            job["output_file"] = convert_image_to_heic(file_path, output_file, dry_run, copy_tags=False)
+        else:
+            output_file = os.path.join(output_folder, f"{os.path.splitext(name)[0]}_hevc.mp4")
+            try:
+                job["output_file"] = convert_video_to_hevc(file_path, output_file, quality, dry_run, copy_tags=False,
+                                                           encoder_profile=encoder_profile)
+            except FfmpegStalled as e:
+                logger.error(f"Giving up on {file_path}: {e}")
+                return reject(job, "a stalled video encode")
+        return job
+
+    def tag(job):
+        if not job["copy"] and not dry_run:
+            # Images already carry their EXIF/XMP/ICC; videos get all tags copied
+            tag_args = leftover_tag_args(job["file_path"]) if job["ext"] in IMAGE_EXTENSIONS else []
+            if tag_args is not None:
+                copy_metadata(job["file_path"], job["output_file"], tag_args)
+            preserve_timestamps(job["file_path"], job["output_file"], dry_run)
+            if not validate_output(job["output_file"], job["file_path"], dry_run):
+                return reject(job, "a broken conversion")
+        return job
+
+    def place(job):
+        if not dry_run:
+            move_to_processed(job["file_path"], processed_dir, job["date_folder"], dry_run)
+        return job
+
+    def import_stage(job):
+        if dry_run:
+            logger.info(f" ")
+            logger.info(f"[Dry Run] Would process and import: {job['output_file']}")
+        else:
+            import_output(job["output_file"], failed_dir, job["date_folder"], dry_run)
+        resolver.forget(job["file_path"])
+        return job
+
+    def forgetting(func):
+        """Drop the cached date of a job that a stage error takes out of the pipeline"""
+        def stage(job):
+            try:
+                return func(job)
+            except Exception:
+                resolver.forget(job["file_path"])
+                raise
+        return stage
+
+    stages = [
+        Stage(name, func if name == "scan" else forgetting(func), counts[name], queue_size)
+        for name, func in (("scan", scan), ("probe", probe), ("date", date), ("convert", convert),
+                           ("tag", tag), ("place", place), ("import", import_stage))
+    ]
+    logger.info(f"Starting media pipeline (Quality: {quality}%, Dry Run: {dry_run}, "
+                f"Stages: {', '.join(f'{st.name}={st.workers}' for st in stages)}, Queue size: {queue_size})")
+
+    Pipeline(stages, report_interval).run(iter_media_files(input_dir))
+    logger.info(f" ")
+    VERIFIER.save()
+    logger.info(VERIFIER.report())
+    IMPORTER.close()
+    if IMPORTER.report():
+        logger.info(IMPORTER.report())
+    logger.info(f"Media processing completed. Successful imports: {SUCCESSFUL_IMPORT_COUNT} ({IMPORTER.name}: {SUCCESSFUL_IMPORT_COUNT - OSASCRIPT_IMPORT_COUNT}, osascript: {OSASCRIPT_IMPORT_COUNT}), Failed imports: {FAILED_IMPORT_COUNT}, Photos app restarts: {PHOTOS_RESTART_COUNT}")
 
 if __name__ == "__main__":
-    check_dependencies()
     args = parse_arguments()
-    process_media_files(
-        INPUT_DIRECTORY,
-        OUTPUT_DIRECTORY,
-        PROCESSED_DIRECTORY,
-        FAILED_DIRECTORY,
-        quality=args.quality,
-        dry_run=args.dry_run,
-        workers=args.workers
-    )
\ No newline at end of file
+    check_dependencies(args.importer)
+    if args.importer == "filesystem":
+        IMPORTER = FilesystemImporter(args.library_dir, **args.stand_in_options)
+    STALL_TIMEOUT = args.stall_timeout or None
+    encoder_profile = load_profile(args.encoder_profile) if args.encoder_profile else None
+    if args.pipeline:
+        run_pipeline(
+            INPUT_DIRECTORY,
+            OUTPUT_DIRECTORY,
+            PROCESSED_DIRECTORY,
+            FAILED_DIRECTORY,
+            quality=args.quality,
+            dry_run=args.dry_run,
+            workers=args.workers,
+            stage_workers=args.stage_workers,
+            queue_size=args.queue_size,
+            encoder_profile=encoder_profile
+        )
+    else:
+        process_media_files(
+            INPUT_DIRECTORY,
+            OUTPUT_DIRECTORY,
+            PROCESSED_DIRECTORY,
+            FAILED_DIRECTORY,
+            quality=args.quality,
+            dry_run=args.dry_run,
+            workers=args.workers,
+            encoder_profile=encoder_profile,
+            import_batch_size=args.import_batch,
+            ordered_import=args.ordered_import
+        )
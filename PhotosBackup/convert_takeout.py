@@ -8,6 +8,7 @@ from datetime import datetime
 import re
 import argparse
 import sys
+from xmp_sidecar import SidecarBatch, takeout_sidecar_fields
 
 # Register HEIF support with Pillow
 register_heif_opener()
@@ -253,9 +254,23 @@ def apply_metadata_from_json(media_file_path, json_path):
         log_failure(json_path, media_file_path, f"Metadata application error: {e}")
         return None
 
-def process_media_files(input_dir, output_dir, processed_dir, video_encoder, quality=28):
+def read_sidecar_fields(media_file_path, json_path):
+    """Read the JSON metadata for an .xmp sidecar (--sidecar-only) without touching the media file."""
+    try:
+        with open(json_path, "r") as json_file:
+            fields = takeout_sidecar_fields(json.load(json_file))
+        if not fields["date_taken"]:
+            log_failure(json_path, media_file_path, "Missing both photoTakenTime and creationTime")
+        return fields
+    except Exception as e:
+        log_failure(json_path, media_file_path, f"Metadata application error: {e}")
+        return None
+
+def process_media_files(input_dir, output_dir, processed_dir, video_encoder, quality=28, sidecar_only=False):
     """Process media files: apply metadata, convert, organize, and handle JSONs."""
     for root, _, files in sorted(os.walk(input_dir), key=lambda x: x[0], reverse=True):
+        # With --sidecar-only, sidecars are written in one batch per directory
+        sidecars = SidecarBatch() if sidecar_only else None
         for file in sorted(files):
             if file.startswith("._") or file.endswith(".json"):
                 print(f"Skipping file: {file}")
@@ -270,8 +285,13 @@ def process_media_files(input_dir, output_dir, processed_dir, video_encoder, qua
             try:
                 json_path = file_path + ".json"
                 capture_date = None
+                sidecar_fields = None
                 if os.path.exists(json_path):
-                    capture_date = apply_metadata_from_json(file_path, json_path)
+                    if sidecars is not None:
+                        sidecar_fields = read_sidecar_fields(file_path, json_path)
+                        capture_date = sidecar_fields and sidecar_fields["date_taken"]
+                    else:
+                        capture_date = apply_metadata_from_json(file_path, json_path)
 
                 # Get the oldest datetime for fallback
                 oldest_datetime = get_oldest_datetime(file_path)
@@ -305,6 +325,9 @@ def process_media_files(input_dir, output_dir, processed_dir, video_encoder, qua
                 # Set output file dates based on metadata, with fallback_time
                 set_file_dates_from_metadata(output_file, fallback_time=fallback_time)
 
+                if sidecar_fields:
+                    sidecars.add(output_file, **sidecar_fields)
+
                 # Handle JSON: Create modified JSON for the output file
                 if os.path.exists(json_path):
                     with open(json_path, "r") as json_file:
@@ -324,6 +347,8 @@ def process_media_files(input_dir, output_dir, processed_dir, video_encoder, qua
 
             except Exception as e:
                 print(f"Error processing file {file_path}: {e}")
+        if sidecars:
+            sidecars.flush()
 
 ### Main Execution
 
@@ -331,6 +356,7 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process Google Takeout media files.")
     parser.add_argument("--use-gpu", action="store_true", help="Use GPU for video conversion if available.")
     parser.add_argument("--quality", type=int, default=28, help="Quality setting for video conversion (e.g., 20-30 for GPU QP, 18-28 for CPU CRF).")
+    parser.add_argument("--sidecar-only", action="store_true", help="Write JSON dates, descriptions and GPS to .xmp sidecars next to the outputs instead of rewriting the originals.")
     args = parser.parse_args()
 
     def get_available_encoders():
@@ -375,5 +401,5 @@ if __name__ == "__main__":
         exit(1)
 
     print("Starting Google Takeout media processing...")
-    process_media_files(input_directory, output_directory, processed_directory, video_encoder, args.quality)
+    process_media_files(input_directory, output_directory, processed_directory, video_encoder, args.quality, args.sidecar_only)
     print("Processing complete.")
\ No newline at end of file
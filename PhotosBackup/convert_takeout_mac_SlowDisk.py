@@ -8,6 +8,7 @@ from datetime import datetime
 import re
 import argparse
 import sys
+from xmp_sidecar import SidecarBatch, takeout_sidecar_fields
 
 # Register HEIF support with Pillow
 register_heif_opener()
@@ -212,9 +213,23 @@ def apply_metadata_from_json(media_file_path, json_path):
     except Exception as e:
         log_failure(json_path, media_file_path, f"Metadata application error: {e}")
 
-def process_media_files(input_dir, output_dir, processed_dir, video_encoder, quality=28):
+def read_sidecar_fields(media_file_path, json_path):
+    """Read the JSON metadata for an .xmp sidecar (--sidecar-only) without touching the media file."""
+    try:
+        with open(json_path, "r") as json_file:
+            fields = takeout_sidecar_fields(json.load(json_file))
+        if not fields["date_taken"]:
+            log_failure(json_path, media_file_path, "Missing both photoTakenTime and creationTime")
+        return fields
+    except Exception as e:
+        log_failure(json_path, media_file_path, f"Metadata application error: {e}")
+        return None
+
+def process_media_files(input_dir, output_dir, processed_dir, video_encoder, quality=28, sidecar_only=False):
     """Process media files: apply metadata, convert, and organize."""
     for root, _, files in sorted(os.walk(input_dir), key=lambda x: x[0], reverse=False):
+        # With --sidecar-only, sidecars are written in one batch per directory
+        sidecars = SidecarBatch() if sidecar_only else None
         for file in sorted(files):
             if file.startswith("._") or file.endswith(".json"):
                 print(f"Skipping file: {file}")
@@ -228,10 +243,17 @@ def process_media_files(input_dir, output_dir, processed_dir, video_encoder, qua
 
             try:
                 json_path = file_path + ".json"
+                sidecar_fields = None
                 if os.path.exists(json_path):
-                    apply_metadata_from_json(file_path, json_path)
+                    if sidecars is not None:
+                        sidecar_fields = read_sidecar_fields(file_path, json_path)
+                    else:
+                        apply_metadata_from_json(file_path, json_path)
 
                 date_folder = get_oldest_date(file_path)
+                if sidecar_fields and sidecar_fields["date_taken"]:
+                    # The JSON date was not written into the original, so take it into account here
+                    date_folder = min(date_folder, sidecar_fields["date_taken"].strftime("%Y/%m/%d"))
                 output_folder = os.path.join(output_dir, date_folder)
                 os.makedirs(output_folder, exist_ok=True)
 
@@ -253,17 +275,23 @@ def process_media_files(input_dir, output_dir, processed_dir, video_encoder, qua
                 else:
                     continue
 
+                if sidecar_fields:
+                    sidecars.add(output_file, **sidecar_fields)
+
                 move_to_processed(file_path, processed_dir, date_folder)
                 if os.path.exists(json_path):
                     move_to_processed(json_path, processed_dir, date_folder)
 
             except Exception as e:
                 print(f"Error processing file {file_path}: {e}")
+        if sidecars:
+            sidecars.flush()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process Google Takeout media files.")
     parser.add_argument("--use-gpu", action="store_true", help="Use GPU for video conversion if available.")
     parser.add_argument("--quality", type=int, default=28, help="Quality setting for video conversion (e.g., 20-30 for GPU QP, 18-28 for CPU CRF).")
+    parser.add_argument("--sidecar-only", action="store_true", help="Write JSON dates, descriptions and GPS to .xmp sidecars next to the outputs instead of rewriting the originals.")
     args = parser.parse_args()
 
     def get_available_encoders():
@@ -307,5 +335,5 @@ if __name__ == "__main__":
         exit(1)
 
     print("Starting Google Takeout media processing...")
-    process_media_files(input_directory, output_directory, processed_directory, video_encoder, args.quality)
+    process_media_files(input_directory, output_directory, processed_directory, video_encoder, args.quality, args.sidecar_only)
     print("Processing complete.")
\ No newline at end of file
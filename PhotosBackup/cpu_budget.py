@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+CPU Budget
+One pool of CPU cores shared by everything the conversion engine runs, so several ffmpeg
+processes (each defaulting to every core) and a full pool of Pillow encodes no longer
+oversubscribe the machine:
+
+- an image encode leases one core before it is submitted to the process pool
+- an ffmpeg encode leases up to its fair share (cores / video workers) and is started with
+  that many -threads; it waits only for one free core and takes what is free at that moment
+- the ExifTool step of a video job leases one core (image jobs run ExifTool on their own core)
+
+Leases are returned as jobs finish, so the next ffmpeg job gets the cores the image jobs no
+longer use and vice versa. report() compares the cores handed out with the CPU time the
+process and its children actually used, and with the load average (above the core count
+means the machine is thrashing).
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class CpuBudget:
+    """Blocking leases of CPU cores, with allocation and utilisation accounting."""
+
+    def __init__(self, cores: Optional[int] = None, video_workers: int = 1, max_ffmpeg_threads: Optional[int] = None):
+        self.cores = cores or os.cpu_count() or 1
+        self.max_ffmpeg_threads = max_ffmpeg_threads
+        self.video_workers = max(1, video_workers)
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._by_kind: Dict[str, float] = {}  # core-seconds handed out per kind of work
+        self._condition = threading.Condition()
+        self._allocated_seconds = 0.0
+        self._last_change = time.monotonic()
+        self._started = self._last_change
+        self._cpu_start = self._cpu_seconds()
+        self._load_samples = []
+        self._stop = threading.Event()
+        self._sampler = None
+
+    def ffmpeg_share(self) -> int:
+        """Cores an ffmpeg encode asks for: its fair share of the budget, at most max_ffmpeg_threads"""
+        share = max(1, self.cores // self.video_workers)
+        return min(share, self.max_ffmpeg_threads) if self.max_ffmpeg_threads else share
+
+    def _account(self):
+        now = time.monotonic()
+        self._allocated_seconds += self.in_use * (now - self._last_change)
+        self._last_change = now
+
+    def acquire(self, wanted: int = 1, kind: str = "image") -> int:
+        """Wait for at least one free core and lease up to 'wanted'; returns the number leased"""
+        wanted = max(1, min(wanted, self.cores))
+        with self._condition:
+            if self.in_use >= self.cores:
+                self.waits += 1
+                while self.in_use >= self.cores:
+                    self._condition.wait()
+            granted = min(wanted, self.cores - self.in_use)
+            self._account()
+            self.in_use += granted
+            self.peak = max(self.peak, self.in_use)
+            self._by_kind.setdefault(kind, 0.0)
+            return granted
+
+    def release(self, cores: int, kind: str = "image", seconds: float = 0.0):
+        """Return a lease; 'seconds' is how long it was held (for the per-kind totals)"""
+        with self._condition:
+            self._account()
+            self.in_use = max(0, self.in_use - cores)
+            self._by_kind[kind] = self._by_kind.get(kind, 0.0) + cores * seconds
+            self._condition.notify_all()
+
+    @contextmanager
+    def lease(self, wanted: int = 1, kind: str = "image"):
+        """acquire()/release() around a block; yields the number of cores leased"""
+        granted = self.acquire(wanted, kind)
+        started = time.monotonic()
+        try:
+            yield granted
+        finally:
+            self.release(granted, kind, time.monotonic() - started)
+
+    @staticmethod
+    def _cpu_seconds() -> float:
+        """User + system CPU time of this process and its finished children (pool workers, ffmpeg, ExifTool)"""
+        times = os.times()
+        return times.user + times.system + times.children_user + times.children_system
+
+    def start_sampling(self, interval: float = 5.0):
+        """Sample the load average in the background until report()"""
+        if not hasattr(os, "getloadavg") or self._sampler:
+            return
+
+        def sample():
+            while not self._stop.wait(interval):
+                self._load_samples.append(os.getloadavg()[0])
+
+        self._sampler = threading.Thread(target=sample, name="cpu-budget-sampler", daemon=True)
+        self._sampler.start()
+
+    def report(self) -> str:
+        """Allocation vs observed utilisation; call after the pools have shut down"""
+        self._stop.set()
+        with self._condition:
+            self._account()
+            wall = max(time.monotonic() - self._started, 1e-6)
+            allocated = 100.0 * self._allocated_seconds / (wall * self.cores)
+            by_kind = ", ".join(f"{kind} {seconds / 60:.0f} min" for kind, seconds in sorted(self._by_kind.items()))
+            peak, waits = self.peak, self.waits
+        used = 100.0 * (self._cpu_seconds() - self._cpu_start) / (wall * self.cores)
+        lines = [f"CPU budget: {self.cores} cores, {allocated:.0f}% allocated, {used:.0f}% used "
+                 f"(peak {peak} leased, {waits} wait(s); core time by kind: {by_kind or 'none'})"]
+        if self._load_samples:
+            mean = sum(self._load_samples) / len(self._load_samples)
+            lines.append(f"  load average: mean {mean:.1f}, peak {max(self._load_samples):.1f} "
+                         f"(above {self.cores} means oversubscribed)")
+        return "\n".join(lines)
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+In-place Date Patcher
+Changes fixed-width date fields by seeking and overwriting a few bytes, instead of letting
+exiftool rewrite the whole file (which for a multi-GB video over SMB takes minutes).
+
+Supported layouts:
+- JPEG (APP1 Exif) and TIFF-based files (TIFF, CR2, DNG): the 20-byte ASCII
+  "YYYY:MM:DD HH:MM:SS" values of ModifyDate, DateTimeOriginal and CreateDate
+- QuickTime/MP4: the 32-bit (version 0) or 64-bit (version 1) creation/modification
+  timestamps of mvhd, tkhd and mdhd, stored as seconds since 1904-01-01 UTC
+
+Anything else (HEIC, XMP blocks or QuickTime user-data that also carry dates, a new value
+that does not fit a 32-bit field) is reported as not patchable, and callers fall back to exiftool.
+
+Edits are crash-safe: the original bytes are journaled (and fsynced) to <file>.datepatch before
+the file is touched, the new bytes are fsynced and read back, and the journal is removed last.
+A journal left behind by a crash is rolled back on the next call.
+"""
+
+import os
+import re
+import json
+import struct
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".datepatch"
+
+EXIF_DATE_LENGTH = 20
+EXIF_DATE_PATTERN = re.compile(rb"^\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2}\x00$")
+EXIF_IFD_POINTER = 0x8769
+TIFF_XMP_TAG = 0x02BC  # XMP packet embedded in IFD0 (TIFF, CR2, DNG)
+EXIF_DATE_TAGS = {
+    0x0132: "ModifyDate",
+    0x9003: "DateTimeOriginal",
+    0x9004: "CreateDate",
+}
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_DATE_NAMES = (b"DateTimeOriginal", b"CreateDate", b"ModifyDate", b"DateCreated")
+
+QT_EPOCH = datetime(1904, 1, 1)
+QT_CONTAINERS = {b"moov", b"trak", b"mdia"}
+QT_DATE_BOXES = {
+    b"mvhd": ("CreateDate", "ModifyDate"),
+    b"tkhd": ("TrackCreateDate", "TrackModifyDate"),
+    b"mdhd": ("MediaCreateDate", "MediaModifyDate"),
+}
+# udta/meta boxes are small; if they carry dates of their own, an in-place edit would leave them stale
+QT_USER_DATA_BOXES = {b"udta", b"meta"}
+QT_FOREIGN_DATES = (b"com.apple.quicktime.creationdate", b"\xa9day") + XMP_DATE_NAMES
+QT_TOP_LEVEL = {b"ftyp", b"moov", b"mdat", b"wide", b"free", b"skip", b"pnot"}
+XMP_UUID = bytes.fromhex("BE7ACFCB97A942E89C71999491E3AFAC")
+
+
+class UnsupportedLayout(Exception):
+    """The file's layout does not allow an in-place date edit"""
+
+
+class DateField(NamedTuple):
+    name: str        # exiftool tag name, e.g. "DateTimeOriginal" or "MediaCreateDate"
+    offset: int      # absolute file offset of the value
+    size: int        # width of the value in bytes
+    encoding: str    # "exif", "qt32" or "qt64"
+    raw: bytes       # current bytes at offset
+
+
+def _exif_fields(read_at, base: int) -> List[DateField]:
+    """Find the date fields of a TIFF structure; read_at(offset, size) is relative to the TIFF header"""
+    header = read_at(0, 8)
+    if header[:2] == b"II":
+        endian = "<"
+    elif header[:2] == b"MM":
+        endian = ">"
+    else:
+        raise UnsupportedLayout("not a TIFF header")
+    magic, ifd0 = struct.unpack(endian + "HI", header[2:8])
+    if magic != 42:
+        raise UnsupportedLayout("bad TIFF magic")
+
+    fields = []
+    ifd_offset, is_ifd0 = ifd0, True
+    while ifd_offset:
+        (count,) = struct.unpack(endian + "H", read_at(ifd_offset, 2))
+        entries = read_at(ifd_offset + 2, 12 * count)
+        exif_ifd = None
+        for i in range(count):
+            tag, value_type, value_count, value = struct.unpack(endian + "HHII", entries[i * 12:(i + 1) * 12])
+            if tag == EXIF_IFD_POINTER and is_ifd0:
+                exif_ifd = value
+            elif tag == TIFF_XMP_TAG and is_ifd0:
+                xmp = entries[i * 12 + 8:i * 12 + 8 + value_count] if value_count <= 4 else read_at(value, value_count)
+                if any(name in xmp for name in XMP_DATE_NAMES):
+                    raise UnsupportedLayout("XMP block also carries dates")
+            elif tag in EXIF_DATE_TAGS and value_type == 2 and value_count == EXIF_DATE_LENGTH:
+                raw = read_at(value, EXIF_DATE_LENGTH)
+                if EXIF_DATE_PATTERN.match(raw):
+                    fields.append(DateField(EXIF_DATE_TAGS[tag], base + value, EXIF_DATE_LENGTH, "exif", raw))
+        ifd_offset, is_ifd0 = exif_ifd, False
+    return fields
+
+
+def _jpeg_fields(f) -> List[DateField]:
+    """Walk the JPEG segments up to the start of scan and collect the Exif date fields"""
+    fields = []
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            break
+        if marker[1] == 0xFF:  # fill byte
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if marker[1] in (0xD9, 0xDA):  # EOI / SOS: no more metadata segments
+            break
+        if 0xD0 <= marker[1] <= 0xD7 or marker[1] == 0x01:  # markers without a length
+            continue
+        (length,) = struct.unpack(">H", f.read(2))
+        start = f.tell()
+        if marker[1] == 0xE1:
+            data = f.read(length - 2)
+            if data.startswith(b"Exif\x00\x00"):
+                tiff = data[6:]
+
+                def read_at(offset, size, tiff=tiff):
+                    chunk = tiff[offset:offset + size]
+                    if len(chunk) != size:
+                        raise UnsupportedLayout("Exif offset outside APP1 segment")
+                    return chunk
+
+                fields.extend(_exif_fields(read_at, start + 6))
+            elif data.startswith(XMP_HEADER) and any(name in data for name in XMP_DATE_NAMES):
+                raise UnsupportedLayout("XMP block also carries dates")
+        f.seek(start + length - 2)
+    return fields
+
+
+def _tiff_fields(f) -> List[DateField]:
+    """Collect the Exif date fields of a TIFF-based file (TIFF, CR2, DNG)"""
+    def read_at(offset, size):
+        f.seek(offset)
+        chunk = f.read(size)
+        if len(chunk) != size:
+            raise UnsupportedLayout("IFD offset past end of file")
+        return chunk
+
+    return _exif_fields(read_at, 0)
+
+
+def _iter_boxes(f, start: int, end: int):
+    """Yield (type, offset, header_size, size) for the QuickTime boxes between start and end"""
+    offset = start
+    while offset + 8 <= end:
+        f.seek(offset)
+        size, box_type = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", f.read(8))
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise UnsupportedLayout(f"truncated {box_type!r} box")
+        yield box_type, offset, header, size
+        offset += size
+
+
+def _quicktime_box_fields(f, start: int, end: int) -> List[DateField]:
+    fields = []
+    for box_type, offset, header, size in _iter_boxes(f, start, end):
+        if box_type in QT_CONTAINERS:
+            fields.extend(_quicktime_box_fields(f, offset + header, offset + size))
+        elif box_type in QT_DATE_BOXES:
+            f.seek(offset + header)
+            version = f.read(4)[0]
+            width = 8 if version == 1 else 4
+            raw = f.read(2 * width)
+            for i, name in enumerate(QT_DATE_BOXES[box_type]):
+                fields.append(DateField(name, offset + header + 4 + i * width, width,
+                                        f"qt{width * 8}", raw[i * width:(i + 1) * width]))
+        elif box_type in QT_USER_DATA_BOXES:
+            f.seek(offset + header)
+            data = f.read(size - header)
+            if any(name in data for name in QT_FOREIGN_DATES):
+                raise UnsupportedLayout(f"{box_type.decode()} box also carries dates")
+    return fields
+
+
+def _quicktime_fields(f, file_size: int) -> List[DateField]:
+    """Collect the mvhd/tkhd/mdhd timestamps of a QuickTime/MP4 file (moov may sit after mdat)"""
+    fields = []
+    for box_type, offset, header, size in _iter_boxes(f, 0, file_size):
+        if box_type == b"moov":
+            fields.extend(_quicktime_box_fields(f, offset + header, offset + size))
+        elif box_type == b"meta":
+            raise UnsupportedLayout("top-level meta box (HEIF) is not patched in place")
+        elif box_type == b"uuid":
+            f.seek(offset + header)
+            if f.read(16) == XMP_UUID:
+                data = f.read(size - header - 16)
+                if any(name in data for name in XMP_DATE_NAMES):
+                    raise UnsupportedLayout("XMP box also carries dates")
+    return fields
+
+
+def find_date_fields(path: str) -> List[DateField]:
+    """Locate the fixed-width date fields of a file; raises UnsupportedLayout if it cannot be patched"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        try:
+            if head[:2] == b"\xff\xd8":
+                return _jpeg_fields(f)
+            if head[:4] in (b"II*\x00", b"MM\x00*"):
+                return _tiff_fields(f)
+            if head[4:8] in QT_TOP_LEVEL:
+                return _quicktime_fields(f, os.fstat(f.fileno()).st_size)
+        except (struct.error, IndexError) as e:
+            raise UnsupportedLayout(f"malformed header: {e}")
+    raise UnsupportedLayout("unknown file format")
+
+
+def encode_date(field: DateField, date_time: datetime) -> bytes:
+    """Encode date_time for field, raising UnsupportedLayout if it does not fit the field width"""
+    if field.encoding == "exif":
+        return date_time.strftime("%Y:%m:%d %H:%M:%S").encode("ascii") + b"\x00"
+    # QuickTime dates are UTC; naive datetimes are written as-is, like exiftool does by default
+    if date_time.tzinfo:
+        date_time = date_time.astimezone(timezone.utc).replace(tzinfo=None)
+    seconds = int((date_time - QT_EPOCH).total_seconds())
+    if field.encoding == "qt32":
+        if not 0 <= seconds < 2 ** 32:
+            raise UnsupportedLayout(f"{date_time} does not fit a 32-bit {field.name}")
+        return struct.pack(">I", seconds)
+    return struct.pack(">Q", seconds)
+
+
+def decode_date(field: DateField) -> Optional[datetime]:
+    """Decode the current value of field (None for an unset QuickTime date)"""
+    if field.encoding == "exif":
+        return datetime.strptime(field.raw[:19].decode("ascii"), "%Y:%m:%d %H:%M:%S")
+    seconds = struct.unpack(">I" if field.encoding == "qt32" else ">Q", field.raw)[0]
+    return QT_EPOCH + timedelta(seconds=seconds) if seconds else None
+
+
+def read_file_dates(path: str) -> Dict[str, datetime]:
+    """Read the patchable dates of a file by tag name; empty if the layout is not supported"""
+    try:
+        fields = find_date_fields(path)
+    except (UnsupportedLayout, OSError) as e:
+        logger.debug(f"No in-place date fields in {path}: {e}")
+        return {}
+    dates = {}
+    for field in fields:
+        value = decode_date(field)
+        if value and field.name not in dates:
+            dates[field.name] = value
+    return dates
+
+
+def _fsync_directory(path: str):
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_journal(journal_path: str, edits):
+    temp_path = journal_path + ".tmp"
+    with open(temp_path, "w") as f:
+        json.dump({"edits": [[offset, old.hex(), new.hex()] for offset, old, new in edits]}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, journal_path)
+    _fsync_directory(journal_path)
+
+
+def _apply_journal(path: str, journal_path: str):
+    """Restore the original bytes recorded in the journal, then drop the journal"""
+    with open(journal_path) as f:
+        edits = json.load(f)["edits"]
+    with open(path, "r+b") as f:
+        for offset, old_hex, _ in edits:
+            f.seek(offset)
+            f.write(bytes.fromhex(old_hex))
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal_path)
+    _fsync_directory(journal_path)
+
+
+def recover_interrupted_patch(path: str) -> bool:
+    """Roll back an edit that was interrupted by a crash; returns True if a journal was found"""
+    journal_path = path + JOURNAL_SUFFIX
+    if not os.path.exists(journal_path):
+        return False
+    logger.warning(f"Rolling back interrupted date patch of {path}")
+    _apply_journal(path, journal_path)
+    return True
+
+
+def patch_file_dates(path: str, new_datetime: datetime, required: Optional[str] = None,
+                     preserve_times: bool = True) -> bool:
+    """
+    Set every patchable date field of path to new_datetime in place.
+
+    Returns True if the file now carries new_datetime (patched and verified), or False if the
+    layout does not allow an in-place edit - including when the tag named by `required` is not
+    among the patchable fields - in which case the caller should fall back to exiftool.
+    """
+    recover_interrupted_patch(path)
+    try:
+        fields = find_date_fields(path)
+        if not fields or (required and required not in {field.name for field in fields}):
+            return False
+        edits = [(field.offset, field.raw, encode_date(field, new_datetime)) for field in fields]
+    except (UnsupportedLayout, OSError) as e:
+        logger.debug(f"Cannot patch {path} in place: {e}")
+        return False
+
+    edits = [(offset, old, new) for offset, old, new in edits if old != new]
+    if not edits:
+        return True
+
+    stat = os.stat(path)
+    journal_path = path + JOURNAL_SUFFIX
+    try:
+        _write_journal(journal_path, edits)
+        with open(path, "r+b") as f:
+            for offset, _, new in edits:
+                f.seek(offset)
+                f.write(new)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(path, "rb") as f:
+            for offset, _, new in edits:
+                f.seek(offset)
+                if f.read(len(new)) != new:
+                    raise OSError(f"verification failed at offset {offset}")
+        os.remove(journal_path)
+        _fsync_directory(journal_path)
+    except OSError as e:
+        logger.error(f"In-place date patch of {path} failed: {e}")
+        if os.path.exists(journal_path):
+            try:
+                _apply_journal(path, journal_path)
+            except (OSError, ValueError) as rollback_error:
+                logger.error(f"Rollback of {path} failed, journal kept at {journal_path}: {rollback_error}")
+        return False
+    finally:
+        if preserve_times:
+            os.utime(path, (stat.st_atime, stat.st_mtime))
+
+    logger.info(f"Patched {len(edits)} date field(s) in place: {path}")
+    return True
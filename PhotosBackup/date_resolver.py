@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Date Resolver
+Resolves the capture date of media files once per run, instead of every script re-running
+get_oldest_date (one exiftool process per file, recompiled regexes) and move_to_processed
+resolving the same date a second time after conversion.
+
+- Metadata for a whole directory is read with one exiftool call (-json), the first time any
+  file in that directory is resolved.
+- The YYYY/MM/DD folder date is parsed once per directory.
+- Every result is memoized per file and carries its source, so later stages reuse it.
+
+Candidates are EXIF, QuickTime, the Google Takeout JSON (<file>.json), the filename and the
+YYYY/MM/DD path; the oldest day wins, as in get_oldest_date. The file's mtime is the fallback.
+METADATA_PATH_SOURCES restricts a resolver to the candidates of the original get_oldest_date.
+"""
+
+import os
+import re
+import json
+import logging
+import subprocess
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from filename_dates import get_date_from_filename
+from xmp_sidecar import takeout_taken_time
+
+logger = logging.getLogger(__name__)
+
+METADATA_TAGS = ("DateTimeOriginal", "CreateDate", "MediaCreateDate", "ContentCreateDate")
+# Tags that only exist in QuickTime containers; CreateDate counts as QuickTime for videos
+QUICKTIME_TAGS = ("MediaCreateDate", "ContentCreateDate")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".mpeg", ".webm", ".3gp", ".mts", ".m4v")
+
+PATH_DATE_PATTERN = re.compile(r"(\d{4})/(\d{2})/(\d{2})")
+METADATA_DATE_PATTERN = re.compile(r"(\d{4}):(\d{2}):(\d{2}) (\d{2}):(\d{2}):(\d{2})")
+
+# Sources, in the order used to break ties between candidates with the same date
+SOURCE_EXIF = "exif"
+SOURCE_QUICKTIME = "quicktime"
+SOURCE_JSON = "json"
+SOURCE_FILENAME = "filename"
+SOURCE_PATH = "path"
+SOURCE_MTIME = "mtime"
+SOURCE_PRIORITY = (SOURCE_EXIF, SOURCE_QUICKTIME, SOURCE_JSON, SOURCE_FILENAME, SOURCE_PATH, SOURCE_MTIME)
+# The candidates of the original get_oldest_date: metadata and the YYYY/MM/DD path (mtime as fallback)
+METADATA_PATH_SOURCES = (SOURCE_EXIF, SOURCE_QUICKTIME, SOURCE_PATH, SOURCE_MTIME)
+
+EXIFTOOL_BATCH_SIZE = 500
+
+
+class ResolvedDate(NamedTuple):
+    date: datetime
+    source: str                     # one of SOURCE_PRIORITY
+    metadata_dates: Dict[str, str]  # raw exiftool tags, as returned by read_metadata_dates()
+
+    @property
+    def folder(self) -> str:
+        """The date as a YYYY/MM/DD folder"""
+        return self.date.strftime("%Y/%m/%d")
+
+
+def parse_metadata_date(value: str) -> Optional[datetime]:
+    """Parse an exiftool date ("2016:06:11 21:20:49", sub-seconds and offsets ignored)"""
+    match = METADATA_DATE_PATTERN.match(value or "")
+    if not match:
+        return None
+    try:
+        return datetime(*map(int, match.groups()))
+    except ValueError:  # e.g. "0000:00:00 00:00:00"
+        return None
+
+
+def extract_date_from_path(file_path: str) -> Optional[datetime]:
+    """Extract a date in YYYY/MM/DD format from the file path"""
+    match = PATH_DATE_PATTERN.search(file_path)
+    if match:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+    return None
+
+
+def read_metadata_batch(file_paths: List[str]) -> Dict[str, Dict[str, str]]:
+    """Read the date tags of many files with one exiftool call per EXIFTOOL_BATCH_SIZE files"""
+    metadata = {}
+    for start in range(0, len(file_paths), EXIFTOOL_BATCH_SIZE):
+        batch = file_paths[start:start + EXIFTOOL_BATCH_SIZE]
+        try:
+            result = subprocess.run(
+                ["exiftool", "-json", "-charset", "filename=utf8"]
+                + [f"-{tag}" for tag in METADATA_TAGS] + ["--"] + batch,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True
+            )
+            # exiftool exits non-zero if any file failed, but still reports the others
+            entries = json.loads(result.stdout) if result.stdout.strip() else []
+        except Exception as e:
+            logger.error(f"Error reading metadata dates for {len(batch)} files: {e}")
+            continue
+        for entry in entries:
+            source_file = entry.pop("SourceFile", None)
+            if source_file:
+                metadata[os.path.normpath(source_file)] = {
+                    tag: str(value) for tag, value in entry.items() if tag in METADATA_TAGS
+                }
+    return metadata
+
+
+def read_metadata_dates(file_path: str) -> Dict[str, str]:
+    """Read the date tags of a single file, e.g. {"DateTimeOriginal": "2023:08:25 12:34:56"}"""
+    return read_metadata_batch([file_path]).get(os.path.normpath(file_path), {})
+
+
+def read_json_date(file_path: str) -> Optional[datetime]:
+    """Return the capture time from a Google Takeout <file>.json next to file_path, if any"""
+    json_path = file_path + ".json"
+    if not os.path.exists(json_path):
+        return None
+    try:
+        with open(json_path, "r") as json_file:
+            return takeout_taken_time(json.load(json_file))
+    except (OSError, ValueError, AttributeError) as e:
+        logger.warning(f"Could not read date from {json_path}: {e}")
+        return None
+
+
+class DateResolver:
+    """
+    Memoizing date resolver for one run. Thread-safe, so a single instance can be shared by
+    worker threads. With read_metadata=False (dry runs) exiftool is never called. 'sources'
+    limits the candidates considered, e.g. METADATA_PATH_SOURCES.
+    """
+
+    def __init__(self, read_metadata: bool = True, sources=SOURCE_PRIORITY):
+        self.read_metadata = read_metadata
+        self.sources = tuple(sources)
+        self._lock = threading.Lock()
+        self._directory_locks: Dict[str, threading.Lock] = {}
+        self._metadata: Dict[str, Dict[str, str]] = {}
+        self._prefetched = set()
+        self._folder_dates: Dict[str, Optional[datetime]] = {}
+        self._resolved: Dict[str, ResolvedDate] = {}
+
+    def prefetch_directory(self, dir_path: str):
+        """Read the date tags of every file in dir_path with one batched exiftool call"""
+        dir_path = os.path.normpath(dir_path)
+        with self._lock:
+            directory_lock = self._directory_locks.setdefault(dir_path, threading.Lock())
+        with directory_lock:
+            if dir_path in self._prefetched:
+                return
+            try:
+                names = sorted(os.listdir(dir_path))
+            except OSError as e:
+                logger.error(f"Error listing {dir_path}: {e}")
+                names = []
+            file_paths = [
+                os.path.join(dir_path, name) for name in names
+                if not name.startswith(".") and not name.lower().endswith((".json", ".xmp"))
+                and os.path.isfile(os.path.join(dir_path, name))
+            ]
+            metadata = {}
+            if file_paths and self.read_metadata:
+                metadata = read_metadata_batch(file_paths)
+                for file_path in file_paths:
+                    metadata.setdefault(file_path, {})  # unreadable files are not retried one by one
+            with self._lock:
+                self._metadata.update(metadata)
+                self._prefetched.add(dir_path)
+
+    def metadata_dates(self, file_path: str) -> Dict[str, str]:
+        """Raw date tags of file_path, from the directory batch (or a single read if missed)"""
+        if not self.read_metadata:
+            return {}
+        file_path = os.path.normpath(file_path)
+        self.prefetch_directory(os.path.dirname(file_path))
+        with self._lock:
+            tags = self._metadata.get(file_path)
+        if tags is None:
+            # Added after the directory was read, or skipped by the batch filter
+            tags = read_metadata_dates(file_path)
+            with self._lock:
+                self._metadata[file_path] = tags
+        return tags
+
+    def folder_date(self, file_path: str) -> Optional[datetime]:
+        """The YYYY/MM/DD date of the file's directory, parsed once per directory"""
+        dir_path = os.path.dirname(os.path.normpath(file_path))
+        if dir_path not in self._folder_dates:
+            self._folder_dates[dir_path] = extract_date_from_path(dir_path + os.sep)
+        return self._folder_dates[dir_path]
+
+    def candidates(self, file_path: str) -> List[ResolvedDate]:
+        """Every date found for file_path, with its source"""
+        metadata_dates = self.metadata_dates(file_path)
+        is_video = file_path.lower().endswith(VIDEO_EXTENSIONS)
+        found = []
+        for tag, value in metadata_dates.items():
+            date = parse_metadata_date(value)
+            if date:
+                source = SOURCE_QUICKTIME if is_video or tag in QUICKTIME_TAGS else SOURCE_EXIF
+                found.append(ResolvedDate(date, source, metadata_dates))
+        dates = []
+        if SOURCE_JSON in self.sources:
+            dates.append((SOURCE_JSON, read_json_date(file_path)))
+        if SOURCE_FILENAME in self.sources:
+            dates.append((SOURCE_FILENAME, get_date_from_filename(os.path.basename(file_path))))
+        if SOURCE_PATH in self.sources:
+            dates.append((SOURCE_PATH, self.folder_date(file_path)))
+        for source, date in dates:
+            if date:
+                found.append(ResolvedDate(date.replace(tzinfo=None), source, metadata_dates))
+        return [candidate for candidate in found if candidate.source in self.sources]
+
+    def resolve(self, file_path: str) -> ResolvedDate:
+        """
+        Return the oldest date of file_path and its source, falling back to the file's mtime.
+        Candidates are compared by day, so a midnight filename or path date does not hide the
+        time of day of an EXIF/QuickTime date on the same day.
+        """
+        key = os.path.normpath(file_path)
+        with self._lock:
+            if key in self._resolved:
+                return self._resolved[key]
+
+        found = self.candidates(file_path)
+        if found:
+            resolved = min(found, key=lambda c: (c.date.date(), SOURCE_PRIORITY.index(c.source)))
+        else:
+            resolved = ResolvedDate(
+                datetime.fromtimestamp(os.path.getmtime(file_path)), SOURCE_MTIME, self.metadata_dates(file_path)
+            )
+
+        with self._lock:
+            self._resolved[key] = resolved
+        return resolved
+
+    def remember(self, file_path: str, resolved: ResolvedDate):
+        """Record the date of a file created or moved by a later stage (e.g. the converted output)"""
+        with self._lock:
+            self._resolved[os.path.normpath(file_path)] = resolved
+
+    def forget(self, file_path: str):
+        """Drop the cached metadata and date of a finished file, so a long run's memory stays flat"""
+        key = os.path.normpath(file_path)
+        with self._lock:
+            self._metadata.pop(key, None)
+            self._resolved.pop(key, None)
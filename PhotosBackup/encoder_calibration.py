@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Encoder Calibration
+Picks the libx265 preset and CRF for this machine and this library instead of a hardcoded
+quality knob (-b:v 8000k, -q:v 90, -crf 28 and the quality -> CRF mapping of
+convert_and_import_osx.py):
+
+1. cut a short clip from the middle of each sample video (stream copy)
+2. encode every clip at each preset x CRF combination, timing the encode (frames per second)
+3. score each encode against its clip with ffmpeg's ssim and psnr filters
+4. recommend the fastest setting whose worst clip still meets the target score
+
+The recommendation is written to a JSON profile (ENCODER_PROFILE_FILE) that the conversion
+functions read through load_profile() / profile_video_args().
+
+Usage: python3 encoder_calibration.py SAMPLE [SAMPLE ...] [--target 0.98] [--metric ssim]
+SAMPLE is a video file or a folder whose videos are used.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, NamedTuple, Optional
+
+from savings_estimator import frame_rate
+from video_probe import media_duration, probe_media, streams_of_type
+
+logger = logging.getLogger(__name__)
+
+ENCODER_PROFILE_FILE = "encoder_profile.json"
+DEFAULT_PRESETS = ("ultrafast", "superfast", "veryfast", "faster", "fast", "medium")
+DEFAULT_CRFS = (20, 22, 24, 26, 28, 30)
+DEFAULT_CLIP_SECONDS = 10
+DEFAULT_TARGETS = {"ssim": 0.98, "psnr": 40.0}
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v", ".mts", ".3gp", ".wmv", ".webm")
+
+_SSIM_PATTERN = re.compile(r"SSIM .*All:([0-9.]+)")
+_PSNR_PATTERN = re.compile(r"PSNR .*average:([0-9.]+|inf)")
+
+
+class CalibrationResult(NamedTuple):
+    preset: str
+    crf: int
+    fps: float             # encode speed over all clips
+    ssim: float            # worst clip
+    psnr: float            # worst clip
+    bits_per_pixel: float  # output video bits per pixel, for the savings estimator
+
+    def score(self, metric: str) -> float:
+        return self.ssim if metric == "ssim" else self.psnr
+
+    def describe(self) -> str:
+        return (f"preset {self.preset:<9} crf {self.crf:>2}: {self.fps:6.1f} fps, SSIM {self.ssim:.4f}, "
+                f"PSNR {self.psnr:5.2f} dB, {self.bits_per_pixel:.3f} bits/pixel")
+
+
+def libx265_args(preset: str, crf: int) -> List[str]:
+    return ["-c:v", "libx265", "-preset", preset, "-crf", str(crf), "-x265-params", "log-level=error"]
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+
+
+def extract_clip(input_path: str, clip_path: str, seconds: float) -> Optional[Dict]:
+    """Stream-copy 'seconds' of video from the middle of input_path; returns the clip's probe"""
+    duration = media_duration(probe_media(input_path))
+    if not duration:
+        return None
+    start = max(0.0, duration / 2 - seconds / 2)
+    _run(["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", str(seconds), "-i", input_path,
+          "-map", "0:v:0", "-c", "copy", "-an", clip_path])
+    probe = probe_media(clip_path)
+    return probe if streams_of_type(probe or {}, "video") and media_duration(probe) else None
+
+
+def measure_quality(encoded_path: str, reference_path: str) -> Dict[str, float]:
+    """SSIM (All) and PSNR (average, dB) of encoded_path against reference_path"""
+    result = _run([
+        "ffmpeg", "-v", "info", "-nostats", "-i", encoded_path, "-i", reference_path,
+        "-lavfi", "[0:v]split[d1][d2];[1:v]split[r1][r2];[d1][r1]ssim;[d2][r2]psnr", "-f", "null", "-"
+    ])
+    ssim = _SSIM_PATTERN.search(result.stderr)
+    psnr = _PSNR_PATTERN.search(result.stderr)
+    if not ssim or not psnr:
+        raise ValueError(f"No SSIM/PSNR in the ffmpeg output for {encoded_path}")
+    return {"ssim": float(ssim.group(1)), "psnr": 100.0 if psnr.group(1) == "inf" else float(psnr.group(1))}
+
+
+def calibrate(clips: List[Dict], presets=DEFAULT_PRESETS, crfs=DEFAULT_CRFS,
+              work_dir: Optional[str] = None) -> List[CalibrationResult]:
+    """
+    Encode every clip ({"path": ..., "probe": ...}) at each preset and CRF. Speed is measured
+    over all clips together; quality is that of the worst clip.
+    """
+    work_dir = work_dir or tempfile.gettempdir()
+    results = []
+    for preset in presets:
+        for crf in crfs:
+            frames, seconds, bits, pixels = 0.0, 0.0, 0.0, 0.0
+            scores = []
+            for i, clip in enumerate(clips):
+                video = streams_of_type(clip["probe"], "video")[0]
+                clip_frames = media_duration(clip["probe"]) * frame_rate(video)
+                encoded_path = os.path.join(work_dir, f"encoded_{i}_{preset}_{crf}.mp4")
+                started = time.monotonic()
+                _run(["ffmpeg", "-v", "error", "-y", "-i", clip["path"], "-an"]
+                     + libx265_args(preset, crf) + [encoded_path])
+                seconds += time.monotonic() - started
+                frames += clip_frames
+                bits += os.path.getsize(encoded_path) * 8
+                pixels += clip_frames * (video.get("width") or 0) * (video.get("height") or 0)
+                scores.append(measure_quality(encoded_path, clip["path"]))
+                os.remove(encoded_path)
+            result = CalibrationResult(preset, crf, frames / seconds if seconds else 0.0,
+                                       min(s["ssim"] for s in scores), min(s["psnr"] for s in scores),
+                                       bits / pixels if pixels else 0.0)
+            logger.info(result.describe())
+            results.append(result)
+    return results
+
+
+def recommend(results: List[CalibrationResult], metric: str, target: float) -> Optional[CalibrationResult]:
+    """The fastest setting that meets the target (the smaller output on a tie), or None"""
+    passing = [r for r in results if r.score(metric) >= target]
+    if not passing:
+        return None
+    return max(passing, key=lambda r: (round(r.fps, 1), -r.bits_per_pixel))
+
+
+def save_profile(path: str, best: CalibrationResult, metric: str, target: float,
+                 results: List[CalibrationResult]):
+    profile = {
+        "encoder": "libx265", "preset": best.preset, "crf": best.crf,
+        "metric": metric, "target": target, "fps": best.fps, "ssim": best.ssim, "psnr": best.psnr,
+        "bits_per_pixel": best.bits_per_pixel,
+        "calibrated": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "results": [r._asdict() for r in results],
+    }
+    with open(path, "w") as f:
+        json.dump(profile, f, indent=2)
+
+
+def load_profile(path: str = ENCODER_PROFILE_FILE) -> Dict:
+    """Read a profile written by this module (raises OSError/ValueError if it is missing or invalid)"""
+    with open(path) as f:
+        profile = json.load(f)
+    if "preset" not in profile or "crf" not in profile:
+        raise ValueError(f"{path} is not an encoder profile")
+    return profile
+
+
+def profile_video_args(profile: Dict) -> List[str]:
+    """ffmpeg video encoder options of a calibrated profile"""
+    return libx265_args(profile["preset"], int(profile["crf"]))
+
+
+def sample_videos(paths: List[str]) -> List[str]:
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos += [os.path.join(root, f) for f in sorted(files)
+                           if f.lower().endswith(VIDEO_EXTENSIONS) and not f.startswith("._")]
+        else:
+            videos.append(path)
+    return videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the fastest libx265 preset/CRF that meets a quality target.")
+    parser.add_argument("samples", nargs="+", help="Sample videos, or folders of them")
+    parser.add_argument("--presets", default=",".join(DEFAULT_PRESETS),
+                        help="Comma-separated libx265 presets to try")
+    parser.add_argument("--crfs", default=",".join(map(str, DEFAULT_CRFS)), help="Comma-separated CRFs to try")
+    parser.add_argument("--seconds", type=float, default=DEFAULT_CLIP_SECONDS,
+                        help=f"Length of the clip cut from each sample (default: {DEFAULT_CLIP_SECONDS})")
+    parser.add_argument("--metric", choices=sorted(DEFAULT_TARGETS), default="ssim")
+    parser.add_argument("--target", type=float,
+                        help="Minimum score of the worst clip (default: SSIM 0.98 / PSNR 40 dB)")
+    parser.add_argument("--max-samples", type=int, default=5, help="Use at most this many sample videos")
+    parser.add_argument("--profile", default=ENCODER_PROFILE_FILE,
+                        help=f"Where to write the profile (default: {ENCODER_PROFILE_FILE})")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    target = args.target if args.target is not None else DEFAULT_TARGETS[args.metric]
+    try:
+        crfs = [int(c) for c in args.crfs.split(",")]
+    except ValueError:
+        parser.error(f"Invalid --crfs '{args.crfs}'")
+    presets = [p.strip() for p in args.presets.split(",") if p.strip()]
+
+    work_dir = tempfile.mkdtemp(prefix="encoder_calibration_")
+    try:
+        clips = []
+        for i, video in enumerate(sample_videos(args.samples)[:args.max_samples]):
+            clip_path = os.path.join(work_dir, f"clip_{i}.mkv")
+            try:
+                probe = extract_clip(video, clip_path, args.seconds)
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Skipping {video}: {e}")
+                continue
+            if probe:
+                logger.info(f"Sample clip {i}: {video}")
+                clips.append({"path": clip_path, "probe": probe})
+        if not clips:
+            print("No usable sample videos")
+            return 1
+
+        results = calibrate(clips, presets, crfs, work_dir)
+        best = recommend(results, args.metric, target)
+        if not best:
+            best_score = max(r.score(args.metric) for r in results)
+            print(f"No setting reaches {args.metric.upper()} {target} (best: {best_score:.4f}); "
+                  f"try lower CRFs or a slower preset")
+            return 1
+        save_profile(args.profile, best, args.metric, target, results)
+        print(f"Recommended: {best.describe()}")
+        print(f"Profile written to {args.profile}")
+        return 0
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
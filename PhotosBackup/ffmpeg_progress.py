@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+ffmpeg Progress
+Runs ffmpeg with -progress pipe:1 instead of a blind subprocess.run(..., check=True):
+
+- out_time, speed and fps are parsed from the progress blocks ffmpeg writes every ~0.5s
+- each job gets an ETA, and a ProgressBoard prints a live summary across the running jobs
+- an encode whose output time has not advanced for 'stall_timeout' seconds (a hung decoder
+  on a corrupted input) is killed and FfmpegStalled is raised, so the caller can move the
+  source to the failed folder instead of blocking the pipeline forever
+
+ffmpeg's stderr is kept in a temporary file; its last lines are logged when ffmpeg fails.
+"""
+
+import time
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STALL_TIMEOUT = 300  # seconds without progress before an encode is killed
+STDERR_TAIL_LINES = 10
+
+
+class FfmpegStalled(Exception):
+    """ffmpeg made no progress for the stall timeout and was killed."""
+
+    def __init__(self, label: str, timeout: float, out_time: float):
+        super().__init__(f"ffmpeg made no progress for {timeout:.0f}s at {out_time:.1f}s of {label}")
+        self.label = label
+        self.timeout = timeout
+        self.out_time = out_time
+
+
+def format_seconds(seconds: Optional[float]) -> str:
+    """1h02m, 3m10s or 42s ('?' if unknown)"""
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    """'1.53x' -> 1.53, 'N/A' -> None"""
+    try:
+        return float(value.rstrip("x")) if value else None
+    except ValueError:
+        return None
+
+
+class JobProgress:
+    """Latest progress of one ffmpeg run."""
+
+    def __init__(self, label: str, duration: Optional[float]):
+        self.label = label
+        self.duration = duration
+        self.out_time = 0.0
+        self.speed: Optional[float] = None
+        self.fps: Optional[float] = None
+        self.started = time.monotonic()
+        self.last_advance = self.started
+
+    def update(self, fields: Dict[str, str]):
+        """Apply one progress block (key=value lines up to 'progress=')"""
+        out_time_us = _parse_float(fields.get("out_time_us"))
+        if out_time_us is not None and out_time_us / 1e6 > self.out_time:
+            self.out_time = out_time_us / 1e6
+            self.last_advance = time.monotonic()
+        self.speed = _parse_float(fields.get("speed")) or self.speed
+        self.fps = _parse_float(fields.get("fps")) or self.fps
+
+    def fraction(self) -> Optional[float]:
+        if not self.duration:
+            return None
+        return min(1.0, self.out_time / self.duration)
+
+    def eta(self) -> Optional[float]:
+        """Seconds left: remaining media time over the encode speed (else the elapsed rate)"""
+        if not self.duration:
+            return None
+        remaining = max(0.0, self.duration - self.out_time)
+        if self.speed:
+            return remaining / self.speed
+        if self.out_time:
+            return remaining * (time.monotonic() - self.started) / self.out_time
+        return None
+
+    def describe(self) -> str:
+        fraction = self.fraction()
+        done = f"{fraction * 100:.0f}%" if fraction is not None else format_seconds(self.out_time)
+        speed = f"{self.speed:.2f}x" if self.speed else "?x"
+        fps = f"{self.fps:.0f} fps" if self.fps else "? fps"
+        return f"{self.label}: {done}, {speed}, {fps}, ETA {format_seconds(self.eta())}"
+
+
+class ProgressBoard:
+    """Thread-safe view of every running ffmpeg job, for the live summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs: Dict[int, JobProgress] = {}
+        self._next_id = 0
+        self.finished = 0
+        self.stalled = 0
+
+    def start(self, label: str, duration: Optional[float]) -> int:
+        with self._lock:
+            self._next_id += 1
+            self._jobs[self._next_id] = JobProgress(label, duration)
+            return self._next_id
+
+    def update(self, job_id: int, fields: Dict[str, str]) -> JobProgress:
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(fields)
+            return job
+
+    def finish(self, job_id: int, stalled: bool = False):
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            self.finished += 1
+            self.stalled += stalled
+
+    def summary(self) -> str:
+        with self._lock:
+            jobs = list(self._jobs.values())
+            finished, stalled = self.finished, self.stalled
+        header = f"ffmpeg: {len(jobs)} running, {finished} finished, {stalled} stalled"
+        if not jobs:
+            return header
+        etas = [job.eta() for job in jobs]
+        longest = max(etas) if None not in etas else None
+        lines = [f"{header}, all running jobs done in {format_seconds(longest)}"]
+        lines += [f"  {job.describe()}" for job in sorted(jobs, key=lambda j: j.started)]
+        return "\n".join(lines)
+
+    @contextmanager
+    def reporting(self, interval: float):
+        """Print summary() every 'interval' seconds while jobs are running"""
+        stop = threading.Event()
+
+        def report():
+            while not stop.wait(interval):
+                with self._lock:
+                    running = bool(self._jobs)
+                if running:
+                    print(self.summary())
+
+        thread = threading.Thread(target=report, name="ffmpeg-progress", daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+            thread.join()
+
+
+def run_ffmpeg(args: List[str], label: str, duration: Optional[float] = None,
+               stall_timeout: Optional[float] = None, board: Optional[ProgressBoard] = None):
+    """
+    Run an ffmpeg command (args[0] == "ffmpeg") with progress reporting. Raises
+    subprocess.CalledProcessError if ffmpeg fails and FfmpegStalled if it stops making progress.
+    'duration' (seconds of media) enables the percentage and ETA.
+    """
+    board = board or ProgressBoard()
+    command = [args[0], "-nostats", "-progress", "pipe:1"] + list(args[1:])
+    job_id = board.start(label, duration)
+    stalled = False
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                   stderr=stderr, text=True)
+
+        def read_progress():
+            fields = {}
+            for line in process.stdout:
+                key, _, value = line.strip().partition("=")
+                fields[key] = value
+                if key == "progress":
+                    board.update(job_id, fields)
+                    fields = {}
+
+        reader = threading.Thread(target=read_progress, name="ffmpeg-progress-reader", daemon=True)
+        reader.start()
+        try:
+            while True:
+                try:
+                    process.wait(timeout=1)
+                    break
+                except subprocess.TimeoutExpired:
+                    pass
+                job = board.update(job_id, {})
+                if stall_timeout and time.monotonic() - job.last_advance > stall_timeout:
+                    stalled = True
+                    process.kill()
+                    process.wait()
+                    raise FfmpegStalled(label, stall_timeout, job.out_time)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            reader.join()
+            process.stdout.close()
+            board.finish(job_id, stalled)
+
+        if process.returncode != 0:
+            stderr.seek(0)
+            tail = stderr.read().decode(errors="replace").strip().splitlines()[-STDERR_TAIL_LINES:]
+            logger.error(f"ffmpeg failed on {label} (exit {process.returncode}):\n" + "\n".join(tail))
+            raise subprocess.CalledProcessError(process.returncode, command, stderr="\n".join(tail))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Filename Date Engine
+Extracts the capture date from a media filename with one precompiled regular expression,
+instead of building ~22k "YYYY-MM-DD"/"YYYYMMDD" prefixes and scanning them for every file.
+
+Recognised names (prefixes are case-insensitive):
+- 2013-07-09 12.16.44.jpg              YYYY-MM-DD
+- 20180804_025359000_iOS.jpg           YYYYMMDD
+- 2016_01_01_party.jpg                 YYYY_MM_DD (followed by "_" or end of name)
+- WP_20151026_10_15_40_Pro.jpg         Windows Phone
+- IMG_20180804_123456.jpg, VID_..., PXL_..., MVIMG_..., PANO_..., BURST_...,
+  Screenshot_..., IMG-20180804-WA0001.jpg (WhatsApp), as found in Google Takeout
+"""
+
+import re
+from datetime import datetime
+from typing import Optional
+
+YEAR = r"20[0-2]\d|2030"
+MONTH = r"0[1-9]|1[0-2]"
+DAY = r"0[1-9]|[12]\d|3[01]"
+
+FILENAME_DATE_PATTERN = re.compile(
+    r"^(?:(?:WP|IMG|VID|PXL|MVIMG|PANO|BURST|Screenshot)_|(?:IMG|VID)-)?"
+    rf"(?P<year>{YEAR})"
+    r"(?:"
+    rf"-(?P<dash_month>{MONTH})-(?P<dash_day>{DAY})"
+    rf"|_(?P<underscore_month>{MONTH})_(?P<underscore_day>{DAY})(?=_|$)"
+    rf"|(?P<month>{MONTH})(?P<day>{DAY})"
+    r")",
+    re.IGNORECASE,
+)
+
+
+def get_date_from_filename(filename: str) -> Optional[datetime]:
+    """Return the date encoded at the start of filename (at 00:00:00), or None"""
+    match = FILENAME_DATE_PATTERN.match(filename)
+    if not match:
+        return None
+    groups = match.groupdict()
+    month = groups["dash_month"] or groups["underscore_month"] or groups["month"]
+    day = groups["dash_day"] or groups["underscore_day"] or groups["day"]
+    try:
+        return datetime(int(groups["year"]), int(month), int(day))
+    except ValueError:  # e.g. 2018-02-31
+        return None
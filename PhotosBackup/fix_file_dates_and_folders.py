@@ -1,9 +1,12 @@
 import os
 import shutil
+import argparse
 import exiftool
 from pathlib import Path
 from datetime import datetime
 import time
+from xmp_sidecar import SidecarBatch
+from filename_dates import get_date_from_filename
 
 # Define the base directory and subfolders to process
 base_dir = "/Volumes/SlowDisk/toimport"
@@ -30,50 +33,6 @@ def parse_date(date_str):
         print(f"Error parsing date '{date_str}': {e}")
         return None
 
-def get_date_from_filename(filename):
-    # Extract the date from the filename (formats: YYYY-MM-DD, YYYY_MM_DD, YYYYMMDD, or WP_YYYYMMDD)
-    try:
-        # Check for YYYY-MM-DD format (e.g., 2013-07-09 12.16.44.jpg)
-        if filename.startswith(tuple(f"{year}-{month:02d}-{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
-            date_part = filename[:10]  # First 10 characters: YYYY-MM-DD
-            year, month, day = date_part.split("-")
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for WP_YYYYMMDD format (e.g., WP_20151026_10_15_40_Pro.jpg)
-        if filename.startswith("WP_") and len(filename) > 11:  # WP_ + 8 chars for YYYYMMDD
-            date_part = filename[3:11]  # Extract YYYYMMDD after WP_
-            year = date_part[:4]
-            month = date_part[4:6]
-            day = date_part[6:8]
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for YYYYMMDD format (e.g., 20180804_025359000_iOS.jpg)
-        if filename.startswith(tuple(f"{year}{month:02d}{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
-            date_part = filename[:8]  # First 8 characters: YYYYMMDD
-            year = date_part[:4]
-            month = date_part[4:6]
-            day = date_part[6:8]
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for YYYY_MM_DD format (e.g., 2016_01_01_...)
-        if "_" in filename:
-            date_part = filename.split("_", 3)[:3]  # Split on "_" and take first 3 parts
-            if len(date_part) == 3 and len(date_part[0]) == 4 and len(date_part[1]) == 2 and len(date_part[2]) == 2:
-                year, month, day = date_part
-                # Validate that year, month, and day are numeric and within reasonable ranges
-                if (year.isdigit() and month.isdigit() and day.isdigit() and
-                    2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                    return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-        return None
-    except (ValueError, IndexError):
-        return None
-
 def get_file_dates(filepath):
     # Get Created, Modified, and Content Created dates using exiftool
     with exiftool.ExifToolHelper() as et:
@@ -138,10 +97,13 @@ def get_folder_date(filepath):
         pass
     return None
 
-def set_file_dates(filepath, target_date):
+def set_file_dates(filepath, target_date, sidecar_only=False):
     # Set the Created and Modified dates on the filesystem
     timestamp = int(target_date.timestamp())
     os.utime(filepath, (timestamp, timestamp))
+    if sidecar_only:
+        # Metadata dates go to an .xmp sidecar instead (written by the caller after the move)
+        return
     # Update metadata dates using exiftool
     with exiftool.ExifToolHelper() as et:
         try:
@@ -167,7 +129,7 @@ def ensure_folder_exists(folder_path):
     # Create the folder if it doesn't exist
     Path(folder_path).mkdir(parents=True, exist_ok=True)
 
-def fix_file_dates_and_folders():
+def fix_file_dates_and_folders(sidecar_only=False):
     # Process each subfolder
     for subfolder in subfolders:
         subfolder_path = os.path.join(base_dir, subfolder)
@@ -177,6 +139,8 @@ def fix_file_dates_and_folders():
 
         # Walk through all folders in the subfolder
         for root, _, files in os.walk(subfolder_path):
+            # With --sidecar-only, sidecars are written in one batch per directory
+            sidecars = SidecarBatch() if sidecar_only else None
             for filename in files:
                 # Skip files that don't match the expected format
                 if not filename.lower().endswith(supported_extensions):
@@ -212,7 +176,7 @@ def fix_file_dates_and_folders():
                 if content_created == earliest_date and content_created < min(dates):
                     print(f"Fixing {filename} in {subfolder}: Content Created ({content_created}) is earliest")
                     # Update filesystem and metadata dates
-                    set_file_dates(filepath, content_created)
+                    set_file_dates(filepath, content_created, sidecar_only)
                     # Move to correct folder
                     year = content_created.strftime("%Y")
                     month = content_created.strftime("%m")
@@ -225,6 +189,8 @@ def fix_file_dates_and_folders():
                     # Check for conflicts
                     if os.path.exists(new_path):
                         print(f"Conflict: {filename} already exists in {correct_folder}. Skipping move.")
+                        if sidecars:
+                            sidecars.add(filepath, date_taken=content_created)
                         continue
 
                     # Move the file
@@ -233,6 +199,15 @@ def fix_file_dates_and_folders():
                         print(f"Moved {filename} from {root} to {correct_folder}")
                     except Exception as e:
                         print(f"Error moving {filename}: {e}")
+                        new_path = filepath
+                    if sidecars:
+                        sidecars.add(new_path, date_taken=content_created)
+            if sidecars:
+                sidecars.flush()
 
 if __name__ == "__main__":
-    fix_file_dates_and_folders()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fix file dates and move files into their YYYY/MM/DD folders.")
+    parser.add_argument("--sidecar-only", action="store_true",
+                        help="Write corrected dates to .xmp sidecars instead of rewriting the media files.")
+    args = parser.parse_args()
+    fix_file_dates_and_folders(sidecar_only=args.sidecar_only)
\ No newline at end of file
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Hashed Copy
+A copy primitive that reads the source once and hashes it on the way, instead of
+shutil.copy2 followed by a cross-volume shutil.move (another full read) and a separate
+hash pass for deduplication (a third read):
+
+- one source read can feed several destinations (e.g. the output and the processed folder)
+- a single destination is copied in the kernel with os.copy_file_range, else os.sendfile
+  (Linux); each copied chunk is hashed from the destination's page cache, not re-read from
+  the source. Elsewhere (macOS) the source is streamed through one reused buffer.
+- the byte count of every destination is checked against the source size
+- fsyncs are grouped by FsyncBatch, and move_file() only removes a source once its copy
+  is durable
+
+The digest (sha256 by default) is returned for the conversion journal and any dedupe index.
+"""
+
+import os
+import shutil
+import hashlib
+import logging
+import threading
+from typing import Callable, List, NamedTuple, Optional, Sequence, Union
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 8 * 1024 * 1024
+DEFAULT_ALGORITHM = "sha256"
+
+
+class CopyResult(NamedTuple):
+    nbytes: int
+    digest: Optional[str]  # hex digest of the copied bytes (None if no algorithm was given)
+
+
+def _full_fsync(fd: int):
+    """fsync, using F_FULLFSYNC on macOS where plain fsync does not flush the drive's cache"""
+    if fcntl is not None and hasattr(fcntl, "F_FULLFSYNC"):
+        try:
+            fcntl.fcntl(fd, fcntl.F_FULLFSYNC)
+            return
+        except OSError:
+            pass
+    os.fsync(fd)
+
+
+def same_volume(a: str, b: str) -> bool:
+    """Whether a and b (or their nearest existing parents) are on the same device, i.e. a move is a rename"""
+    def device(path):
+        path = os.path.abspath(path)
+        while not os.path.exists(path) and os.path.dirname(path) != path:
+            path = os.path.dirname(path)
+        return os.stat(path).st_dev
+    return device(a) == device(b)
+
+
+def fsync_path(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        _full_fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FsyncBatch:
+    """
+    Thread-safe group of written files made durable together: once max_files or max_bytes are
+    pending (or on flush()), every file and its directory is fsynced, then each file's
+    on_durable callback runs.
+    """
+
+    def __init__(self, max_files: int = 64, max_bytes: int = 512 * 1024 * 1024):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pending = []
+        self._pending_bytes = 0
+        self.batches = 0
+        self.files = 0
+
+    def add(self, path: str, nbytes: int = 0, on_durable: Optional[Callable[[], None]] = None):
+        with self._lock:
+            self._pending.append((path, on_durable))
+            self._pending_bytes += nbytes
+            full = len(self._pending) >= self.max_files or self._pending_bytes >= self.max_bytes
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending, self._pending_bytes = self._pending, [], 0
+        if not pending:
+            return
+        for path, _ in pending:
+            fsync_path(path)
+        for directory in {os.path.dirname(os.path.abspath(path)) for path, _ in pending}:
+            try:
+                fsync_path(directory)
+            except OSError:
+                pass  # directories cannot be opened for fsync on every platform
+        with self._lock:
+            self.batches += 1
+            self.files += len(pending)
+        for _, on_durable in pending:
+            if on_durable:
+                on_durable()
+
+
+def _kernel_copy(src_fd: int, dst_fd: int, size: int, hasher) -> int:
+    """copy_file_range (or sendfile) in chunks, hashing each chunk from the destination; -1 if unsupported"""
+    copy_chunk = getattr(os, "copy_file_range", None)
+    if copy_chunk is None and hasattr(os, "sendfile") and os.uname().sysname == "Linux":
+        copy_chunk = lambda src, dst, count: os.sendfile(dst, src, None, count)
+    if copy_chunk is None:
+        return -1
+    copied = 0
+    while copied < size:
+        try:
+            n = copy_chunk(src_fd, dst_fd, min(CHUNK_SIZE, size - copied))
+        except OSError:
+            if copied:
+                raise
+            logger.debug("Kernel copy unsupported here, streaming instead", exc_info=True)
+            return -1  # e.g. EXDEV/EINVAL on older kernels or some filesystems
+        if n == 0:
+            break
+        if hasher:
+            hasher.update(os.pread(dst_fd, n, copied))
+        copied += n
+    return copied
+
+
+def _stream_copy(source, targets, hasher) -> int:
+    """Read the source once through one buffer, writing every chunk to each target"""
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    copied = 0
+    while True:
+        n = source.readinto(buffer)
+        if not n:
+            return copied
+        if hasher:
+            hasher.update(view[:n])
+        for target in targets:
+            target.write(view[:n])
+        copied += n
+
+
+def copy_with_hash(src: str, destinations: Union[str, Sequence[str]], algorithm: Optional[str] = DEFAULT_ALGORITHM,
+                   fsync_batch: Optional[FsyncBatch] = None, preserve_stat: bool = True) -> CopyResult:
+    """
+    Copy src to one or more destinations with a single read of src, returning the byte count and
+    the digest. Like shutil.copy2, permissions and timestamps are copied (preserve_stat).
+    Destinations are fsynced through 'fsync_batch' if given. A destination left incomplete by an
+    error is removed and the error re-raised.
+    """
+    if isinstance(destinations, str):
+        destinations = [destinations]
+    hasher = hashlib.new(algorithm) if algorithm else None
+    targets: List = []
+    try:
+        with open(src, "rb") as source:
+            size = os.fstat(source.fileno()).st_size
+            targets = [open(path, "wb+") for path in destinations]
+            copied = -1
+            if len(targets) == 1:
+                copied = _kernel_copy(source.fileno(), targets[0].fileno(), size, hasher)
+            if copied < 0:
+                copied = _stream_copy(source, targets, hasher)
+            for target in targets:
+                target.flush()
+                written = os.fstat(target.fileno()).st_size
+                if written != copied or copied != size:
+                    raise OSError(f"Short copy of {src}: {written} of {size} bytes written to {target.name}")
+    except BaseException:
+        for target in targets:
+            target.close()
+            try:
+                os.remove(target.name)
+            except OSError:
+                pass
+        raise
+    for target in targets:
+        target.close()
+        if preserve_stat:
+            shutil.copystat(src, target.name)
+        if fsync_batch:
+            fsync_batch.add(target.name, copied)
+    return CopyResult(copied, hasher.hexdigest() if hasher else None)
+
+
+def move_file(src: str, dst: str, fsync_batch: Optional[FsyncBatch] = None,
+              algorithm: Optional[str] = None) -> Optional[str]:
+    """
+    Move src to dst: a rename on the same volume, otherwise a single-read copy whose source is
+    removed only once the copy is durable (after the batch's next flush, or right away without
+    a batch). Returns the digest of a copied file (if 'algorithm' is given), else None.
+    """
+    try:
+        os.rename(src, dst)
+        return None
+    except OSError:
+        if os.path.exists(dst) or not os.path.exists(src):
+            raise
+    result = copy_with_hash(src, dst, algorithm)
+    if fsync_batch:
+        fsync_batch.add(dst, result.nbytes, on_durable=lambda: os.remove(src))
+    else:
+        fsync_path(dst)
+        os.remove(src)
+    return result.digest
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+HEIF Metadata
+Carries EXIF, XMP and the ICC profile into the HEIF output at save time (pillow_heif's
+exif=, xmp= and icc_profile= options), instead of a second exiftool -tagsFromFile pass that
+rewrites every output.
+
+- The EXIF orientation is applied to the pixels before encoding and reset to 1 in both EXIF
+  and XMP, so viewers do not rotate the image a second time.
+- leftover_tag_args() tells the caller what exiftool still has to copy: nothing for plain
+  JPEG/PNG, the IPTC block if the JPEG has one, and everything for TIFF and RAW sources
+  (Pillow sees their TIFF structure, not a self-contained EXIF block).
+"""
+
+import re
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+RAW_EXTENSIONS = (".cr2", ".cr3", ".dng", ".nef", ".arw", ".raf", ".orf", ".rw2")
+ORIENTATION_TAG = 0x0112
+EXIF_HEADER = b"Exif\x00\x00"
+XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+XMP_EXTENSION_HEADER = b"http://ns.adobe.com/xmp/extension/\x00"
+XMP_ORIENTATION_PATTERN = re.compile(rb'(tiff:Orientation(?:="|>))\d(["<])')
+
+
+def _source_xmp(image: Image.Image) -> Optional[bytes]:
+    """The XMP packet of a JPEG/PNG/WebP image, if it has one"""
+    xmp = image.info.get("xmp") or image.info.get("XML:com.adobe.xmp")
+    if xmp:
+        return xmp.encode("utf-8") if isinstance(xmp, str) else xmp
+    for marker, data in getattr(image, "applist", []):
+        if marker == "APP1" and data.startswith(XMP_HEADER):
+            return data[len(XMP_HEADER):]
+    return None
+
+
+def prepare_for_heif(image: Image.Image) -> Tuple[Image.Image, Dict]:
+    """
+    Return the upright image and the pillow_heif save options (exif, xmp, icc_profile) that
+    carry the source metadata. The caller closes the returned image if it is not 'image'.
+    """
+    icc_profile = image.info.get("icc_profile")
+    xmp = _source_xmp(image)
+    exif = image.getexif()
+    if exif.get(ORIENTATION_TAG, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+        exif = image.getexif()
+        if xmp:
+            xmp = XMP_ORIENTATION_PATTERN.sub(rb"\g<1>1\g<2>", xmp)
+    if ORIENTATION_TAG in exif:
+        exif[ORIENTATION_TAG] = 1
+
+    options = {}
+    if len(exif):
+        options["exif"] = exif.tobytes()
+    if xmp:
+        options["xmp"] = xmp
+    if icc_profile:
+        options["icc_profile"] = icc_profile
+    return image, options
+
+
+def leftover_tag_args(input_path: str) -> Optional[List[str]]:
+    """
+    exiftool -tagsFromFile arguments for the metadata prepare_for_heif() cannot embed.
+    None: nothing is left. []: copy everything (exiftool's default). Otherwise the groups to copy.
+    """
+    if input_path.lower().endswith(RAW_EXTENSIONS):
+        return []
+    try:
+        with Image.open(input_path) as image:
+            if image.format == "TIFF":
+                return []
+            groups = []
+            for marker, data in getattr(image, "applist", []):
+                if marker == "APP13" and "-IPTC:all" not in groups:
+                    groups.append("-IPTC:all")
+                elif marker == "APP1" and data.startswith(XMP_EXTENSION_HEADER) and "-XMP:all" not in groups:
+                    groups.append("-XMP:all")  # extended XMP is too large for one packet
+            return groups or None
+    except Exception as e:
+        logger.warning(f"Could not inspect metadata of {input_path}, copying all tags with exiftool: {e}")
+        return []
+
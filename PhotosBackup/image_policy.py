@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Image Conversion Policy
+Decides per image whether a HEIC conversion is worth it, and with which pillow_heif settings,
+from what earlier conversions of the same kind achieved.
+
+- Images are grouped into buckets by source format and file size (e.g. "png/<256KB").
+- Every conversion records its source size, output size and encode time in a small JSON
+  stats file, so the history carries over between runs.
+- Buckets that historically save less than a threshold are copied as-is instead of converted;
+  every EXPLORE_EVERY-th image of a skipped bucket is still converted to keep the stats fresh.
+- Each bucket has its own save parameters (quality, encoder preset), tuned from its stats once
+  it has MIN_SAMPLES conversions: buckets that shrink a lot are encoded at a higher quality, and
+  buckets that save few bytes per encode CPU-second use the fast preset. Until then the defaults
+  below apply; the "settings" section of the stats file overrides both.
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+IMAGE_STATS_FILE = "image_conversion_stats.json"
+SIZE_BUCKETS = ((256 * 1024, "<256KB"), (1024 * 1024, "<1MB"), (4 * 1024 * 1024, "<4MB"),
+                (16 * 1024 * 1024, "<16MB"))
+LARGEST_BUCKET = ">=16MB"
+MIN_SAMPLES = 10      # conversions needed in a bucket before it can be skipped
+EXPLORE_EVERY = 20    # convert one in this many images of a skipped bucket anyway
+REPORT_EVERY = 100    # print the running totals every this many conversions
+
+# pillow_heif save parameters per size bucket; small images are encoded with a faster preset
+DEFAULT_SETTINGS = {
+    "<256KB": {"enc_params": {"preset": "fast"}},
+    "<1MB": {"enc_params": {"preset": "fast"}},
+}
+# Tuning from the stats; each switch has a wider exit threshold, so a bucket does not flip back
+# and forth as its own new settings shift the stats
+HIGH_QUALITY = 90             # quality of buckets that save at least HIGH_SAVINGS percent
+HIGH_SAVINGS = 70.0
+HIGH_SAVINGS_EXIT = 55.0
+FAST_PRESET_BELOW = 1e6       # bytes saved per encode CPU-second under which the fast preset is used
+FAST_PRESET_EXIT = 2e6
+
+
+class ImagePlan(NamedTuple):
+    bucket: str
+    convert: bool
+    save_params: Dict
+    reason: str
+
+
+def size_bucket(size: int) -> str:
+    for limit, name in SIZE_BUCKETS:
+        if size < limit:
+            return name
+    return LARGEST_BUCKET
+
+
+def bucket_key(file_path: str, size: int) -> str:
+    """e.g. "png/<256KB" """
+    ext = os.path.splitext(file_path)[1].lower().lstrip(".")
+    return f"{'jpg' if ext == 'jpeg' else ext}/{size_bucket(size)}"
+
+
+class ImagePolicy:
+    """Thread-safe conversion policy backed by a JSON stats file; save() writes the stats back."""
+
+    def __init__(self, stats_file: Optional[str] = IMAGE_STATS_FILE, min_savings: Optional[float] = None):
+        self.stats_file = stats_file
+        self.min_savings = min_savings
+        self._lock = threading.Lock()
+        self.buckets: Dict[str, Dict[str, float]] = {}
+        self.settings: Dict[str, Dict] = {}
+        self.tuned: Dict[str, Dict] = {}
+        self._seen: Dict[str, int] = {}
+        self.source_bytes = 0
+        self.output_bytes = 0
+        self.encode_seconds = 0.0
+        self.conversions = 0
+        self.skipped = 0
+        self.load()
+
+    def load(self):
+        if not self.stats_file or not os.path.exists(self.stats_file):
+            return
+        try:
+            with open(self.stats_file, "r") as f:
+                data = json.load(f)
+            self.buckets = data.get("buckets", {})
+            self.settings = data.get("settings", {})
+            self.tuned = data.get("tuned", {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable image stats file {self.stats_file}: {e}")
+
+    def save(self):
+        if not self.stats_file:
+            return
+        with self._lock:
+            data = {"buckets": self.buckets, "settings": self.settings, "tuned": self.tuned}
+        try:
+            with open(self.stats_file, "w") as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+        except OSError as e:
+            logger.error(f"Could not write image stats file {self.stats_file}: {e}")
+
+    def savings_percent(self, bucket: str) -> Optional[float]:
+        """Historical size reduction of a bucket in percent, None until MIN_SAMPLES conversions"""
+        stats = self.buckets.get(bucket)
+        if not stats or stats["count"] < MIN_SAMPLES or not stats["source_bytes"]:
+            return None
+        return 100.0 * (stats["source_bytes"] - stats["output_bytes"]) / stats["source_bytes"]
+
+    def save_params(self, bucket: str) -> Dict:
+        """pillow_heif save parameters for a bucket: stats file settings, tuned, then DEFAULT_SETTINGS"""
+        size = bucket.split("/", 1)[-1]
+        manual = self.settings.get(bucket) or self.settings.get(size)
+        if manual:
+            return manual
+        with self._lock:
+            tuned = self.tuned.get(bucket)
+        return DEFAULT_SETTINGS.get(size, {}) if tuned is None else tuned
+
+    def _tune(self, bucket: str):
+        """Derive the bucket's quality and preset from its stats (called with the lock held)"""
+        savings = self.savings_percent(bucket)
+        if savings is None:
+            return
+        stats = self.buckets[bucket]
+        current = self.tuned.get(bucket, DEFAULT_SETTINGS.get(bucket.split("/", 1)[-1], {}))
+        params = {}
+        high_quality = current.get("quality") == HIGH_QUALITY
+        if savings >= (HIGH_SAVINGS_EXIT if high_quality else HIGH_SAVINGS):
+            params["quality"] = HIGH_QUALITY
+        saved = stats["source_bytes"] - stats["output_bytes"]
+        per_second = saved / stats["encode_seconds"] if stats["encode_seconds"] else float("inf")
+        fast = current.get("enc_params", {}).get("preset") == "fast"
+        if per_second < (FAST_PRESET_EXIT if fast else FAST_PRESET_BELOW):
+            params["enc_params"] = {"preset": "fast"}
+        if params != self.tuned.get(bucket):
+            if bucket in self.tuned:
+                logger.info(f"Image settings of {bucket} tuned to {params or 'defaults'} "
+                            f"({savings:.0f}% saved, {per_second / 1e6:.2f} MB per CPU-second)")
+            self.tuned[bucket] = params
+
+    def plan(self, file_path: str) -> ImagePlan:
+        """Decide whether to convert file_path and with which parameters"""
+        bucket = bucket_key(file_path, os.path.getsize(file_path))
+        params = self.save_params(bucket)
+        with self._lock:
+            savings = self.savings_percent(bucket)
+            if self.min_savings is None or savings is None or savings >= self.min_savings:
+                return ImagePlan(bucket, True, params, "converting")
+            self._seen[bucket] = self._seen.get(bucket, 0) + 1
+            if self._seen[bucket] % EXPLORE_EVERY == 0:
+                return ImagePlan(bucket, True, params, f"sampling bucket that saves {savings:.0f}%")
+            self.skipped += 1
+        return ImagePlan(bucket, False, params, f"{bucket} saves only {savings:.0f}% on average")
+
+    def record(self, bucket: str, source_bytes: int, output_bytes: int, encode_seconds: float):
+        """Add one finished conversion to the bucket's stats and the running totals"""
+        with self._lock:
+            stats = self.buckets.setdefault(
+                bucket, {"count": 0, "source_bytes": 0, "output_bytes": 0, "encode_seconds": 0.0}
+            )
+            stats["count"] += 1
+            stats["source_bytes"] += source_bytes
+            stats["output_bytes"] += output_bytes
+            stats["encode_seconds"] += encode_seconds
+            self._tune(bucket)
+            self.conversions += 1
+            self.source_bytes += source_bytes
+            self.output_bytes += output_bytes
+            self.encode_seconds += encode_seconds
+            report = self.conversions % REPORT_EVERY == 0
+        if report:
+            print(self.report())
+
+    def report(self) -> str:
+        with self._lock:
+            saved = self.source_bytes - self.output_bytes
+            per_second = saved / self.encode_seconds if self.encode_seconds else 0.0
+            return (f"Image conversions: {self.conversions} converted, {self.skipped} skipped by policy, "
+                    f"{saved / 1e6:.1f} MB saved in {self.encode_seconds:.0f} CPU-s "
+                    f"({per_second / 1e6:.2f} MB per CPU-second)")
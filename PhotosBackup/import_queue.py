@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Import Queue
+Separates conversion from import: conversion workers put their finished outputs here, and a
+single importer thread takes them off in batches. Photos/osxphotos is then driven by one
+thread only, while the workers keep converting during each import.
+
+- put(seq, item) is called once per file by the workers; item None means there is nothing to
+  import (the file was skipped or failed), which still counts for the order
+- with ordered=True, outputs are imported in seq order (the walk order, which is chronological
+  for a YYYY/MM/DD tree): an output that finishes early is held until every earlier file is in
+- at most max_queued outputs wait (ready and held alike); a worker putting more blocks until the
+  importer catches up, except for the output that fills the gap in front of held outputs (they
+  could never be released otherwise)
+- the importer waits up to batch_wait seconds to fill a batch of batch_size outputs
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10
+DEFAULT_MAX_QUEUED = 64
+DEFAULT_BATCH_WAIT = 2.0
+
+
+class ImportQueue:
+    """Many producers, one consumer thread calling import_batch(items) for each batch."""
+
+    def __init__(self, import_batch: Callable[[List[Any]], None], batch_size: int = DEFAULT_BATCH_SIZE,
+                 ordered: bool = False, max_queued: int = DEFAULT_MAX_QUEUED, batch_wait: float = DEFAULT_BATCH_WAIT):
+        self.import_batch = import_batch
+        self.batch_size = max(1, batch_size)
+        self.ordered = ordered
+        self.max_queued = max(1, max_queued)
+        self.batch_wait = batch_wait
+        self._condition = threading.Condition()
+        self._ready = deque()  # outputs the importer may take
+        self._held = {}        # seq -> output (or None) waiting for an earlier seq (ordered only)
+        self._next_seq = 0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self.batches = 0
+        self.imported = 0
+        self.peak_queued = 0
+        self.producer_waits = 0
+        self.busy_seconds = 0.0
+        self._started = time.monotonic()
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._consume, name="importer", daemon=True)
+        self._thread.start()
+
+    def _queued(self) -> int:
+        return len(self._ready) + len(self._held)
+
+    def _must_wait(self, seq: int) -> bool:
+        if self._closed or self._queued() < self.max_queued:
+            return False
+        # Held outputs wait for seq: blocking it would leave the queue stuck full
+        return not (self.ordered and seq == self._next_seq and self._held)
+
+    def put(self, seq: int, item: Optional[Any]):
+        """Hand over the output of file number seq (None: nothing to import)"""
+        with self._condition:
+            if self._must_wait(seq):
+                self.producer_waits += 1
+                while self._must_wait(seq):
+                    self._condition.wait()
+            if self.ordered:
+                self._held[seq] = item
+                while self._next_seq in self._held:
+                    item = self._held.pop(self._next_seq)
+                    self._next_seq += 1
+                    if item is not None:
+                        self._ready.append(item)
+            elif item is not None:
+                self._ready.append(item)
+            self.peak_queued = max(self.peak_queued, self._queued())
+            self._condition.notify_all()
+
+    def _take_batch(self) -> List[Any]:
+        with self._condition:
+            while not self._ready and not self._closed:
+                self._condition.wait()
+            # Give the workers a moment to fill the batch, unless the run is over
+            deadline = time.monotonic() + self.batch_wait
+            while len(self._ready) < self.batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = [self._ready.popleft() for _ in range(min(self.batch_size, len(self._ready)))]
+            self._condition.notify_all()
+            return batch
+
+    def _consume(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                return  # closed and drained
+            started = time.monotonic()
+            try:
+                self.import_batch(batch)
+            except Exception as e:
+                logger.error(f"Error importing a batch of {len(batch)} files: {e}")
+            self.busy_seconds += time.monotonic() - started
+            self.batches += 1
+            self.imported += len(batch)
+
+    def close(self):
+        """Wait until every queued output has been imported, then stop the importer"""
+        with self._condition:
+            self._closed = True
+            if self._held:
+                # Only if a seq was never put: import what is held rather than dropping it
+                logger.warning(f"{len(self._held)} outputs were still waiting for earlier files")
+                self._ready.extend(item for _, item in sorted(self._held.items()) if item is not None)
+                self._held.clear()
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join()
+
+    def report(self) -> str:
+        wall = max(time.monotonic() - self._started, 1e-6)
+        return (f"Importer: {self.imported} outputs in {self.batches} batch(es), busy {self.busy_seconds:.0f}s "
+                f"of {wall:.0f}s ({100.0 * self.busy_seconds / wall:.0f}%); at most {self.peak_queued} queued, "
+                f"workers waited {self.producer_waits} time(s)")
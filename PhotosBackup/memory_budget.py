@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Memory Budget
+Admits image conversions only while the estimated decoded size of all running jobs stays within
+a budget (--max-decode-mb), so several 50-100MP TIFF/CR2/DNG decodes never run at once while
+ordinary phone photos still use every worker.
+
+The estimate comes from the image header (width x height x bytes per pixel, read without
+decoding), times ENCODE_OVERHEAD for the upright copy and the HEIF encoder's buffers. RAW files,
+whose header often describes only a preview, are also estimated from their megapixels as
+guessed from the file size.
+"""
+
+import os
+import logging
+import threading
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+ENCODE_OVERHEAD = 3.0        # decoded image + transposed copy + encoder input/reconstruction buffers
+RAW_BYTES_PER_PIXEL = 1.2    # compressed RAW file bytes per pixel, used to guess RAW dimensions
+RAW_EXTENSIONS = (".cr2", ".cr3", ".dng", ".nef", ".arw", ".raf", ".orf", ".rw2")
+BYTES_PER_PIXEL = {"1": 0.125, "L": 1, "P": 1, "LA": 2, "I;16": 2, "RGB": 3, "YCbCr": 3, "LAB": 3,
+                   "HSV": 3, "RGBA": 4, "CMYK": 4, "I": 4, "F": 4}
+
+
+def estimate_decode_mb(file_path: str, buffered: bool = False) -> float:
+    """
+    Estimated peak memory (MB) of converting file_path, from its header only. With 'buffered'
+    the whole source and encoded output are also held in memory (volume-limited I/O); the
+    output is assumed to be no larger than the source.
+    """
+    estimate = 0.0
+    try:
+        with Image.open(file_path) as image:
+            width, height = image.size
+            estimate = width * height * BYTES_PER_PIXEL.get(image.mode, 4)
+    except Exception as e:
+        logger.debug(f"Could not read the header of {file_path}: {e}")
+    if file_path.lower().endswith(RAW_EXTENSIONS) or not estimate:
+        # RAW headers often describe the embedded preview; decoders produce 16-bit RGB
+        estimate = max(estimate, os.path.getsize(file_path) / RAW_BYTES_PER_PIXEL * 6)
+    estimate *= ENCODE_OVERHEAD
+    if buffered:
+        estimate += 2 * os.path.getsize(file_path)
+    return estimate / (1024 * 1024)
+
+
+class MemoryBudget:
+    """
+    Blocking admission control for estimated memory. A job larger than the whole budget is
+    admitted alone, so nothing waits forever.
+    """
+
+    def __init__(self, limit_mb: float):
+        self.limit_mb = limit_mb
+        self.in_use_mb = 0.0
+        self.peak_mb = 0.0
+        self.running = 0
+        self.waits = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, mb: float):
+        with self._condition:
+            if self.running and self.in_use_mb + mb > self.limit_mb:
+                self.waits += 1
+                while self.running and self.in_use_mb + mb > self.limit_mb:
+                    self._condition.wait()
+            self.in_use_mb += mb
+            self.running += 1
+            self.peak_mb = max(self.peak_mb, self.in_use_mb)
+
+    def release(self, mb: float):
+        with self._condition:
+            self.in_use_mb = max(0.0, self.in_use_mb - mb)
+            self.running -= 1
+            self._condition.notify_all()
+
+    def report(self) -> str:
+        with self._condition:
+            return (f"Decode memory budget: peak {self.peak_mb:.0f} of {self.limit_mb:.0f} MB, "
+                    f"{self.waits} job(s) waited for memory")
@@ -3,6 +3,7 @@ import shutil
 import exiftool
 from pathlib import Path
 from datetime import datetime
+from filename_dates import get_date_from_filename
 
 # Define the base directory for source and destination
 base_dir = "/Volumes/SlowDisk/Icloud"
@@ -24,50 +25,6 @@ def parse_date(date_str):
         print(f"Error parsing date '{date_str}': {e}")
         return None
 
-def get_date_from_filename(filename):
-    # Extract the date from the filename (formats: YYYY-MM-DD, YYYY_MM_DD, YYYYMMDD, or WP_YYYYMMDD)
-    try:
-        # Check for YYYY-MM-DD format (e.g., 2013-07-09 12.16.44.mp4)
-        if filename.startswith(tuple(f"{year}-{month:02d}-{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
-            date_part = filename[:10]  # First 10 characters: YYYY-MM-DD
-            year, month, day = date_part.split("-")
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for WP_YYYYMMDD format (e.g., WP_20151026_10_15_40_Pro.mp4)
-        if filename.startswith("WP_") and len(filename) > 11:  # WP_ + 8 chars for YYYYMMDD
-            date_part = filename[3:11]  # Extract YYYYMMDD after WP_
-            year = date_part[:4]
-            month = date_part[4:6]
-            day = date_part[6:8]
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for YYYYMMDD format (e.g., 20180804_025359000_iOS.mp4)
-        if filename.startswith(tuple(f"{year}{month:02d}{day:02d}" for year in range(2000, 2030) for month in range(1, 13) for day in range(1, 32))):
-            date_part = filename[:8]  # First 8 characters: YYYYMMDD
-            year = date_part[:4]
-            month = date_part[4:6]
-            day = date_part[6:8]
-            if (year.isdigit() and month.isdigit() and day.isdigit() and
-                2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-
-        # Check for YYYY_MM_DD format (e.g., 2016_01_01_...)
-        if "_" in filename:
-            date_part = filename.split("_", 3)[:3]  # Split on "_" and take first 3 parts
-            if len(date_part) == 3 and len(date_part[0]) == 4 and len(date_part[1]) == 2 and len(date_part[2]) == 2:
-                year, month, day = date_part
-                # Validate that year, month, and day are numeric and within reasonable ranges
-                if (year.isdigit() and month.isdigit() and day.isdigit() and
-                    2000 <= int(year) <= 2030 and 1 <= int(month) <= 12 and 1 <= int(day) <= 31):
-                    return datetime.strptime(f"{year}-{month}-{day} 00:00:00", "%Y-%m-%d %H:%M:%S")
-        return None
-    except (ValueError, IndexError):
-        return None
-
 def get_folder_date(filepath):
     # Extract the folder date from the path (e.g., /Volumes/SlowDisk/Icloud/2015/06/02)
     parts = filepath.split(os.sep)
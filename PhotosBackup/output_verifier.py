@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Output Verifier
+Tiered checks that catch truncated or broken files for a fraction of the cost of a full
+ffmpeg -f null decode of every video:
+
+1. header: the container probes, has a video stream and a duration (an image opens, with
+   the source's dimensions); a converted video must be as long as its source
+2. samples: a few frames spread over the video are decoded (seeking to them) and their
+   perceptual hash (64-bit dHash) is compared with the source's frames at the same
+   timestamps; an image is decoded and hashed against its source
+3. full decode: only when a sample could not be decoded or did not match
+
+Results of files checked on their own (e.g. sources) are cached by path, size and mtime, so a
+rerun does not check unchanged files again. A check against a reference is of a freshly
+written output and is never cached: its key could not be hit again. The cache is bounded, saved
+every SAVE_EVERY new results, and forget() drops the entry of a finished file.
+"""
+
+import os
+import json
+import logging
+import threading
+import subprocess
+from typing import NamedTuple, Optional
+
+from PIL import Image, ImageOps
+from pillow_heif import register_heif_opener
+
+from memory_budget import RAW_EXTENSIONS
+from segment_encoder import durations_match
+from video_probe import media_duration, probe_media, streams_of_type
+
+register_heif_opener()
+
+logger = logging.getLogger(__name__)
+
+VERIFY_CACHE_FILE = "verify_cache.json"
+DEFAULT_SAMPLES = 3
+SAVE_EVERY = 200            # new cache entries between saves, so a crash loses little
+MAX_CACHE_ENTRIES = 50000   # the oldest entries are dropped beyond this
+MAX_HASH_DISTANCE = 12  # differing bits (of 64) still counted as the same frame
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".m4v", ".mts", ".3gp", ".wmv", ".webm", ".flv", ".mpeg")
+HASH_SIZE = (9, 8)  # dHash: 8 rows of 9 pixels give 64 left/right comparisons
+
+
+class VerifyResult(NamedTuple):
+    ok: bool
+    tier: int    # the last tier that ran
+    reason: str
+
+
+class VerificationFailed(Exception):
+    """An output failed verification (it has been removed)."""
+
+
+def dhash(pixels: bytes) -> int:
+    """64-bit difference hash of a 9x8 grayscale image (row-major bytes)"""
+    width, height = HASH_SIZE
+    value = 0
+    for row in range(height):
+        for col in range(width - 1):
+            value = (value << 1) | (pixels[row * width + col] > pixels[row * width + col + 1])
+    return value
+
+
+def hash_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def image_dhash(path: str) -> Optional[int]:
+    """dHash of the upright image; None if it cannot be decoded"""
+    try:
+        with Image.open(path) as image:
+            upright = ImageOps.exif_transpose(image)
+            return dhash(upright.convert("L").resize(HASH_SIZE, Image.LANCZOS).tobytes())
+    except Exception as e:
+        logger.debug(f"Could not decode {path}: {e}")
+        return None
+
+
+def video_frame_dhash(path: str, seconds: float) -> Optional[int]:
+    """dHash of the frame at 'seconds' (ffmpeg seeks to the keyframe before it and decodes up to it)"""
+    width, height = HASH_SIZE
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-ss", f"{seconds:.3f}", "-i", path, "-frames:v", "1",
+         "-vf", f"scale={width}:{height},format=gray", "-f", "rawvideo", "-"],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    if result.returncode != 0 or len(result.stdout) != width * height:
+        return None
+    return dhash(result.stdout)
+
+
+def full_decode(path: str) -> Optional[str]:
+    """Decode every frame; returns ffmpeg's first error, or None if the file decodes cleanly"""
+    result = subprocess.run(["ffmpeg", "-v", "error", "-i", path, "-f", "null", "-"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    errors = result.stderr.strip()
+    if result.returncode != 0 or errors:
+        return errors.splitlines()[0] if errors else f"ffmpeg exited with {result.returncode}"
+    return None
+
+
+def _file_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+class OutputVerifier:
+    """Thread-safe tiered verifier with a JSON result cache (cache_file=None: no cache)."""
+
+    def __init__(self, cache_file: Optional[str] = VERIFY_CACHE_FILE, samples: int = DEFAULT_SAMPLES,
+                 max_distance: int = MAX_HASH_DISTANCE):
+        self.cache_file = cache_file
+        self.samples = samples
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._cache = {}
+        self.tiers = {1: 0, 2: 0, 3: 0}  # files whose verification ended at each tier
+        self.failed = 0
+        self.cached = 0
+        self._unsaved = 0
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file) as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable verification cache {cache_file}: {e}")
+
+    def verify(self, path: str, reference: Optional[str] = None, reference_probe: Optional[dict] = None) -> VerifyResult:
+        """
+        Check path; 'reference' is the file it was converted from (its frames are compared), and
+        'reference_probe' its probe_media() result if already known. Only checks without a
+        reference are cached.
+        """
+        key = None
+        if not reference:
+            try:
+                key = _file_key(path)
+            except OSError as e:
+                return VerifyResult(False, 1, str(e))
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached:
+                    self.cached += 1
+                    return VerifyResult(*cached)
+        if path.lower().endswith(VIDEO_EXTENSIONS):
+            result = self._verify_video(path, reference, reference_probe)
+        else:
+            result = self._verify_image(path, reference)
+        save = False
+        with self._lock:
+            if key:
+                self._cache[key] = list(result)
+                while len(self._cache) > MAX_CACHE_ENTRIES:
+                    del self._cache[next(iter(self._cache))]
+                self._unsaved += 1
+                save = self._unsaved >= SAVE_EVERY
+            self.tiers[result.tier] += 1
+            self.failed += not result.ok
+        if not result.ok:
+            logger.warning(f"Verification of {path} failed at tier {result.tier}: {result.reason}")
+        if save:
+            self.save()
+        return result
+
+    def forget(self, path: str):
+        """Drop the cached result of a finished file (call before it is moved or removed)"""
+        try:
+            key = _file_key(path)
+        except OSError:
+            return
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def _verify_video(self, path, reference, reference_probe) -> VerifyResult:
+        # Tier 1: container and header
+        probe = probe_media(path)
+        if not probe or not streams_of_type(probe, "video"):
+            return VerifyResult(False, 1, "no readable video stream")
+        duration = media_duration(probe)
+        if not duration:
+            return VerifyResult(False, 1, "no duration")
+        if reference:
+            source_duration = media_duration(reference_probe or probe_media(reference))
+            if source_duration and not durations_match(source_duration, duration):
+                return VerifyResult(False, 1, f"{duration:.1f}s long, source {source_duration:.1f}s (truncated?)")
+
+        # Tier 2: sampled frames, compared with the source's
+        suspicions, mismatches = [], 0
+        for i in range(self.samples):
+            seconds = duration * (i + 0.5) / self.samples
+            frame = video_frame_dhash(path, seconds)
+            if frame is None:
+                suspicions.append(f"no frame at {seconds:.1f}s")
+                continue
+            source_frame = video_frame_dhash(reference, seconds) if reference else None
+            if source_frame is not None and hash_distance(frame, source_frame) > self.max_distance:
+                mismatches += 1
+                suspicions.append(f"frame at {seconds:.1f}s differs from the source "
+                                  f"({hash_distance(frame, source_frame)} bits)")
+        if not suspicions:
+            return VerifyResult(True, 2, f"{self.samples} sampled frames match")
+
+        # Tier 3: full decode, only on suspicion
+        error = full_decode(path)
+        if error:
+            return VerifyResult(False, 3, f"decode error: {error}")
+        if mismatches > self.samples // 2:
+            return VerifyResult(False, 3, "; ".join(suspicions))
+        return VerifyResult(True, 3, "decodes cleanly (" + "; ".join(suspicions) + ")")
+
+    def _verify_image(self, path, reference) -> VerifyResult:
+        # Tier 1: header and dimensions (RAW headers often describe only a preview)
+        try:
+            with Image.open(path) as image:
+                size = image.size
+        except Exception as e:
+            return VerifyResult(False, 1, f"cannot open: {e}")
+        if not all(size):
+            return VerifyResult(False, 1, "empty image")
+        if reference and not reference.lower().endswith(RAW_EXTENSIONS):
+            try:
+                with Image.open(reference) as source:
+                    source_size = source.size
+                if sorted(source_size) != sorted(size):
+                    return VerifyResult(False, 1, f"{size[0]}x{size[1]}, source {source_size[0]}x{source_size[1]}")
+            except Exception as e:
+                logger.debug(f"Could not read the header of {reference}: {e}")
+
+        # Tier 2: decode and compare with the source (an image decode is already a full decode)
+        image_hash = image_dhash(path)
+        if image_hash is None:
+            return VerifyResult(False, 2, "decode error")
+        source_hash = image_dhash(reference) if reference else None
+        if source_hash is not None and hash_distance(image_hash, source_hash) > self.max_distance:
+            return VerifyResult(False, 2, f"differs from the source ({hash_distance(image_hash, source_hash)} bits)")
+        return VerifyResult(True, 2, "decodes and matches")
+
+    def save(self):
+        if not self.cache_file:
+            return
+        with self._lock:
+            data = dict(self._cache)
+            self._unsaved = 0
+        tmp_path = self.cache_file + ".tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            logger.error(f"Could not write verification cache {self.cache_file}: {e}")
+
+    def report(self) -> str:
+        with self._lock:
+            checked = sum(self.tiers.values())
+            return (f"Verification: {checked} checked ({self.tiers[1]} ended at the header, {self.tiers[2]} at "
+                    f"sampled frames, {self.tiers[3]} needed a full decode), {self.failed} failed, "
+                    f"{self.cached} from cache")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Photo Importers
+The interface between convert_and_import_osx.py and the library files are imported into, so
+its batching, retry and restart logic does not depend on Photos, osxphotos and AppleScript:
+
+- Importer: import_batch() (required), plus the import_fallback(), is_duplicate(), restart(),
+  close() and report() hooks
+- FilesystemImporter: a stand-in library in a folder, with configurable latency, random
+  failures and a library that stops importing until restarted, so the whole import path can be
+  load-tested on any machine at realistic rates
+
+The Photos implementation (osxphotos, AppleScript fallback, Photos restarts) is
+convert_and_import_osx.OsxPhotosImporter.
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+from hashed_copy import copy_with_hash
+
+logger = logging.getLogger(__name__)
+
+LIBRARY_INDEX_FILE = ".library_index.json"
+STAND_IN_OPTIONS = {"latency": float, "per_file_latency": float, "jitter": float, "failure_rate": float,
+                    "degrade_after": int, "restart_latency": float, "seed": int}
+
+
+class ImportResult(NamedTuple):
+    imported: List[str]
+    skipped: List[str]      # already in the library
+    failed: Dict[str, str]  # path -> reason
+
+
+class Importer:
+    """An import backend. Only import_batch is required; the hooks default to doing nothing."""
+
+    name = "importer"
+
+    def import_batch(self, paths: List[str]) -> ImportResult:
+        """Import paths in one call; every path ends up in exactly one list of the result"""
+        raise NotImplementedError
+
+    def import_fallback(self, path: str) -> bool:
+        """Last resort for a file that import_batch keeps failing (Photos: AppleScript)"""
+        return False
+
+    def is_duplicate(self, path: str) -> bool:
+        """Whether the library already holds a file with the same contents"""
+        return False
+
+    def restart(self) -> bool:
+        """Restart the library application; False if there is nothing to restart or it failed"""
+        return False
+
+    def close(self):
+        """Save any state at the end of a run"""
+
+    def report(self) -> str:
+        return ""
+
+
+def parse_importer_options(value: str) -> Dict[str, float]:
+    """Parse a "latency=0.5,failure_rate=0.02" option into FilesystemImporter keyword arguments."""
+    options = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        name, sep, number = part.partition("=")
+        name = name.strip()
+        if not sep or name not in STAND_IN_OPTIONS:
+            raise ValueError(f"Invalid stand-in option '{part}' (expected one of {', '.join(STAND_IN_OPTIONS)}=N)")
+        options[name] = STAND_IN_OPTIONS[name](number)
+    return options
+
+
+def _file_digest(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class FilesystemImporter(Importer):
+    """
+    Stand-in library: imported files are copied into library_dir, and duplicates are found by
+    their sha256. Each import_batch call takes latency seconds plus per_file_latency per file
+    (plus up to jitter), a file fails with probability failure_rate, and after degrade_after
+    imports without a restart every import fails until restart() (which takes restart_latency).
+    """
+
+    name = "filesystem"
+
+    def __init__(self, library_dir: str, latency: float = 0.0, per_file_latency: float = 0.0, jitter: float = 0.0,
+                 failure_rate: float = 0.0, degrade_after: Optional[int] = None, restart_latency: float = 0.0,
+                 seed: Optional[int] = None):
+        self.library_dir = library_dir
+        self.latency = latency
+        self.per_file_latency = per_file_latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.degrade_after = degrade_after
+        self.restart_latency = restart_latency
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._index_file = os.path.join(library_dir, LIBRARY_INDEX_FILE)
+        self._index: Dict[str, str] = {}  # sha256 -> library file
+        self.since_restart = 0
+        self.calls = 0
+        self.restarts = 0
+        self.imported = 0
+        self.skipped = 0
+        self.failed = 0
+        os.makedirs(library_dir, exist_ok=True)
+        if os.path.exists(self._index_file):
+            with open(self._index_file) as f:
+                self._index = json.load(f)
+
+    def _wait(self, files: int):
+        time.sleep(self.latency + files * self.per_file_latency + self._random.uniform(0, self.jitter))
+
+    def _import_one(self, path: str) -> str:
+        """'imported', 'skipped' or the reason it failed"""
+        with self._lock:
+            if self.degrade_after and self.since_restart >= self.degrade_after:
+                return f"library unresponsive after {self.since_restart} imports (restart needed)"
+            if self._random.random() < self.failure_rate:
+                return "injected failure"
+        name = os.path.basename(path)
+        partial = os.path.join(self.library_dir, f".importing_{threading.get_ident()}_{name}")
+        digest = copy_with_hash(path, partial).digest
+        with self._lock:
+            if digest in self._index:
+                os.remove(partial)
+                return "skipped"
+            base, ext = os.path.splitext(os.path.join(self.library_dir, name))
+            destination, counter = base + ext, 0
+            while os.path.exists(destination):
+                counter += 1
+                destination = f"{base}_{counter}{ext}"
+            os.rename(partial, destination)
+            self._index[digest] = destination
+            self.since_restart += 1
+        return "imported"
+
+    def import_batch(self, paths: List[str]) -> ImportResult:
+        self._wait(len(paths))
+        result = ImportResult([], [], {})
+        for path in paths:
+            try:
+                outcome = self._import_one(path)
+            except OSError as e:
+                outcome = str(e)
+            if outcome == "imported":
+                result.imported.append(path)
+            elif outcome == "skipped":
+                result.skipped.append(path)
+            else:
+                result.failed[path] = outcome
+        with self._lock:
+            self.calls += 1
+            self.imported += len(result.imported)
+            self.skipped += len(result.skipped)
+            self.failed += len(result.failed)
+        return result
+
+    def import_fallback(self, path: str) -> bool:
+        return path in self.import_batch([path]).imported
+
+    def is_duplicate(self, path: str) -> bool:
+        digest = _file_digest(path)
+        with self._lock:
+            return digest in self._index
+
+    def restart(self) -> bool:
+        time.sleep(self.restart_latency)
+        with self._lock:
+            self.since_restart = 0
+            self.restarts += 1
+        return True
+
+    def close(self):
+        with self._lock:
+            data = dict(self._index)
+        tmp_path = self._index_file + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._index_file)
+
+    def report(self) -> str:
+        with self._lock:
+            return (f"Filesystem importer: {self.imported} imported, {self.skipped} duplicates skipped, "
+                    f"{self.failed} failed in {self.calls} calls; {self.restarts} restart(s)")
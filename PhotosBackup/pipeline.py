@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Staged Pipeline
+Runs work as explicit stages connected by bounded queues, e.g.
+scan -> probe -> date -> convert -> tag -> place -> import.
+
+- Every stage has its own worker threads and an input queue of at most queue_size items.
+  A full queue blocks the stage in front of it (backpressure), so a slow import or SMB
+  write holds back conversion instead of building an unbounded backlog.
+- A stage function receives an item and returns the item for the next stage, or None to
+  drop it (skipped/failed items are handled by the stage itself).
+- Queue depth, busy time and throughput are tracked per stage and logged periodically, so
+  the bottleneck stage is visible while the run is in progress.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Stage:
+    """One pipeline stage: a function, its worker count and its bounded input queue."""
+
+    def __init__(self, name: str, func: Callable[[Any], Any], workers: int = 1, queue_size: int = 64):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_depth = 0
+        self._lock = threading.Lock()
+
+    def put(self, item):
+        """Queue an item for this stage, blocking while the queue is full."""
+        self.queue.put(item)
+        depth = self.queue.qsize()
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def _record(self, seconds: float, result: Any, failed: bool):
+        with self._lock:
+            self.busy_seconds += seconds
+            if failed:
+                self.errors += 1
+            elif result is None:
+                self.dropped += 1
+            else:
+                self.processed += 1
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        """Counters for this stage; utilisation is busy time over (elapsed time x workers)."""
+        with self._lock:
+            done = self.processed + self.dropped + self.errors
+            return {
+                "stage": self.name,
+                "workers": self.workers,
+                "depth": self.queue.qsize(),
+                "max_depth": self.max_depth,
+                "processed": self.processed,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "per_second": done / elapsed if elapsed > 0 else 0.0,
+                "utilisation": self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+            }
+
+
+class Pipeline:
+    """Feeds items from a source iterable through a list of stages."""
+
+    def __init__(self, stages: List[Stage], report_interval: Optional[float] = 30.0):
+        self.stages = stages
+        self.report_interval = report_interval
+        self.started = None
+        self._finished = threading.Event()
+
+    def _worker(self, index: int, remaining: List[int], remaining_lock: threading.Lock):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        while True:
+            item = stage.queue.get()
+            if item is _STOP:
+                break
+            start = time.monotonic()
+            result, failed = None, False
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                failed = True
+                logger.error(f"Stage '{stage.name}' failed for {item}: {e}")
+            stage._record(time.monotonic() - start, result, failed)
+            if result is not None and next_stage is not None:
+                next_stage.put(result)
+
+        # The last worker of a stage to finish shuts down the next stage
+        with remaining_lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and next_stage is not None:
+            for _ in range(next_stage.workers):
+                next_stage.put(_STOP)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return [stage.stats(elapsed) for stage in self.stages]
+
+    def format_stats(self) -> str:
+        """One line per stage; the busiest stage with the fullest input queue is the bottleneck."""
+        lines = []
+        for s in self.stats():
+            lines.append(
+                f"{s['stage']:>8}: queue {s['depth']:>3} (max {s['max_depth']:>3}), "
+                f"{s['processed']} done, {s['dropped']} dropped, {s['errors']} errors, "
+                f"{s['per_second']:.2f}/s, {s['utilisation']:.0%} busy x{s['workers']}"
+            )
+        return "\n".join(lines)
+
+    def _reporter(self):
+        while not self._finished.wait(self.report_interval):
+            logger.info("Pipeline stages:\n" + self.format_stats())
+
+    def run(self, source: Iterable[Any]):
+        """Push every item of source through the stages and wait until all stages are drained."""
+        self.started = time.monotonic()
+        self._finished.clear()
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._worker, args=(index, remaining, remaining_lock),
+                    name=f"{stage.name}-{n}", daemon=True
+                )
+                thread.start()
+                threads.append(thread)
+        reporter = None
+        if self.report_interval:
+            reporter = threading.Thread(target=self._reporter, name="pipeline-stats", daemon=True)
+            reporter.start()
+
+        first = self.stages[0]
+        try:
+            for item in source:
+                first.put(item)
+        finally:
+            for _ in range(first.workers):
+                first.put(_STOP)
+            for thread in threads:
+                thread.join()
+            self._finished.set()
+            if reporter:
+                reporter.join()
+        logger.info("Pipeline finished:\n" + self.format_stats())
+
+
+def parse_stage_workers(value: str) -> Dict[str, int]:
+    """Parse a "convert=4,import=1" option into {"convert": 4, "import": 1}."""
+    workers = {}
+    for part in filter(None, (p.strip() for p in value.split(","))):
+        name, sep, count = part.partition("=")
+        if not sep or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Invalid stage worker count '{part}' (expected NAME=N)")
+        workers[name.strip()] = int(count)
+    return workers
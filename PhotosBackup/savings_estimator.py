@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Savings Estimator
+Predicts the size of a video's HEVC output before encoding it, so clips that would end up
+barely smaller (or larger) than the source are copied instead of burning CPU on an encode.
+
+- Bitrate encodes (-b:v): the output video bitrate is the target bitrate.
+- Quality encodes (-q:v): width x height x fps x bits-per-pixel for that quality level.
+- Calibrated libx265 encodes: the same, with the bits per pixel measured by encoder_calibration.
+- Optionally a short sample (a few seconds from the middle of the video) is encoded with the
+  real encoder options and its bitrate is used instead of the model.
+
+Audio is predicted from the source bitrate when it is stream-copied, else AAC_BITRATE.
+SavingsTracker accumulates predicted vs actual output sizes so the model can be tuned.
+"""
+
+import os
+import logging
+import tempfile
+import threading
+import subprocess
+from typing import Dict, List, NamedTuple, Optional
+
+from video_probe import media_duration, streams_of_type
+
+logger = logging.getLogger(__name__)
+
+AAC_BITRATE = 128000  # bits/s of ffmpeg's AAC encoder at its default settings
+# Bits per pixel of hevc_videotoolbox at -q:v 50; each +20 quality roughly doubles the size
+QUALITY_50_BITS_PER_PIXEL = 0.03
+DEFAULT_SAMPLE_SECONDS = 0
+
+
+class SavingsEstimate(NamedTuple):
+    source_bytes: int
+    predicted_bytes: int
+    method: str  # "bitrate", "quality", "profile" or "sample"
+
+    @property
+    def savings_percent(self) -> float:
+        """Predicted size reduction in percent of the source (negative if the output is larger)"""
+        if not self.source_bytes:
+            return 0.0
+        return 100.0 * (self.source_bytes - self.predicted_bytes) / self.source_bytes
+
+
+def parse_bitrate(value: str) -> int:
+    """Parse an ffmpeg bitrate such as "8000k" or "8M" into bits/s"""
+    value = value.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def frame_rate(stream: Dict) -> float:
+    """Frames per second of a video stream ("30000/1001" -> 29.97), 30 if unknown"""
+    for key in ("avg_frame_rate", "r_frame_rate"):
+        numerator, _, denominator = (stream.get(key) or "").partition("/")
+        try:
+            fps = float(numerator) / float(denominator or 1)
+        except (ValueError, ZeroDivisionError):
+            continue
+        if fps > 0:
+            return fps
+    return 30.0
+
+
+def quality_bits_per_pixel(quality: int) -> float:
+    """Bits per pixel the quality-based encoder is expected to spend at -q:v 'quality'"""
+    return QUALITY_50_BITS_PER_PIXEL * 2 ** ((quality - 50) / 20)
+
+
+def sample_video_bitrate(input_path: str, video_args: List[str], duration: float, seconds: float) -> Optional[float]:
+    """Encode 'seconds' of video from the middle of the file and return the resulting bits/s"""
+    start = max(0.0, duration / 2 - seconds / 2)
+    fd, sample_path = tempfile.mkstemp(suffix=".mp4", prefix=".sample_")
+    os.close(fd)
+    try:
+        subprocess.run(
+            ["ffmpeg", "-v", "error", "-y", "-ss", f"{start:.3f}", "-t", str(seconds), "-i", input_path, "-an"]
+            + video_args + [sample_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+        return os.path.getsize(sample_path) * 8 / seconds
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.warning(f"Sample encode of {input_path} failed, using the model: {e}")
+        return None
+    finally:
+        os.remove(sample_path)
+
+
+def estimate_output_size(input_path: str, probe: Dict, video_args: List[str], target_bitrate: str = "8000k",
+                         quality: Optional[int] = None, copy_audio: bool = False,
+                         sample_seconds: float = DEFAULT_SAMPLE_SECONDS,
+                         bits_per_pixel: Optional[float] = None) -> Optional[SavingsEstimate]:
+    """
+    Predict the output size of encoding input_path; None if the duration or size is unknown.
+    'bits_per_pixel' (a calibrated encoder profile's) takes precedence over the bitrate and quality models.
+    """
+    duration = media_duration(probe)
+    video_streams = streams_of_type(probe, "video")
+    try:
+        source_bytes = int(probe["format"]["size"])
+    except (KeyError, TypeError, ValueError):
+        source_bytes = os.path.getsize(input_path) if os.path.exists(input_path) else 0
+    if not duration or not video_streams or not source_bytes:
+        return None
+    video = video_streams[0]
+
+    video_bps, method = None, "sample"
+    if sample_seconds and duration > sample_seconds * 2:
+        video_bps = sample_video_bitrate(input_path, video_args, duration, sample_seconds)
+    pixels = (video.get("width") or 0) * (video.get("height") or 0)
+    if video_bps is None and bits_per_pixel:
+        video_bps, method = pixels * frame_rate(video) * bits_per_pixel, "profile"
+    elif video_bps is None and quality is not None:
+        video_bps, method = pixels * frame_rate(video) * quality_bits_per_pixel(quality), "quality"
+    elif video_bps is None:
+        video_bps, method = parse_bitrate(target_bitrate), "bitrate"
+
+    audio_bps = 0
+    audio_streams = streams_of_type(probe, "audio")
+    if audio_streams:
+        try:
+            audio_bps = int(audio_streams[0]["bit_rate"]) if copy_audio else AAC_BITRATE
+        except (KeyError, TypeError, ValueError):
+            audio_bps = AAC_BITRATE
+
+    return SavingsEstimate(source_bytes, int((video_bps + audio_bps) * duration / 8), method)
+
+
+class SavingsTracker:
+    """Thread-safe running totals of predicted vs actual output sizes for one run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.encoded = 0
+        self.skipped = 0
+        self.source_bytes = 0
+        self.predicted_bytes = 0
+        self.actual_bytes = 0
+        self.skipped_bytes = 0
+        self.absolute_error = 0.0
+
+    def record_skip(self, estimate: SavingsEstimate):
+        with self._lock:
+            self.skipped += 1
+            self.skipped_bytes += estimate.source_bytes
+
+    def record_encode(self, estimate: SavingsEstimate, actual_bytes: int):
+        with self._lock:
+            self.encoded += 1
+            self.source_bytes += estimate.source_bytes
+            self.predicted_bytes += estimate.predicted_bytes
+            self.actual_bytes += actual_bytes
+            if actual_bytes:
+                self.absolute_error += abs(estimate.predicted_bytes - actual_bytes) / actual_bytes
+
+    def report(self) -> str:
+        with self._lock:
+            if not self.encoded and not self.skipped:
+                return "Savings estimator: no videos estimated"
+            lines = [f"Savings estimator: {self.encoded} encoded, {self.skipped} copied "
+                     f"({self.skipped_bytes / 1e9:.2f} GB not re-encoded)"]
+            if self.encoded:
+                predicted = self.source_bytes - self.predicted_bytes
+                actual = self.source_bytes - self.actual_bytes
+                lines.append(f"  predicted savings {predicted / 1e9:.2f} GB, actual {actual / 1e9:.2f} GB "
+                             f"of {self.source_bytes / 1e9:.2f} GB; "
+                             f"mean size error {100 * self.absolute_error / self.encoded:.0f}%")
+            return "\n".join(lines)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Scratch Staging
+Copies the next source files from a slow volume (e.g. the SMB share /Volumes/SlowDisk) to a
+local scratch directory in the background, so ffmpeg and Pillow read from local disk while
+the network fetches the files after them.
+
+- prefetch() wraps the job iterator: a background thread stays ahead of the consumer and
+  copies files into <scratch>/in/<n>/<name> while the staged bytes fit within max_bytes.
+  A file larger than the whole budget is not staged and is read from its source.
+- Outputs are written under <scratch>/out and queued with add_output(); they are moved to
+  their final destination in sequential batches of at least batch_bytes, and each file's
+  callback (e.g. moving its source to the processed folder) runs once its output is in place.
+- Queued outputs count against max_bytes too: a batch is moved early when staged inputs and
+  queued outputs exceed the budget, or when the prefetcher is only held up by queued outputs
+  (their callbacks then run on the next add_output() or flush()).
+"""
+
+import os
+import queue
+import shutil
+import logging
+import threading
+import contextlib
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from hashed_copy import FsyncBatch, copy_with_hash, move_file
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_BYTES = 512 * 1024 * 1024
+_END = object()
+
+
+class ScratchStaging:
+    """Bounded local staging area for inputs, plus batched moves of finished outputs."""
+
+    def __init__(self, scratch_dir: str, max_bytes: int, batch_bytes: int = DEFAULT_BATCH_BYTES,
+                 io: Optional[Callable] = None):
+        self.scratch_dir = scratch_dir
+        self.input_dir = os.path.join(scratch_dir, "in")
+        self.output_dir = os.path.join(scratch_dir, "out")
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.batch_bytes = batch_bytes
+        self.io = io or (lambda paths, nbytes=0: contextlib.nullcontext())
+        self._condition = threading.Condition()
+        self._staged = {}  # source path -> (staged path, size)
+        self._staged_bytes = 0
+        self._outputs: List[Tuple[str, str, Callable[[str], None], int]] = []
+        self._output_bytes = 0
+        self._moved: List[Tuple[str, Callable[[str], None]]] = []  # moved by the prefetcher, callbacks not run yet
+        self._move_lock = threading.Lock()
+        self.staged_files = 0
+        self.batches = 0
+        self._counter = 0
+
+    def _reserve(self, size: int) -> bool:
+        """
+        Wait until 'size' bytes fit in the budget next to the staged inputs and queued outputs;
+        False if the file can never fit
+        """
+        if size > self.max_bytes:
+            return False
+        with self._condition:
+            while self._staged_bytes + self._output_bytes + size > self.max_bytes:
+                if self._staged_bytes + size <= self.max_bytes and self._outputs:
+                    # Only queued outputs are in the way, and the consumer may be waiting for this file
+                    self._condition.release()
+                    try:
+                        moved = self._move_outputs()
+                    finally:
+                        self._condition.acquire()
+                    self._moved.extend(moved)
+                else:
+                    self._condition.wait()
+            self._staged_bytes += size
+        return True
+
+    def _stage(self, source_path: str) -> Optional[str]:
+        size = os.path.getsize(source_path)
+        if not self._reserve(size):
+            return None
+        self._counter += 1
+        staged_path = os.path.join(self.input_dir, str(self._counter), os.path.basename(source_path))
+        try:
+            os.makedirs(os.path.dirname(staged_path), exist_ok=True)
+            with self.io([source_path, staged_path], size):
+                copy_with_hash(source_path, staged_path, algorithm=None)
+        except OSError as e:
+            logger.warning(f"Could not stage {source_path}, reading it from its source: {e}")
+            self._free(size)
+            shutil.rmtree(os.path.dirname(staged_path), ignore_errors=True)
+            return None
+        with self._condition:
+            self._staged[source_path] = (staged_path, size)
+            self.staged_files += 1
+        return staged_path
+
+    def _free(self, size: int):
+        with self._condition:
+            self._staged_bytes -= size
+            self._condition.notify_all()
+
+    def prefetch(self, files: Iterable[Tuple[int, str]],
+                 wanted: Callable[[str], bool] = lambda path: True) -> Iterator[Tuple[int, str, Optional[str]]]:
+        """
+        Yield (seq, source path, staged path or None) in order, staging ahead in the background.
+        Only files for which wanted(path) is true are staged.
+        """
+        # The budget bounds the staged bytes; the queue only bounds the bookkeeping
+        staged: "queue.Queue" = queue.Queue(maxsize=1024)
+
+        def worker():
+            try:
+                for seq, source_path in files:
+                    staged_path = self._stage(source_path) if wanted(source_path) else None
+                    staged.put((seq, source_path, staged_path))
+            except Exception as e:
+                staged.put(e)
+            finally:
+                staged.put(_END)
+
+        threading.Thread(target=worker, name="scratch-prefetch", daemon=True).start()
+        while True:
+            item = staged.get()
+            if item is _END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def release_input(self, source_path: str):
+        """Delete the staged copy of source_path (its job has finished)"""
+        with self._condition:
+            staged = self._staged.pop(source_path, None)
+        if staged:
+            staged_path, size = staged
+            shutil.rmtree(os.path.dirname(staged_path), ignore_errors=True)
+            self._free(size)
+
+    def final_path(self, scratch_output: str, output_root: str) -> str:
+        """Where an output written under output_dir ends up under output_root"""
+        return os.path.join(output_root, os.path.relpath(scratch_output, self.output_dir))
+
+    def is_staged_output(self, path: str) -> bool:
+        return os.path.abspath(path).startswith(os.path.abspath(self.output_dir) + os.sep)
+
+    def add_output(self, scratch_output: str, final_output: str, on_moved: Callable[[str], None]):
+        """
+        Queue an output for the next batch, charging its size to the budget; flushes once
+        batch_bytes are pending or the budget is exceeded
+        """
+        size = os.path.getsize(scratch_output)
+        with self._condition:
+            self._outputs.append((scratch_output, final_output, on_moved, size))
+            self._output_bytes += size
+            full = (self._output_bytes >= self.batch_bytes
+                    or self._staged_bytes + self._output_bytes > self.max_bytes)
+        if full:
+            self.flush()
+        else:
+            self._run_callbacks([])
+
+    def _move_outputs(self) -> List[Tuple[str, Callable[[str], None]]]:
+        """
+        Move every queued output to its destination, one file after another, and free its bytes
+        once the whole batch has been fsynced; returns the (final path, callback) of each output moved.
+        """
+        with self._move_lock:
+            with self._condition:
+                outputs, self._outputs = self._outputs, []
+            if not outputs:
+                return []
+            self.batches += 1
+            logger.info(f"Moving a batch of {len(outputs)} outputs from scratch")
+            durable = FsyncBatch(max_files=len(outputs) + 1, max_bytes=float("inf"))
+            moved = []
+            for scratch_output, final_output, on_moved, size in sorted(outputs, key=lambda o: o[1]):
+                try:
+                    os.makedirs(os.path.dirname(final_output), exist_ok=True)
+                    with self.io([scratch_output, final_output], size):
+                        move_file(scratch_output, final_output, durable)
+                except OSError as e:
+                    logger.error(f"Error moving {scratch_output} to {final_output}: {e}")
+                    continue
+                moved.append((final_output, on_moved))
+            durable.flush()
+            with self._condition:
+                # An output that could not be moved stays in scratch, outside the budget
+                self._output_bytes -= sum(output[3] for output in outputs)
+                self._condition.notify_all()
+            return moved
+
+    def _run_callbacks(self, moved: List[Tuple[str, Callable[[str], None]]]):
+        with self._condition:
+            moved, self._moved = self._moved + moved, []
+        for final_output, on_moved in moved:
+            on_moved(final_output)
+
+    def flush(self):
+        """
+        Move every queued output to its destination; the callbacks run in the calling thread
+        once the whole batch has been fsynced.
+        """
+        self._run_callbacks(self._move_outputs())
+
+    def cleanup(self):
+        """Remove the staging folders (outputs that could not be moved are kept)"""
+        shutil.rmtree(self.input_dir, ignore_errors=True)
+        for root, dirs, files in os.walk(self.output_dir, topdown=False):
+            if not dirs and not files:
+                with contextlib.suppress(OSError):
+                    os.rmdir(root)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Segment Encoder
+Encodes one long video as N segments in parallel instead of a single multi-hour ffmpeg run:
+
+1. split the video stream at keyframes into N pieces (stream copy, no re-encode)
+2. encode the pieces in parallel ffmpeg processes
+3. handle the audio once for the whole file (copied if already AAC, otherwise encoded)
+4. join the pieces with the concat demuxer (stream copy) and mux the audio back in
+5. check that the output duration matches the input
+
+encode_segmented() returns False if any step fails or the duration check does not pass; the
+caller then falls back to the normal single-process encode. Every step runs through
+ffmpeg_progress.run_ffmpeg, so a step that makes no progress for the stall timeout is killed
+and FfmpegStalled is raised instead (a hung input would hang the single encode as well).
+"""
+
+import os
+import glob
+import shutil
+import logging
+import tempfile
+import subprocess
+import concurrent.futures
+from typing import List, Optional
+
+from ffmpeg_progress import FfmpegStalled, ProgressBoard, run_ffmpeg
+from video_probe import media_duration, probe_media, streams_of_type
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEGMENT_THRESHOLD = 20 * 60  # seconds; shorter videos are encoded in one piece
+DEFAULT_SEGMENTS = 4
+
+
+def should_segment(duration: Optional[float], threshold: Optional[float], segments: int) -> bool:
+    """True if a video of 'duration' seconds is long enough to be split into 'segments' pieces"""
+    return bool(duration and threshold is not None and segments > 1 and duration >= threshold)
+
+
+def durations_match(expected: float, actual: Optional[float]) -> bool:
+    """Allow one second or 0.5% of drift, whichever is larger (keyframe cuts are not frame exact)"""
+    return actual is not None and abs(expected - actual) <= max(1.0, expected * 0.005)
+
+
+def split_at_keyframes(input_path: str, work_dir: str, duration: float, segments: int,
+                       stall_timeout: Optional[float] = None, board: Optional[ProgressBoard] = None) -> List[str]:
+    """Stream-copy the first video stream into pieces cut at the first keyframe after each split point"""
+    split_times = ",".join(f"{duration * i / segments:.3f}" for i in range(1, segments))
+    run_ffmpeg([
+        "ffmpeg", "-v", "error", "-fflags", "+genpts", "-i", input_path,
+        "-map", "0:v:0", "-c", "copy", "-an",
+        "-f", "segment", "-segment_times", split_times, "-reset_timestamps", "1",
+        os.path.join(work_dir, "source_%03d.mkv")
+    ], f"{os.path.basename(input_path)} (split)", duration, stall_timeout, board)
+    return sorted(glob.glob(os.path.join(work_dir, "source_*.mkv")))
+
+
+def encode_segment(source_path: str, output_path: str, video_args: List[str], label: str = "",
+                   duration: Optional[float] = None, stall_timeout: Optional[float] = None,
+                   board: Optional[ProgressBoard] = None) -> str:
+    """Encode one piece (video only) to MPEG-TS, which carries parameter sets in-band for the concat"""
+    run_ffmpeg(["ffmpeg", "-v", "error", "-i", source_path, "-an"] + video_args + ["-f", "mpegts", output_path],
+               label or os.path.basename(source_path), duration, stall_timeout, board)
+    return output_path
+
+
+def extract_audio(input_path: str, work_dir: str, probe: dict, stall_timeout: Optional[float] = None,
+                  board: Optional[ProgressBoard] = None) -> Optional[str]:
+    """Write the first audio stream once; AAC is copied, anything else is encoded to AAC"""
+    audio_streams = streams_of_type(probe, "audio")
+    if not audio_streams:
+        return None
+    codec_args = ["-c:a", "copy"] if audio_streams[0].get("codec_name") == "aac" else ["-c:a", "aac"]
+    audio_path = os.path.join(work_dir, "audio.m4a")
+    run_ffmpeg(["ffmpeg", "-v", "error", "-i", input_path, "-map", "0:a:0", "-vn"] + codec_args + [audio_path],
+               f"{os.path.basename(input_path)} (audio)", media_duration(probe), stall_timeout, board)
+    return audio_path
+
+
+def concat_segments(segment_paths: List[str], audio_path: Optional[str], output_path: str, work_dir: str,
+                    duration: Optional[float] = None, stall_timeout: Optional[float] = None,
+                    board: Optional[ProgressBoard] = None):
+    """Join the encoded pieces losslessly with the concat demuxer and mux in the audio"""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = path.replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    args = ["ffmpeg", "-v", "error", "-f", "concat", "-safe", "0", "-i", list_path]
+    if audio_path:
+        args += ["-i", audio_path, "-map", "0:v", "-map", "1:a"]
+    args += ["-c", "copy", "-tag:v", "hvc1", output_path]
+    run_ffmpeg(args, f"{os.path.basename(output_path)} (concat)", duration, stall_timeout, board)
+
+
+def encode_segmented(input_path: str, output_path: str, video_args: List[str],
+                     segments: int = DEFAULT_SEGMENTS, probe: Optional[dict] = None,
+                     stall_timeout: Optional[float] = None, board: Optional[ProgressBoard] = None) -> bool:
+    """
+    Encode input_path to output_path in 'segments' parallel pieces. 'video_args' are the ffmpeg
+    video encoder options (e.g. ["-c:v", "hevc_videotoolbox", "-b:v", "8000k"]).
+    Returns True if the output was written and its duration matches the input. A step that makes
+    no progress for 'stall_timeout' seconds raises FfmpegStalled; progress goes to 'board'.
+    """
+    probe = probe or probe_media(input_path)
+    duration = media_duration(probe)
+    if not duration or not streams_of_type(probe, "video"):
+        return False
+
+    work_dir = tempfile.mkdtemp(prefix=".segments_", dir=os.path.dirname(os.path.abspath(output_path)))
+    try:
+        sources = split_at_keyframes(input_path, work_dir, duration, segments, stall_timeout, board)
+        if len(sources) < 2:
+            logger.info(f"{input_path} has too few keyframes to split; encoding in one piece")
+            return False
+        logger.info(f"Encoding {input_path} as {len(sources)} segments ({duration / 60:.0f} min)")
+
+        encoded = [os.path.join(work_dir, f"encoded_{i:03d}.ts") for i in range(len(sources))]
+        name = os.path.basename(input_path)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(sources) + 1) as pool:
+            audio_future = pool.submit(extract_audio, input_path, work_dir, probe, stall_timeout, board)
+            segment_futures = [
+                pool.submit(encode_segment, source, target, video_args, f"{name} (part {i + 1}/{len(sources)})",
+                            duration / len(sources), stall_timeout, board)
+                for i, (source, target) in enumerate(zip(sources, encoded))
+            ]
+            for future in segment_futures:
+                future.result()
+            audio_path = audio_future.result()
+
+        concat_segments(encoded, audio_path, output_path, work_dir, duration, stall_timeout, board)
+        output_duration = media_duration(probe_media(output_path))
+        if not durations_match(duration, output_duration):
+            logger.error(f"Segmented encode of {input_path} is {output_duration}s long, expected {duration:.1f}s")
+            os.remove(output_path)
+            return False
+        return True
+    except (subprocess.CalledProcessError, OSError) as e:
+        logger.error(f"Segmented encode of {input_path} failed: {e}")
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return False
+    except FfmpegStalled:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
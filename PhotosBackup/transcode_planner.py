@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Transcode Planner
+Chooses the cheapest correct action per video instead of the yes/no of is_video_hevc:
+
+- copy:   HEVC (tagged hvc1) with AAC or no audio, already in an MP4/MOV container
+- remux:  HEVC in the wrong container (MKV, AVI, ...) or tagged hev1 -> stream-copy the
+          video into MP4, encoding the audio only if it is not AAC
+- encode: anything else -> encode the video, stream-copy AAC audio instead of re-encoding it
+
+Run as a script for a dry-run summary of a folder, with the estimated CPU time saved compared
+to the old behaviour (copy HEVC as-is, fully re-encode everything else):
+    python3 transcode_planner.py /Volumes/SlowDisk/toconvert
+"""
+
+import os
+import argparse
+from typing import Dict, NamedTuple, Optional
+
+from video_probe import media_duration, probe_media, streams_of_type
+
+HEVC_CODECS = ("hevc", "h265")
+AUDIO_COPY_CODECS = ("aac",)
+MP4_EXTENSIONS = (".mp4", ".mov", ".m4v")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".mpeg", ".webm", ".3gp", ".mts", ".m4v")
+
+# Rough CPU cost model, in CPU-seconds per second of media; used only for the dry-run estimate
+VIDEO_ENCODE_COST_PER_MEGAPIXEL = 2.0
+AUDIO_ENCODE_COST = 0.02
+STREAM_COPY_COST = 0.005
+
+
+class TranscodePlan(NamedTuple):
+    action: str                 # "copy", "remux" or "encode"
+    video: str                  # "copy" or "encode"
+    audio: str                  # "copy", "encode" or "none"
+    reason: str
+    duration: Optional[float] = None
+    megapixels: float = 0.0
+
+    def describe(self) -> str:
+        return f"{self.action} (video: {self.video}, audio: {self.audio}) - {self.reason}"
+
+    def ffmpeg_stream_args(self, video_args) -> list:
+        """ffmpeg mapping/codec options for this plan; video_args are the encoder options for 'encode'"""
+        args = ["-map", "0:v:0"]
+        args += ["-c:v", "copy"] if self.video == "copy" else list(video_args)
+        if self.audio != "none":
+            args += ["-map", "0:a:0", "-c:a", "copy" if self.audio == "copy" else "aac"]
+        return args + ["-tag:v", "hvc1"]
+
+
+def is_mp4_container(file_path: str, probe: Dict) -> bool:
+    """True for MP4/MOV files (by extension and by the demuxer ffprobe picked)"""
+    format_name = probe.get("format", {}).get("format_name", "")
+    return file_path.lower().endswith(MP4_EXTENSIONS) and ("mp4" in format_name or "mov" in format_name)
+
+
+def plan_transcode(file_path: str, probe: Optional[Dict] = None, reencode_hevc: bool = False) -> Optional[TranscodePlan]:
+    """Plan the conversion of one video; None if it has no video stream or cannot be probed"""
+    probe = probe or probe_media(file_path)
+    if not probe:
+        return None
+    video_streams = streams_of_type(probe, "video")
+    if not video_streams:
+        return None
+    video = video_streams[0]
+    audio_streams = streams_of_type(probe, "audio")
+    duration = media_duration(probe)
+    megapixels = (video.get("width") or 0) * (video.get("height") or 0) / 1e6
+
+    if not audio_streams:
+        audio = "none"
+    elif audio_streams[0].get("codec_name") in AUDIO_COPY_CODECS:
+        audio = "copy"
+    else:
+        audio = "encode"
+
+    codec = (video.get("codec_name") or "").lower()
+    if codec not in HEVC_CODECS or reencode_hevc:
+        reason = f"video is {codec or 'unknown'}" if codec not in HEVC_CODECS else "re-encoding HEVC requested"
+        return TranscodePlan("encode", "encode", audio, reason, duration, megapixels)
+
+    problems = []
+    if not is_mp4_container(file_path, probe):
+        problems.append(f"container is {probe.get('format', {}).get('format_name', 'unknown')}")
+    if video.get("codec_tag_string") == "hev1":
+        problems.append("tagged hev1")
+    if audio == "encode":
+        problems.append(f"audio is {audio_streams[0].get('codec_name')}")
+    if problems:
+        return TranscodePlan("remux", "copy", audio, ", ".join(problems), duration, megapixels)
+    return TranscodePlan("copy", "copy", audio, "HEVC in MP4/MOV", duration, megapixels)
+
+
+def estimate_cpu_seconds(plan: TranscodePlan) -> float:
+    """Estimated CPU-seconds to carry out a plan"""
+    duration = plan.duration or 0.0
+    if plan.action == "copy":
+        return 0.0
+    cost = duration * (VIDEO_ENCODE_COST_PER_MEGAPIXEL * plan.megapixels if plan.video == "encode" else STREAM_COPY_COST)
+    if plan.audio == "encode":
+        cost += duration * AUDIO_ENCODE_COST
+    elif plan.audio == "copy":
+        cost += duration * STREAM_COPY_COST
+    return cost
+
+
+def estimate_legacy_cpu_seconds(plan: TranscodePlan) -> float:
+    """Estimated CPU-seconds of the old behaviour: HEVC copied as-is, everything else fully re-encoded"""
+    if plan.video == "copy":
+        return 0.0
+    duration = plan.duration or 0.0
+    audio = duration * AUDIO_ENCODE_COST if plan.audio != "none" else 0.0
+    return duration * VIDEO_ENCODE_COST_PER_MEGAPIXEL * plan.megapixels + audio
+
+
+def summarize_folder(folder: str, reencode_hevc: bool = False):
+    """Print the plan of every video under folder and the estimated CPU time saved"""
+    totals = {"copy": 0, "remux": 0, "encode": 0}
+    planned_seconds = legacy_seconds = 0.0
+    for root, _, files in sorted(os.walk(folder)):
+        for file in sorted(files):
+            if file.startswith("._") or not file.lower().endswith(VIDEO_EXTENSIONS):
+                continue
+            file_path = os.path.join(root, file)
+            plan = plan_transcode(file_path, reencode_hevc=reencode_hevc)
+            if not plan:
+                print(f"{file_path}: cannot be probed")
+                continue
+            print(f"{file_path}: {plan.describe()}")
+            totals[plan.action] += 1
+            planned_seconds += estimate_cpu_seconds(plan)
+            legacy_seconds += estimate_legacy_cpu_seconds(plan)
+
+    print(f"\nVideos: {sum(totals.values())} (copy: {totals['copy']}, remux: {totals['remux']}, encode: {totals['encode']})")
+    print(f"Estimated CPU time: {planned_seconds / 3600:.1f} h planned vs {legacy_seconds / 3600:.1f} h before "
+          f"(saves {(legacy_seconds - planned_seconds) / 3600:.1f} h)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dry run: show the transcode plan for every video in a folder.")
+    parser.add_argument("folder", help="Folder to scan (recursively)")
+    summarize_folder(parser.parse_args().folder)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Validation for the in-process HEIF metadata path (heif_metadata)
+Converts every image of a fixture folder (JPEG/PNG/TIFF/RAW...) with the conversion engine's
+image job and compares the source and output tags as exiftool reads them. Tags that a
+conversion legitimately changes (dimensions, orientation, offsets, file-level tags) are ignored.
+
+Usage: python3 validate_heif_metadata.py FIXTURE_DIR [--keep OUTPUT_DIR]
+Exits with status 1 if any tag is missing or different in an output.
+"""
+
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from conversion_engine import IMAGE_EXTENSIONS, convert_image_job
+
+COMPARED_GROUPS = ("IFD0", "ExifIFD", "GPS", "IPTC", "ICC-header", "ICC_Profile")
+COMPARED_PREFIXES = ("XMP-",)
+IGNORED_TAGS = {
+    "Orientation", "ImageWidth", "ImageHeight", "ExifImageWidth", "ExifImageHeight", "XResolution",
+    "YResolution", "ResolutionUnit", "YCbCrPositioning", "YCbCrSubSampling", "Compression",
+    "BitsPerSample", "SamplesPerPixel", "PhotometricInterpretation", "StripOffsets", "StripByteCounts",
+    "RowsPerStrip", "PlanarConfiguration", "ThumbnailOffset", "ThumbnailLength", "ThumbnailImage",
+    "ExifVersion", "ComponentsConfiguration", "ColorSpace", "ProfileDateTime",
+}
+
+
+def read_tags(path):
+    """Group-qualified tags of a file, e.g. {"ExifIFD:DateTimeOriginal": "2016:06:11 21:20:49"}"""
+    result = subprocess.run(["exiftool", "-json", "-G1", "-n", "-charset", "filename=utf8", path],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    entries = json.loads(result.stdout) if result.stdout.strip() else [{}]
+    tags = {}
+    for key, value in entries[0].items():
+        group, _, name = key.partition(":")
+        if name in IGNORED_TAGS:
+            continue
+        if group in COMPARED_GROUPS or group.startswith(COMPARED_PREFIXES):
+            tags[key] = value
+    return tags
+
+
+def compare(source_tags, output_tags):
+    """(missing, different) tags of the output; a tag may move between EXIF groups"""
+    by_name = {}
+    for key, value in output_tags.items():
+        by_name.setdefault(key.partition(":")[2], []).append(value)
+    missing, different = [], []
+    for key, value in sorted(source_tags.items()):
+        if key in output_tags:
+            if output_tags[key] != value:
+                different.append((key, value, output_tags[key]))
+            continue
+        values = by_name.get(key.partition(":")[2])
+        if not values:
+            missing.append(key)
+        elif value not in values:
+            different.append((key, value, values[0]))
+    return missing, different
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare source and HEIC output tags with exiftool.")
+    parser.add_argument("fixtures", help="Folder of sample images")
+    parser.add_argument("--keep", help="Write the outputs here instead of a temporary folder")
+    args = parser.parse_args()
+
+    output_dir = args.keep or tempfile.mkdtemp(prefix="heif_metadata_")
+    os.makedirs(output_dir, exist_ok=True)
+    failures = 0
+    try:
+        for name in sorted(os.listdir(args.fixtures)):
+            source = os.path.join(args.fixtures, name)
+            if not name.lower().endswith(IMAGE_EXTENSIONS) or name.lower().endswith(".heic"):
+                continue
+            output = os.path.join(output_dir, f"{os.path.splitext(name)[0]}.heic")
+            output, _, seconds = convert_image_job(source, output, None, None, False)
+            if not output:
+                print(f"FAIL {name}: conversion failed")
+                failures += 1
+                continue
+            missing, different = compare(read_tags(source), read_tags(output))
+            if missing or different:
+                failures += 1
+                print(f"FAIL {name}: {len(missing)} missing, {len(different)} different")
+                for key in missing:
+                    print(f"    missing   {key}")
+                for key, expected, actual in different:
+                    print(f"    different {key}: {expected!r} -> {actual!r}")
+            else:
+                print(f"ok   {name} ({seconds:.2f} CPU-s)")
+    finally:
+        if not args.keep:
+            shutil.rmtree(output_dir, ignore_errors=True)
+    print(f"{failures} file(s) with metadata differences")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
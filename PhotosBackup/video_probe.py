@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Video Probe
+One ffprobe call per file (-show_format -show_streams as JSON), with helpers for the fields
+the conversion scripts need: duration, codecs and keyframe-friendly stream info.
+"""
+
+import json
+import logging
+import subprocess
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def probe_media(file_path: str) -> Optional[Dict]:
+    """Return ffprobe's format/streams description of file_path, or None if it cannot be read"""
+    try:
+        result = subprocess.run(
+            ["ffprobe", "-v", "error", "-print_format", "json", "-show_format", "-show_streams", file_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+        return json.loads(result.stdout)
+    except (subprocess.CalledProcessError, ValueError, OSError) as e:
+        logger.error(f"Error probing {file_path}: {e}")
+        return None
+
+
+def streams_of_type(probe: Dict, codec_type: str) -> List[Dict]:
+    """The 'video', 'audio', 'subtitle' or 'data' streams of a probe result"""
+    return [s for s in probe.get("streams", []) if s.get("codec_type") == codec_type]
+
+
+def media_duration(probe: Optional[Dict]) -> Optional[float]:
+    """Duration in seconds (container duration, else the longest stream), or None if unknown"""
+    if not probe:
+        return None
+    try:
+        return float(probe["format"]["duration"])
+    except (KeyError, TypeError, ValueError):
+        pass
+    durations = []
+    for stream in probe.get("streams", []):
+        try:
+            durations.append(float(stream["duration"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return max(durations) if durations else None
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """Duration of file_path in seconds, or None"""
+    return media_duration(probe_media(file_path))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Volume I/O Limiter
+Bounds the number of concurrent reads, copies and moves per volume. A USB hard disk thrashes
+its heads under parallel reads (limit 1-2), while an SMB share benefits from many outstanding
+requests (limit 8+).
+
+- Volumes are identified by st_dev and named by their mount point (e.g. /Volumes/G-DRIVE).
+- An operation touching two volumes (a copy or move) holds a slot on both, acquired in a fixed
+  order so two opposite copies cannot deadlock.
+- Bytes and busy time (time with at least one operation running) are recorded per volume, and
+  report() prints the achieved MB/s.
+
+Pass a multiprocessing.Manager() to share the limits with process-pool workers; register every
+volume in the parent process before the workers start (unregistered volumes are not limited).
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+_mount_points: Dict[int, str] = {}
+
+
+def _existing_path(path: str) -> str:
+    """path, or its nearest existing parent (for outputs that are not written yet)"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def volume_of(path: str) -> str:
+    """Mount point of the volume holding path, e.g. "/Volumes/SlowDisk" (cached per st_dev)"""
+    path = _existing_path(path)
+    device = os.stat(path).st_dev
+    mount_point = _mount_points.get(device)
+    if mount_point is None:
+        mount_point = path
+        while not os.path.ismount(mount_point) and os.path.dirname(mount_point) != mount_point:
+            mount_point = os.path.dirname(mount_point)
+        _mount_points[device] = mount_point
+    return mount_point
+
+
+def parse_volume_limits(values: Optional[Iterable[str]]) -> Dict[str, int]:
+    """Parse --volume-limit "/Volumes/G-DRIVE=1,/Volumes/SlowDisk=8" options into {mount: limit}"""
+    limits = {}
+    for value in values or []:
+        for part in filter(None, (p.strip() for p in value.split(","))):
+            path, sep, count = part.rpartition("=")
+            if not sep or not path or not count.strip().isdigit() or int(count) < 1:
+                raise ValueError(f"Invalid volume limit '{part}' (expected PATH=N)")
+            limits[path] = int(count)
+    return limits
+
+
+class VolumeLimiter:
+    """Per-volume semaphores and throughput counters, optionally shared through a Manager."""
+
+    def __init__(self, limits: Dict[str, int], default_limit: Optional[int] = None, manager=None):
+        self.default_limit = default_limit
+        self._manager = manager
+        self._lock = manager.Lock() if manager else threading.Lock()
+        self._semaphores = manager.dict() if manager else {}
+        self._bytes = manager.dict() if manager else {}
+        self._ops = manager.dict() if manager else {}
+        self._active = manager.dict() if manager else {}
+        self._busy_since = manager.dict() if manager else {}
+        self._busy = manager.dict() if manager else {}
+        self._limits = {}
+        for path, limit in limits.items():
+            self._limits[volume_of(path) if os.path.exists(path) else path] = limit
+
+    def __getstate__(self):
+        # Sent to process-pool workers through the pool initializer; the proxies travel, the manager does not
+        state = self.__dict__.copy()
+        state["_manager"] = None
+        return state
+
+    def register(self, path: str):
+        """Create the semaphore of path's volume (in the parent process, before workers start)"""
+        volume = volume_of(path)
+        limit = self._limits.get(volume, self.default_limit)
+        with self._lock:
+            if volume in self._semaphores or not limit:
+                return
+            if self._manager:
+                self._semaphores[volume] = self._manager.BoundedSemaphore(limit)
+            else:
+                self._semaphores[volume] = threading.BoundedSemaphore(limit)
+
+    def _start(self, volume: str):
+        with self._lock:
+            active = self._active.get(volume, 0)
+            if not active:
+                self._busy_since[volume] = time.monotonic()
+            self._active[volume] = active + 1
+
+    def _stop(self, volume: str, nbytes: int):
+        with self._lock:
+            active = self._active.get(volume, 1) - 1
+            self._active[volume] = active
+            if not active:
+                self._busy[volume] = self._busy.get(volume, 0.0) + time.monotonic() - self._busy_since[volume]
+            self._bytes[volume] = self._bytes.get(volume, 0) + nbytes
+            self._ops[volume] = self._ops.get(volume, 0) + 1
+
+    @contextmanager
+    def io(self, paths: List[str], nbytes: int = 0):
+        """Hold an I/O slot on every volume touched by paths; nbytes is counted on each of them"""
+        volumes = sorted({volume_of(path) for path in paths})
+        semaphores = [self._semaphores.get(volume) for volume in volumes]
+        acquired = []
+        try:
+            for semaphore in semaphores:
+                if semaphore is not None:
+                    semaphore.acquire()
+                    acquired.append(semaphore)
+            for volume in volumes:
+                self._start(volume)
+            try:
+                yield
+            finally:
+                for volume in volumes:
+                    self._stop(volume, nbytes)
+        finally:
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    def report(self) -> str:
+        with self._lock:
+            lines = []
+            for volume in sorted(self._ops.keys()):
+                busy = self._busy.get(volume, 0.0)
+                mb = self._bytes.get(volume, 0) / 1e6
+                limit = self._limits.get(volume, self.default_limit)
+                lines.append(f"  {volume}: {self._ops[volume]} ops, {mb:.0f} MB in {busy:.0f}s busy "
+                             f"({mb / busy if busy else 0.0:.1f} MB/s, limit {limit or 'none'})")
+        return "Volume I/O:\n" + "\n".join(lines) if lines else "Volume I/O: no operations"
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+XMP Sidecar Writer
+Writes corrected dates, descriptions and GPS into .xmp sidecars next to media files,
+so large originals never have to be rewritten by exiftool just to change a date.
+
+Sidecars are named <file>.<ext>.xmp (e.g. IMG_1234.MOV.xmp) so a Live Photo pair
+(IMG_1234.HEIC / IMG_1234.MOV) gets two separate sidecars. `osxphotos import --sidecar`
+picks them up at import time.
+"""
+
+import os
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_EXTENSION = ".xmp"
+
+XMP_TEMPLATE = """<?xpacket begin="\ufeff" id="W5M0MpCehiHzreSzNTczkc9d"?>
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+ <rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">
+  <rdf:Description rdf:about=""
+    xmlns:dc="http://purl.org/dc/elements/1.1/"
+    xmlns:exif="http://ns.adobe.com/exif/1.0/"
+    xmlns:photoshop="http://ns.adobe.com/photoshop/1.0/"
+    xmlns:xmp="http://ns.adobe.com/xap/1.0/">
+{properties}
+  </rdf:Description>
+ </rdf:RDF>
+</x:xmpmeta>
+<?xpacket end="w"?>
+"""
+
+
+def sidecar_path(media_path: str) -> str:
+    """Return the sidecar path for a media file (<file>.<ext>.xmp)"""
+    return media_path + SIDECAR_EXTENSION
+
+
+def format_xmp_date(date_time: datetime) -> str:
+    """Format a datetime as an XMP date (ISO 8601, offset kept if the datetime is aware)"""
+    return date_time.isoformat(timespec="seconds")
+
+
+def format_xmp_coordinate(value: float, positive: str, negative: str) -> str:
+    """Format a decimal coordinate as XMP 'DDD,MM.mmmmmmR' (e.g. '52,31.234560N')"""
+    ref = positive if value >= 0 else negative
+    value = abs(value)
+    degrees = int(value)
+    minutes = (value - degrees) * 60
+    return f"{degrees},{minutes:.6f}{ref}"
+
+
+def build_xmp(date_taken: Optional[datetime] = None,
+              description: Optional[str] = None,
+              title: Optional[str] = None,
+              latitude: Optional[float] = None,
+              longitude: Optional[float] = None,
+              altitude: Optional[float] = None) -> str:
+    """Build an XMP packet holding the given dates, description/title and GPS position"""
+    properties = []
+
+    if date_taken:
+        xmp_date = format_xmp_date(date_taken)
+        properties.append(f"   <exif:DateTimeOriginal>{xmp_date}</exif:DateTimeOriginal>")
+        properties.append(f"   <xmp:CreateDate>{xmp_date}</xmp:CreateDate>")
+        properties.append(f"   <photoshop:DateCreated>{xmp_date}</photoshop:DateCreated>")
+
+    for tag, text in (("dc:title", title), ("dc:description", description)):
+        if text:
+            properties.append(
+                f"   <{tag}><rdf:Alt><rdf:li xml:lang=\"x-default\">{escape(text)}</rdf:li></rdf:Alt></{tag}>"
+            )
+
+    if latitude is not None and longitude is not None:
+        properties.append(f"   <exif:GPSLatitude>{format_xmp_coordinate(latitude, 'N', 'S')}</exif:GPSLatitude>")
+        properties.append(f"   <exif:GPSLongitude>{format_xmp_coordinate(longitude, 'E', 'W')}</exif:GPSLongitude>")
+        if altitude is not None:
+            properties.append(f"   <exif:GPSAltitude>{round(abs(altitude) * 100)}/100</exif:GPSAltitude>")
+            properties.append(f"   <exif:GPSAltitudeRef>{0 if altitude >= 0 else 1}</exif:GPSAltitudeRef>")
+
+    return XMP_TEMPLATE.format(properties="\n".join(properties))
+
+
+def write_sidecar(media_path: str, **fields) -> str:
+    """Write a single sidecar next to media_path; the media file itself is not opened"""
+    path = sidecar_path(media_path)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(build_xmp(**fields))
+    os.replace(temp_path, path)
+    return path
+
+
+def takeout_taken_time(metadata: Dict) -> Optional[datetime]:
+    """Return the capture time from a Google Takeout JSON (photoTakenTime, then creationTime)"""
+    taken_time = metadata.get("photoTakenTime", {}).get("timestamp")
+    if not taken_time or taken_time == "-1":
+        taken_time = metadata.get("creationTime", {}).get("timestamp")
+    if not taken_time:
+        return None
+    if isinstance(taken_time, str) and taken_time.isdigit():
+        return datetime.fromtimestamp(float(taken_time))
+    if isinstance(taken_time, int):
+        return datetime.fromtimestamp(taken_time)
+    return datetime.fromisoformat(taken_time.replace("Z", "+00:00"))
+
+
+def takeout_sidecar_fields(metadata: Dict) -> Dict:
+    """Map a Google Takeout JSON onto build_xmp() keyword arguments"""
+    fields = {"date_taken": takeout_taken_time(metadata)}
+    if metadata.get("description"):
+        fields["description"] = metadata["description"]
+
+    # Takeout writes 0.0/0.0 when there is no position; prefer geoData, then geoDataExif
+    for key in ("geoData", "geoDataExif"):
+        geo = metadata.get(key) or {}
+        latitude, longitude = geo.get("latitude", 0.0), geo.get("longitude", 0.0)
+        if latitude or longitude:
+            fields["latitude"] = latitude
+            fields["longitude"] = longitude
+            fields["altitude"] = geo.get("altitude")
+            break
+    return fields
+
+
+class SidecarBatch:
+    """
+    Collects sidecar writes and flushes them together (per directory, or every batch_size
+    entries), so a run touches only small .xmp files and leaves the media bytes untouched.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        self.pending: List[Tuple[str, Dict]] = []
+        self.written = 0
+
+    def add(self, media_path: str, **fields):
+        """Queue a sidecar for media_path"""
+        self.pending.append((media_path, fields))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write all queued sidecars and return how many were written"""
+        count = 0
+        for media_path, fields in self.pending:
+            try:
+                write_sidecar(media_path, **fields)
+                count += 1
+            except OSError as e:
+                logger.error(f"Failed to write sidecar for {media_path}: {e}")
+        self.pending = []
+        self.written += count
+        return count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()